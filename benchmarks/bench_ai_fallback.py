@@ -0,0 +1,98 @@
+"""
+AI 兜底基准 - 串行批量请求 vs 异步并发（请求发往本地模拟服务）
+
+串行：每个文件解析完后在解析线程中逐批同步请求（parse_lines_batch）
+异步：请求交给 AsyncAIResolver 在后台并发进行，同时解析后续文件（batch.run_batch 的串行流水线）
+缓存：使用 AIResponseCache 连续解析两遍，第二遍的兜底行全部命中缓存
+模板：使用 RuleBook（不用缓存）连续解析两遍，统计每遍仍需请求 AI 的行数
+
+用法:
+    python benchmarks/bench_ai_fallback.py [--latency 1.0] [--error-rate 0.0] [--dir HSBC]
+"""
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import config
+from src import ai
+from src.ai import resolver as ai_resolver
+from src.batch import find_pdf_files, run_batch
+from src.cache import AIResponseCache
+from src.parsers import HSBCParser
+from benchmarks.mock_openai_server import MockChatServer
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="AI 兜底基准")
+    arg_parser.add_argument("--latency", type=float, default=1.0)
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--dir", default=str(project_root / "HSBC"))
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    pdf_files = find_pdf_files([args.dir])
+
+    with MockChatServer(latency=args.latency, error_rate=args.error_rate, seed=0) as server:
+        config.DEEPSEEK_API_KEY = "mock"
+        config.DEEPSEEK_BASE_URL = server.base_url
+        print(f"{len(pdf_files)} 个文件，模拟延迟 {args.latency}s，错误率 {args.error_rate}")
+
+        start = time.perf_counter()
+        for pdf_path in pdf_files:
+            HSBCParser(ai_resolver=ai.parse_lines_batch).parse(str(pdf_path))
+        serial = time.perf_counter() - start
+        serial_requests = server.requests
+        print(f"  串行: {serial:.2f}s，{serial_requests} 个请求")
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            # 流水线使用共享模板库，指向临时文件，不影响项目中的规则文件
+            config.AI_RULES_FILE = str(Path(output_dir) / "rules.json")
+            start = time.perf_counter()
+            run_batch([args.dir], output_dir, jobs=1, use_cache=False)
+            pipelined = time.perf_counter() - start
+        resolver = ai_resolver.get_default_resolver()
+        print(f"  异步: {pipelined:.2f}s（含导出Excel），{server.requests - serial_requests} 个请求，"
+              f"最大并发 {server.max_in_flight}，重试 {resolver.stats['retries']}")
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            ai_cache = AIResponseCache(cache_dir)
+            for label in ("缓存首次", "缓存重跑"):
+                before = server.requests
+                hits, misses = ai_cache.hits, ai_cache.misses
+                start = time.perf_counter()
+                for pdf_path in pdf_files:
+                    HSBCParser(ai_cache=ai_cache).parse(str(pdf_path))
+                elapsed = time.perf_counter() - start
+                hits, misses = ai_cache.hits - hits, ai_cache.misses - misses
+                print(f"  {label}: {elapsed:.2f}s，{server.requests - before} 个请求，命中 {hits}/{hits + misses} 行")
+            ai_cache.close()
+
+        with tempfile.TemporaryDirectory() as rules_dir:
+            rules = ai.RuleBook(str(Path(rules_dir) / "rules.json"))
+            for label in ("模板首次", "模板第二遍"):
+                sent = []
+
+                def counting_resolver(items):
+                    sent.extend(items)
+                    return ai.parse_lines_batch(items)
+
+                start = time.perf_counter()
+                for pdf_path in pdf_files:
+                    HSBCParser(ai_resolver=counting_resolver, ai_rules=rules).parse(str(pdf_path))
+                elapsed = time.perf_counter() - start
+                stats = rules.stats()
+                print(f"  {label}: {elapsed:.2f}s，{len(sent)} 行请求 AI，模板命中 {stats['命中']} 行，"
+                      f"已启用模板 {stats['已启用']}/{stats['模板数']}")
+                rules.hits = rules.misses = 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
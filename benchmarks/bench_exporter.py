@@ -0,0 +1,115 @@
+"""
+Excel导出基准 - 对比原先的「pd.ExcelWriter 写入 → 加载 → 逐格设置样式 → 二次保存」、
+单次写入带样式（整表DataFrame）与分块流式写入
+
+用法:
+    python benchmarks/bench_exporter.py [--rows 50000] [--chunk-size 10000] [--variants single_pass streaming]
+
+原导出方式的耗时随行数超线性增长，大规模测试时可用 --variants 跳过
+
+每种实现在独立子进程中运行，输出耗时和进程内存峰值（ru_maxrss，仅 Unix）
+"""
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import resource
+import multiprocessing
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+from src.exporter import export_to_excel, _create_summary_dataframe, _format_excel_file
+
+
+def legacy_export_to_excel(df: pd.DataFrame, summary: dict, output_path: str) -> str:
+    """原 export_to_excel：pandas 写入后重新加载格式化"""
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Transactions', index=False)
+        _create_summary_dataframe(summary).to_excel(writer, sheet_name='Summary', index=False)
+    _format_excel_file(output_path)
+    return output_path
+
+
+def make_ledger(rows: int, seed: int = 0) -> pd.DataFrame:
+    """生成标准化后的 9 列交易表（借贷互斥，余额连续）"""
+    rng = np.random.default_rng(seed)
+    amounts = rng.uniform(1, 50000, rows).round(2)
+    is_debit = rng.random(rows) < 0.6
+    debit = np.where(is_debit, amounts, np.nan)
+    credit = np.where(is_debit, np.nan, amounts)
+    balance = (np.nan_to_num(credit) - np.nan_to_num(debit)).cumsum().round(2) + 1_000_000
+    dates = pd.date_range("2024-01-01", periods=rows, freq="15min").strftime("%Y-%m-%d")
+    return pd.DataFrame({
+        'Date': dates,
+        'Account Currency': 'HKD',
+        'Payer': np.where(is_debit, 'Self', 'MONX TEAM LTD'),
+        'Payee': np.where(is_debit, 'MONX TEAM LTD', 'Self'),
+        'Debit': debit,
+        'Credit': credit,
+        'Balance': balance,
+        'Reference': '',
+        'Description': 'Pay HKD to MONX TEAM LTD'
+    })
+
+
+def iter_ledger_chunks(rows: int, chunk_size: int):
+    """逐块生成交易表，任一时刻只有一块在内存中"""
+    for seed, start in enumerate(range(0, rows, chunk_size)):
+        yield make_ledger(min(chunk_size, rows - start), seed=seed)
+
+
+VARIANTS = {
+    "legacy": "写入→加载→格式化→保存",
+    "single_pass": "单次写入带样式",
+    "streaming": "分块流式写入"
+}
+
+
+def _run_exporter(name: str, rows: int, chunk_size: int, output_path: str, queue):
+    """子进程：生成数据并导出，回传 (耗时秒, 进程内存峰值MB, 导出前内存MB)"""
+    logging.disable(logging.WARNING)
+    summary = {'原始文件': 'bench.pdf', '银行': 'HSBC', '账户币种': 'HKD', '交易笔数': rows}
+    data = iter_ledger_chunks(rows, chunk_size) if name == "streaming" else make_ledger(rows)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    if name == "legacy":
+        legacy_export_to_excel(data, summary, output_path)
+    else:
+        export_to_excel(data, summary, output_path)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, baseline))
+
+
+def measure(name: str, rows: int, chunk_size: int, output_path: str):
+    """在独立子进程中运行导出，避免各实现的内存峰值互相影响"""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_exporter, args=(name, rows, chunk_size, output_path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Excel导出基准")
+    arg_parser.add_argument("--rows", type=int, default=50000)
+    arg_parser.add_argument("--chunk-size", type=int, default=10000, help="分块流式写入的每块行数")
+    arg_parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    args = arg_parser.parse_args()
+
+    print(f"{args.rows:,} 行")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in args.variants:
+            elapsed, peak, baseline = measure(name, args.rows, args.chunk_size, str(Path(tmp_dir) / f"{name}.xlsx"))
+            print(f"  {VARIANTS[name]:<12} {elapsed:8.2f}s  内存峰值 {peak:7.1f} MB（导出前 {baseline:.1f} MB）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+AI 兜底率基准 - 逐文件统计需要 AI 兜底的行数及原因（不发出请求）
+
+兜底原因：
+- 数学校验失败：上一笔余额 + 收入 - 支出 与印出的余额不符
+- 无金额：像交易的行没有提取到任何金额
+承前余额：按 B/F BALANCE / Balance Brought Forward 设定起始余额的区段数
+
+用法:
+    python benchmarks/bench_fallback_rate.py [--dir HSBC]
+"""
+import sys
+import logging
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.batch import find_pdf_files
+from src.parsers import HSBCParser
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="AI 兜底率基准")
+    arg_parser.add_argument("--dir", default=str(project_root / "HSBC"))
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    pdf_files = find_pdf_files([args.dir])
+
+    def no_ai(items):
+        return [None] * len(items)
+
+    columns = ("交易笔数", "AI兜底行数", "数学校验失败", "无金额", "承前余额")
+    totals = dict.fromkeys(columns, 0)
+    print(f"{'文件':<40}" + "".join(f"{name:>10}" for name in columns) + f"{'兜底率':>10}")
+    for pdf_path in pdf_files:
+        parser = HSBCParser(ai_resolver=no_ai)
+        parser.parse(str(pdf_path))
+        stats = parser.fallback_stats
+        for name in columns:
+            totals[name] += stats[name]
+        print(f"{Path(pdf_path).name:<40}" + "".join(f"{stats[name]:>10}" for name in columns)
+              + f"{stats['兜底率']:>10.1%}")
+
+    rate = totals["AI兜底行数"] / totals["交易笔数"] if totals["交易笔数"] else 0.0
+    print(f"{'合计':<40}" + "".join(f"{totals[name]:>10}" for name in columns) + f"{rate:>10.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
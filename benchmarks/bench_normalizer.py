@@ -0,0 +1,114 @@
+"""
+金额列标准化基准 - 对比原先逐单元格 result.loc[idx] 写入与整列向量化实现
+
+用法:
+    python benchmarks/bench_normalizer.py [--sizes 1000 100000 1000000] [--legacy-max 100000]
+
+逐单元格实现的耗时随行数超线性增长，超过 --legacy-max 的规模只测新实现
+"""
+import re
+import sys
+import time
+import random
+import logging
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+from src.normalizer import _normalize_amount_column, normalize_dataframe
+
+
+def legacy_normalize_amount_column(series: pd.Series) -> pd.Series:
+    """原 _normalize_amount_column 的逐单元格实现（作为对照）"""
+    result = pd.Series(dtype=float)
+    for idx, value in series.items():
+        if pd.isna(value) or value == '' or value is None:
+            result.loc[idx] = None
+        elif isinstance(value, (int, float)):
+            result.loc[idx] = float(value)
+        elif isinstance(value, str):
+            value_clean = value.strip()
+            if value_clean == '':
+                result.loc[idx] = None
+            else:
+                try:
+                    result.loc[idx] = float(value_clean)
+                except ValueError:
+                    numbers = re.findall(r'[\d,]+\.?\d*', value_clean)
+                    if numbers:
+                        try:
+                            result.loc[idx] = float(numbers[-1].replace(',', ''))
+                        except ValueError:
+                            result.loc[idx] = None
+                    else:
+                        result.loc[idx] = None
+        else:
+            result.loc[idx] = None
+    return result
+
+
+def make_amounts(rows: int, seed: int = 0) -> pd.Series:
+    """生成混合金额列：浮点数、空字符串、带千位分隔符和币种后缀的字符串"""
+    rng = random.Random(seed)
+    values = []
+    for _ in range(rows):
+        amount = round(rng.uniform(0, 500000), 2)
+        kind = rng.random()
+        if kind < 0.5:
+            values.append(amount)
+        elif kind < 0.7:
+            values.append('')
+        elif kind < 0.9:
+            values.append(f"{amount:,.2f} HKD")
+        else:
+            values.append(f"{amount:.2f}")
+    return pd.Series(values, dtype=object)
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    """生成解析器输出形态的交易表"""
+    return pd.DataFrame({
+        'Date': ['2024-06-23'] * rows,
+        'Account Currency': ['HKD'] * rows,
+        'Payer': ['Self'] * rows,
+        'Payee': ['MONX TEAM LTD'] * rows,
+        'Debit': make_amounts(rows, 1),
+        'Credit': make_amounts(rows, 2),
+        'Balance': make_amounts(rows, 3),
+        'Reference': [''] * rows,
+        'Description': ['Pay HKD to MONX TEAM LTD'] * rows
+    })
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="金额列标准化基准")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    arg_parser.add_argument("--legacy-max", type=int, default=100000, help="逐单元格实现只测到该行数")
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    print(f"{'行数':>10} {'逐单元格(s)':>12} {'向量化(s)':>10} {'加速比':>8} {'normalize_dataframe(s)':>24}")
+    for rows in args.sizes:
+        series = make_amounts(rows)
+        vectorized = timed(_normalize_amount_column, series)
+        legacy = timed(legacy_normalize_amount_column, series) if rows <= args.legacy_max else None
+        full = timed(normalize_dataframe, make_frame(rows))
+
+        legacy_text = f"{legacy:12.3f}" if legacy is not None else f"{'-':>12}"
+        speedup = f"{legacy / vectorized:7.0f}x" if legacy is not None else f"{'-':>8}"
+        print(f"{rows:>10,} {legacy_text} {vectorized:10.3f} {speedup} {full:24.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+输出格式基准 - 各格式的写入耗时、文件大小和下游加载耗时
+
+用法:
+    python benchmarks/bench_sinks.py [--rows 20000] [--formats xlsx parquet feather csv]
+"""
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+from src.sinks import SINKS, get_sink, read_output
+from benchmarks.bench_exporter import make_ledger
+
+
+def load(name: str, path: str) -> pd.DataFrame:
+    """按下游常用方式加载输出文件"""
+    if name == "xlsx":
+        return pd.read_excel(path, sheet_name="Transactions")
+    if name == "csv":
+        return pd.read_csv(path, parse_dates=["Date"])
+    return read_output(path)[0]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="输出格式基准")
+    arg_parser.add_argument("--rows", type=int, default=20000)
+    arg_parser.add_argument("--formats", nargs="+", choices=list(SINKS), default=list(SINKS))
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    df = make_ledger(args.rows)
+    print(f"{args.rows:,} 行")
+    print(f"  {'格式':<8} {'写入(s)':>8} {'大小(MB)':>9} {'加载(s)':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in args.formats:
+            sink = get_sink(name)
+            path = str(Path(tmp_dir) / f"ledger{sink.suffix}")
+            start = time.perf_counter()
+            sink.write(df, {}, path)
+            write_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded = load(name, path)
+            load_seconds = time.perf_counter() - start
+            assert len(loaded) == len(df)
+
+            size_mb = Path(path).stat().st_size / 1024 / 1024
+            print(f"  {name:<8} {write_seconds:8.3f} {size_mb:9.2f} {load_seconds:8.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+基准套件 - 样本对账单逐阶段计时 + 合成数据标准化/导出，可与 JSON 基线比较
+
+对账单（默认 HSBC/ 和 Airwallex/ 下所有 PDF）每个文件依次计时以下阶段：
+    open      打开 PDF 并读取页数
+    text      逐页 extract_text()
+    tables    逐页 extract_tables()（线条不足的页面按 may_contain_table 跳过，同解析流程）
+    parse     解析器 parse_document（页面提取结果已在文档会话中，只计解析逻辑；不请求 AI）
+    normalize normalize_dataframe + normalize_summary
+    export    export_to_excel
+每个阶段报告所有文件 × 重复次数的中位数和 p95，以及整体页/秒和进程内存峰值。
+
+合成数据：normalize_dataframe 和 export_to_excel 在 10k / 100k / 1M 行上各运行一次，
+每个规模在独立子进程中运行，分别记录内存峰值（Linux 为 VmHWM，其他 Unix 为 ru_maxrss）。
+
+基线：--save-baseline 写入 JSON；之后的运行读取基线，任一指标的耗时超过
+基线 × (1 + --threshold) 时列为回归，退出码为 1。
+
+用法:
+    python benchmarks/bench_suite.py [--repeat 3] [--sizes 10000 100000 1000000] [--skip-synthetic]
+    python benchmarks/bench_suite.py --save-baseline [--baseline benchmarks/baseline.json]
+    python benchmarks/bench_suite.py --threshold 0.2
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import resource
+import statistics
+import multiprocessing
+from pathlib import Path
+from typing import Dict, Any, List, Callable
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+import pdfplumber
+from src.batch import find_pdf_files, select_parser
+from src.normalizer import normalize_dataframe, normalize_summary
+from src.exporter import export_to_excel
+from src.parsers.document import PDFDocument
+from benchmarks.bench_normalizer import make_frame
+from benchmarks.bench_exporter import make_ledger
+
+
+STAGES = ("open", "text", "tables", "parse", "normalize", "export")
+DEFAULT_BASELINE = project_root / "benchmarks" / "baseline.json"
+
+
+def peak_rss_mb() -> float:
+    """
+    当前进程的内存峰值（MB）
+
+    Linux 上读取 /proc/self/status 的 VmHWM（exec 后重新计数）；
+    ru_maxrss 在 exec 后保留父进程的峰值，只在没有 /proc 时使用
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """最近秩法百分位数"""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {"median": statistics.median(samples), "p95": percentile(samples, 0.95), "n": len(samples)}
+
+
+def no_ai(items):
+    """基准不请求 AI：兜底行保持正则结果，耗时只反映本地解析"""
+    return [None] * len(items)
+
+
+def time_file(pdf_path: Path, output_dir: str) -> Dict[str, Any]:
+    """
+    对单个 PDF 逐阶段计时
+
+    返回:
+        {"pages": 页数, "stages": {阶段: 秒}}；无法识别银行类型时返回 None
+    """
+    parser = select_parser(str(pdf_path))
+    if parser is None:
+        return None
+    if hasattr(parser, "ai_resolver"):
+        parser.ai_resolver = no_ai
+
+    stages: Dict[str, float] = {}
+
+    def timed(stage: str, func: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        value = func()
+        stages[stage] = time.perf_counter() - start
+        return value
+
+    with PDFDocument(str(pdf_path)) as doc:
+        pages = timed("open", lambda: doc.page_count)
+        timed("text", lambda: [doc.page_text(i) for i in range(pages)])
+        timed("tables", lambda: [doc.page_tables(i) for i in range(pages)])
+        df, summary = timed("parse", lambda: parser.parse_document(doc))
+    df, summary = timed("normalize", lambda: (normalize_dataframe(df), normalize_summary(summary)))
+    output_path = str(Path(output_dir) / f"{pdf_path.stem}.xlsx")
+    timed("export", lambda: export_to_excel(df, summary, output_path))
+    return {"pages": pages, "stages": stages}
+
+
+def run_corpus(dirs: List[str], repeat: int) -> Dict[str, Any]:
+    """样本对账单逐阶段基准"""
+    pdf_files = find_pdf_files(dirs)
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    pages = 0
+    elapsed = 0.0
+    with tempfile.TemporaryDirectory() as output_dir:
+        for _ in range(repeat):
+            for pdf_path in pdf_files:
+                timing = time_file(pdf_path, output_dir)
+                if timing is None:
+                    continue
+                pages += timing["pages"]
+                for stage, seconds in timing["stages"].items():
+                    samples[stage].append(seconds)
+                    elapsed += seconds
+
+    return {
+        "files": len(pdf_files),
+        "repeat": repeat,
+        "stages": {stage: summarize(values) for stage, values in samples.items() if values},
+        "pages_per_second": pages / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def _synthetic_worker(kind: str, rows: int, output_path: str, queue):
+    """子进程：生成数据并运行一次，回传 (耗时秒, 进程内存峰值MB)"""
+    logging.disable(logging.WARNING)
+    if kind == "normalize":
+        frame = make_frame(rows)
+        start = time.perf_counter()
+        normalize_dataframe(frame)
+    else:
+        frame = make_ledger(rows)
+        summary = {'原始文件': 'bench.pdf', '银行': 'HSBC', '账户币种': 'HKD', '交易笔数': rows}
+        start = time.perf_counter()
+        export_to_excel(frame, summary, output_path)
+    queue.put((time.perf_counter() - start, peak_rss_mb()))
+
+
+def run_synthetic(sizes: List[int]) -> Dict[str, Any]:
+    """
+    normalize_dataframe / export_to_excel 合成数据基准，每个规模在独立子进程中运行
+
+    子进程用 spawn 启动：fork 出的子进程会继承父进程（已解析过样本）的内存峰值
+    """
+    context = multiprocessing.get_context("spawn")
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for kind in ("normalize", "export"):
+            for rows in sizes:
+                queue = context.Queue()
+                process = context.Process(
+                    target=_synthetic_worker, args=(kind, rows, str(Path(tmp_dir) / f"{rows}.xlsx"), queue)
+                )
+                process.start()
+                seconds, peak = queue.get()
+                process.join()
+                results[f"{kind}_{rows}"] = {"seconds": seconds, "peak_rss_mb": peak}
+                print(f"  {kind:<10} {rows:>10,} 行 {seconds:8.3f}s  内存峰值 {peak:7.1f} MB")
+    return results
+
+
+def timing_metrics(result: Dict[str, Any]) -> Dict[str, float]:
+    """参与回归比较的耗时指标：各阶段中位数/p95 和合成数据耗时"""
+    metrics: Dict[str, float] = {}
+    for stage, stats in result.get("corpus", {}).get("stages", {}).items():
+        metrics[f"{stage}.median"] = stats["median"]
+        metrics[f"{stage}.p95"] = stats["p95"]
+    for name, stats in result.get("synthetic", {}).items():
+        metrics[name] = stats["seconds"]
+    return metrics
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    与基线比较
+
+    返回:
+        回归描述列表（耗时超过基线 × (1 + threshold) 的指标；基线中没有的指标不比较）
+    """
+    ours, theirs = timing_metrics(current), timing_metrics(baseline)
+    regressions = []
+    for name, seconds in ours.items():
+        reference = theirs.get(name)
+        if reference and seconds > reference * (1 + threshold):
+            regressions.append(f"{name}: {reference:.4f}s -> {seconds:.4f}s（+{seconds / reference - 1:.0%}）")
+    return regressions
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pdfplumber": pdfplumber.__version__,
+        "pandas": pd.__version__,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="基准套件")
+    arg_parser.add_argument("--dirs", nargs="+", default=[str(project_root / "HSBC"), str(project_root / "Airwallex")])
+    arg_parser.add_argument("--repeat", type=int, default=3, help="样本对账单重复次数")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="合成数据行数")
+    arg_parser.add_argument("--skip-synthetic", action="store_true", help="不运行合成数据基准")
+    arg_parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="JSON 基线文件")
+    arg_parser.add_argument("--save-baseline", action="store_true", help="把本次结果写为基线")
+    arg_parser.add_argument("--threshold", type=float, default=0.2, help="回归阈值（相对基线的增幅）")
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    result: Dict[str, Any] = {"environment": environment()}
+
+    corpus = run_corpus(args.dirs, args.repeat)
+    result["corpus"] = corpus
+    print(f"样本对账单: {corpus['files']} 个文件 × {corpus['repeat']} 次")
+    print(f"  {'阶段':<10} {'中位数(ms)':>12} {'p95(ms)':>10}")
+    for stage, stats in corpus["stages"].items():
+        print(f"  {stage:<10} {stats['median'] * 1000:12.1f} {stats['p95'] * 1000:10.1f}")
+    print(f"  {corpus['pages_per_second']:.1f} 页/秒，内存峰值 {corpus['peak_rss_mb']:.1f} MB")
+
+    if not args.skip_synthetic:
+        print("合成数据:")
+        result["synthetic"] = run_synthetic(args.sizes)
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"基线已保存: {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"没有基线文件（{baseline_path}），使用 --save-baseline 创建")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    regressions = compare(result, baseline, args.threshold)
+    if regressions:
+        print(f"相对基线（{baseline['environment']['date']}）的回归，阈值 +{args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  ❌ {line}")
+        return 1
+    print(f"✅ 无回归（基线 {baseline['environment']['date']}，阈值 +{args.threshold:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+模拟 OpenAI chat-completions 接口的本地 HTTP 服务（用于测试和基准 AI 兜底，不访问网络）
+
+- 每个请求等待 latency 秒后返回（可加 jitter 随机波动）
+- 按 error_rate 随机返回 500，按 rate_limit_rate 随机返回 429
+- 默认应答：从编号批量提示词中取出每一行，返回对应 id 的 JSON 数组
+
+用法:
+    python benchmarks/mock_openai_server.py [--port 8765] [--latency 0.5] [--error-rate 0.1]
+    然后在 config.py 中设置 DEEPSEEK_BASE_URL = "http://127.0.0.1:8765/v1"
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+
+# 编号批量提示词中的行：「N. 日期: ... | 交易详情: ...」
+NUMBERED_LINE = re.compile(r'^(\d+)\. 日期: .*? \| 交易详情: (.*)$', re.MULTILINE)
+AMOUNT = re.compile(r'\d[\d,]*\.\d{2}')
+
+
+def default_responder(messages: List[Dict[str, str]]) -> str:
+    """按编号逐行应答：行内最后一个金额作为支出，payee 为行文本的第一个词"""
+    prompt = messages[-1]["content"]
+    records = []
+    for number, line_text in NUMBERED_LINE.findall(prompt):
+        amounts = AMOUNT.findall(line_text)
+        words = line_text.split()
+        records.append({
+            "id": int(number),
+            "debit": amounts[-1] if amounts else "",
+            "credit": "",
+            "balance": "",
+            "payee": words[0] if words else "Unknown"
+        })
+    return json.dumps(records, ensure_ascii=False)
+
+
+class MockChatServer:
+    """
+    本地模拟服务，可作为上下文管理器使用
+
+    用法:
+        with MockChatServer(latency=0.2, error_rate=0.1) as server:
+            client = AsyncOpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+            ...
+        server.requests / server.errors / server.max_in_flight
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, seed: Optional[int] = None,
+                 responder: Callable[[List[Dict[str, str]]], str] = default_responder,
+                 host: str = "127.0.0.1", port: int = 0):
+        """
+        参数:
+            latency: 每个请求的基础延迟（秒）
+            jitter: 延迟随机波动上限（秒）
+            error_rate: 返回 500 的概率
+            rate_limit_rate: 返回 429 的概率
+            seed: 随机种子（可复现错误序列）
+            responder: 根据 messages 生成 assistant 回复内容
+            port: 0 表示自动分配
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.responder = responder
+        self.rng = random.Random(seed)
+
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.request_times: List[float] = []
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, payload = server.handle(self.path, json.loads(body or b"{}"))
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def handle(self, path: str, request: Dict[str, Any]):
+        """处理一个请求，返回 (状态码, JSON)"""
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.request_times.append(time.monotonic())
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+            roll = self.rng.random()
+        try:
+            time.sleep(delay)
+            if not path.endswith("/chat/completions"):
+                return 404, {"error": {"message": f"unknown path {path}", "type": "invalid_request_error"}}
+            if roll < self.rate_limit_rate:
+                with self._lock:
+                    self.errors += 1
+                return 429, {"error": {"message": "rate limited", "type": "rate_limit_error"}}
+            if roll < self.rate_limit_rate + self.error_rate:
+                with self._lock:
+                    self.errors += 1
+                return 500, {"error": {"message": "injected failure", "type": "server_error"}}
+
+            content = self.responder(request.get("messages", []))
+            return 200, {
+                "id": f"chatcmpl-mock-{self.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            }
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def start(self) -> "MockChatServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockChatServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="模拟 OpenAI chat-completions 服务")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--latency", type=float, default=0.5)
+    arg_parser.add_argument("--jitter", type=float, default=0.0)
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    arg_parser.add_argument("--seed", type=int, default=None)
+    args = arg_parser.parse_args()
+
+    server = MockChatServer(args.latency, args.jitter, args.error_rate, args.rate_limit_rate, args.seed, port=args.port)
+    print(f"模拟服务: {server.base_url}（Ctrl+C 退出）")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"共 {server.requests} 个请求，错误 {server.errors}，最大并发 {server.max_in_flight}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
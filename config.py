@@ -5,6 +5,15 @@
 DEEPSEEK_API_KEY = ""  # ← 用户在此填写API Key
 DEEPSEEK_BASE_URL = "https://api.deepseek.com"
 DEEPSEEK_MODEL = "deepseek-chat"
+AI_MAX_CONCURRENCY = 4  # 同时进行的 AI 请求数上限
+AI_RATE_LIMIT_PER_SECOND = 5  # 平均每秒 AI 请求数（令牌桶）
+AI_RATE_LIMIT_BURST = 5  # 允许的突发请求数（令牌桶容量）
+AI_TIMEOUT_SECONDS = 60  # 单次 AI 请求超时（秒）
+AI_CONNECT_TIMEOUT_SECONDS = 5  # AI 接口连接超时（秒）
+AI_MAX_RETRIES = 3  # AI 请求失败后的最大重试次数（指数退避 + 随机抖动）
+AI_RULES_FILE = ""  # 从 AI 答案学到的行模板（带版本号的 JSON），匹配的行不再请求 AI；空表示 CACHE_DIR/ai_rules.json
+AI_RULES_MIN_SUPPORT = 2  # 同一模板得到N次一致的 AI 答案后启用
+AI_CIRCUIT_BREAKER_THRESHOLD = 5  # AI 请求连续失败N次后熔断，本次运行剩余行只用正则结果（0 表示不熔断）
 
 # === OCR配置（V2功能，暂不启用）===
 OCR_PROVIDER = ""  # 可选: "textin", "baidu", ""(不使用)
@@ -12,3 +21,24 @@ TEXTIN_API_KEY = ""
 BAIDU_API_KEY = ""
 BAIDU_SECRET_KEY = ""
 
+# === 缓存配置 ===
+CACHE_DIR = ".cache"  # 解析结果缓存目录
+CACHE_MAX_MB = 512  # 解析结果缓存上限（MB），超出后按最近最少使用淘汰
+AI_CACHE_TTL_DAYS = 90  # AI 兜底响应缓存有效期（天）
+AI_CACHE_MAX_MB = 64  # AI 兜底响应缓存上限（MB），超出后按最近最少使用淘汰
+
+# === 单文件页面并行提取 ===
+# 进程数：0 表示 CPU 核数，1 表示不并行；批量转换的工作进程内不会再嵌套并行
+PAGE_WORKERS = 0
+# 少于此页数的文件串行提取（进程启动开销大于收益）
+PAGE_PARALLEL_MIN_PAGES = 8
+
+# === 内存限制（每个文件）===
+BOUNDED_MEMORY = False  # 每页处理完后释放 pdfplumber 的版面对象，峰值内存不随页数增长
+MAX_PAGES_PER_FILE = 0  # 页数上限，超过时该文件立即失败（0 表示不限制）
+MAX_RSS_MB = 0  # 进程常驻内存上限（MB），解析中超过时该文件立即失败（0 表示不限制）
+
+# === 运行指标 ===
+METRICS_ENABLED = False  # 记录各阶段耗时（也可用命令行 --metrics 开启）
+METRICS_FILE = "metrics.jsonl"  # 每个文件一行 JSON 的分阶段耗时
+METRICS_PROMETHEUS_FILE = ""  # 汇总 METRICS_FILE 的 Prometheus 文本文件（空表示不写）
@@ -0,0 +1,117 @@
+"""
+命令行入口
+
+用法:
+    python -m src batch HSBC Airwallex --jobs 4 --output-dir output
+    python -m src batch HSBC --format parquet [--amount-unit cents]
+    python -m src batch HSBC --metrics metrics.jsonl [--prometheus metrics.prom]
+    python -m src batch HSBC --bounded-memory --max-pages 500 --max-rss-mb 1024
+    python -m src cache info
+    python -m src cache purge [--older-than DAYS]
+"""
+import sys
+import logging
+import argparse
+
+from . import metrics
+from .batch import run_batch, format_report
+from .parsers import MemoryLimits
+from .cache import ParseCache, PageCache, AIResponseCache
+from .sinks import SINKS, AMOUNT_UNITS
+
+
+def _cmd_batch(args) -> int:
+    """batch 子命令：批量转换目录中的所有 PDF"""
+    if args.metrics or args.prometheus:
+        metrics.enable()
+    defaults = MemoryLimits.from_config()
+    memory_limits = MemoryLimits(
+        bounded=args.bounded_memory or defaults.bounded,
+        max_pages=args.max_pages if args.max_pages is not None else defaults.max_pages,
+        max_rss_mb=args.max_rss_mb if args.max_rss_mb is not None else defaults.max_rss_mb
+    )
+    report = run_batch(args.paths, output_dir=args.output_dir, jobs=args.jobs,
+                       cache_dir=args.cache_dir, use_cache=not args.no_cache,
+                       output_format=args.format, amount_unit=args.amount_unit,
+                       metrics_file=args.metrics, prometheus_file=args.prometheus,
+                       memory_limits=memory_limits)
+    print(format_report(report))
+    return 0 if report["failed"] == 0 else 1
+
+
+def _cmd_cache(args) -> int:
+    """cache 子命令：查看或清理解析结果缓存、逐页提取缓存和 AI 响应缓存"""
+    cache = ParseCache(args.cache_dir)
+    page_cache = PageCache(args.cache_dir)
+    ai_cache = AIResponseCache(args.cache_dir)
+    if args.action == "purge":
+        removed = cache.purge(older_than_days=args.older_than)
+        print(f"已删除 {removed} 个解析结果缓存条目")
+        if args.older_than is None:
+            print(f"已删除 {page_cache.purge()} 个页面提取缓存条目")
+            print(f"已删除 {ai_cache.purge()} 个 AI 响应缓存条目")
+    else:
+        print("[解析结果缓存]")
+        for key, value in cache.stats().items():
+            print(f"{key}: {value}")
+        print("[页面提取缓存]")
+        for key, value in page_cache.stats().items():
+            print(f"{key}: {value}")
+        print("[AI 响应缓存]")
+        for key, value in ai_cache.stats().items():
+            if key not in ("命中", "未命中", "命中率"):
+                print(f"{key}: {value}")
+    page_cache.close()
+    ai_cache.close()
+    return 0
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="python -m src", description="银行对账单转换器")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出详细日志")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="批量转换目录中的PDF对账单")
+    batch_parser.add_argument("paths", nargs="+", help="PDF文件或目录（递归查找）")
+    batch_parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数（默认: CPU核数）")
+    batch_parser.add_argument("-o", "--output-dir", default="output", help="输出目录（默认: output）")
+    batch_parser.add_argument("--cache-dir", default=None, help="解析结果缓存目录（默认: config.CACHE_DIR）")
+    batch_parser.add_argument("--no-cache", action="store_true", help="不读写缓存（解析结果、页面提取、AI 响应和学到的行模板）")
+    batch_parser.add_argument("--format", choices=list(SINKS), default="xlsx",
+                              help="输出格式（默认: xlsx；parquet/feather/csv 供下游分析加载）")
+    batch_parser.add_argument("--amount-unit", choices=list(AMOUNT_UNITS), default="float",
+                              help="parquet/feather/csv 的金额单位：float 或整数分 cents（默认: float）")
+    batch_parser.add_argument("--bounded-memory", action="store_true",
+                              help="每页处理完后释放版面对象，峰值内存不随页数增长（默认: config.BOUNDED_MEMORY）")
+    batch_parser.add_argument("--max-pages", type=int, default=None,
+                              help="单个文件的页数上限，超过时该文件失败（默认: config.MAX_PAGES_PER_FILE，0 不限制）")
+    batch_parser.add_argument("--max-rss-mb", type=float, default=None,
+                              help="解析中进程常驻内存上限（MB），超过时该文件失败（默认: config.MAX_RSS_MB，0 不限制）")
+    batch_parser.add_argument("--metrics", metavar="FILE", default=None,
+                              help="记录各阶段耗时，每个文件一行 JSON 追加到 FILE（默认: config.METRICS_FILE，需 METRICS_ENABLED）")
+    batch_parser.add_argument("--prometheus", metavar="FILE", default=None,
+                              help="同时把全部耗时记录汇总为 Prometheus 文本文件（如 node_exporter textfile 目录）")
+    batch_parser.set_defaults(func=_cmd_batch)
+
+    cache_parser = subparsers.add_parser("cache", help="查看或清理解析结果缓存、页面提取缓存和 AI 响应缓存")
+    cache_parser.add_argument("action", choices=["info", "purge"], help="info: 查看统计; purge: 清理")
+    cache_parser.add_argument("--older-than", type=float, default=None, help="purge 时只删除超过N天未使用的解析结果条目（保留页面提取缓存和 AI 响应缓存）")
+    cache_parser.add_argument("--cache-dir", default=None, help="缓存目录（默认: config.CACHE_DIR）")
+    cache_parser.set_defaults(func=_cmd_cache)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    """命令行主函数"""
+    args = build_arg_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
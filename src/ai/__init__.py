@@ -0,0 +1,17 @@
+"""
+AI 兜底解析模块（DeepSeek）
+- deepseek: 提示词构建、请求和响应解析（单行 / 编号批量）
+- queue: 解析过程中收集需要 AI 兜底的行，解析结束后分批请求并回填交易记录
+- resolver: 异步并发请求（并发上限、令牌桶限速、超时、抖动重试）
+- breaker: 连续失败后熔断，剩余行只用正则结果
+- rules: 从 AI 答案学习行模板，同形状的行不再请求 AI
+"""
+from .deepseek import BATCH_SIZE, is_configured, model_name, get_client, parse_line, parse_lines_batch
+from .breaker import CircuitBreaker, get_circuit_breaker
+from .resolver import AsyncAIResolver, TokenBucket, get_default_resolver
+from .rules import RuleBook, get_rule_book
+from .queue import AIFallbackQueue, PendingLine
+
+__all__ = ['BATCH_SIZE', 'is_configured', 'model_name', 'get_client', 'parse_line', 'parse_lines_batch',
+           'CircuitBreaker', 'get_circuit_breaker', 'AsyncAIResolver', 'TokenBucket', 'get_default_resolver',
+           'RuleBook', 'get_rule_book', 'AIFallbackQueue', 'PendingLine']
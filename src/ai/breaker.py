@@ -0,0 +1,71 @@
+"""
+熔断器 - AI 接口连续失败后，本次运行的剩余兜底行直接使用正则结果
+
+DeepSeek 故障时每行都要等到超时，一次几秒的转换会拖成几分钟；
+连续失败达到阈值（config.AI_CIRCUIT_BREAKER_THRESHOLD）后熔断，之后不再发出请求。
+"""
+import os
+import logging
+import threading
+from typing import Optional
+
+# 导入配置文件
+try:
+    import config
+except ImportError:
+    config = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    连续失败计数熔断器（线程安全）
+
+    - record_failure(): 请求失败（网络错误、超时、服务端错误）；连续达到 threshold 次后熔断
+    - record_success(): 请求成功，连续失败计数清零
+    - is_open: 已熔断；熔断后保持到 reset()（即本次运行剩余部分）
+    - threshold 为 0 表示不熔断
+    """
+
+    def __init__(self, threshold: Optional[int] = None):
+        if threshold is None:
+            threshold = getattr(config, 'AI_CIRCUIT_BREAKER_THRESHOLD', 5) if config else 5
+        self.threshold = threshold
+        self.consecutive_failures = 0
+        self._open = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._open
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.threshold and not self._open and self.consecutive_failures >= self.threshold:
+                self._open = True
+                logger.warning(f"AI 接口连续失败 {self.consecutive_failures} 次，已熔断，剩余兜底行使用正则结果")
+
+    def reset(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self._open = False
+
+
+_default_breaker: Optional[CircuitBreaker] = None
+_default_breaker_pid: Optional[int] = None
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """进程内共享的熔断器（每个工作进程独立计数）"""
+    global _default_breaker, _default_breaker_pid
+    if _default_breaker is None or _default_breaker_pid != os.getpid():
+        _default_breaker = CircuitBreaker()
+        _default_breaker_pid = os.getpid()
+    return _default_breaker
@@ -0,0 +1,313 @@
+"""
+DeepSeek 调用 - 提示词构建、请求和响应解析
+
+单行解析（parse_line）保留原先的提示词；批量解析（parse_lines_batch）把多行编成带编号的列表，
+一次请求返回对应的 JSON 数组（见 plan.md §3.2）。
+
+未传入 client 时使用进程内共享的客户端（get_client），复用连接池中的 keep-alive 连接；
+请求失败计入共享熔断器，熔断后直接返回 None（使用正则结果）。
+"""
+import os
+import json
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    from openai import OpenAI, Timeout
+except ImportError:
+    OpenAI = None
+    Timeout = None
+
+from ..utils import parse_amount
+from .breaker import get_circuit_breaker
+from .. import metrics
+
+# 导入配置文件
+try:
+    import config
+except ImportError:
+    config = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# 每批处理的行数
+BATCH_SIZE = 15
+
+SYSTEM_PROMPT = "你是一个专业的银行对账单解析助手。只返回有效的 JSON 格式数据，不要包含任何其他文字。"
+
+# 字段说明和金融常识（单行与批量共用）
+FIELD_RULES = """请提取以下信息：
+1. Debit (支出金额): 如果有支出，返回数值（不含逗号，保留2位小数）；如果没有，返回空字符串或0
+2. Credit (收入金额): 如果有收入，返回数值（不含逗号，保留2位小数）；如果没有，返回空字符串或0
+3. Balance (余额): 通常在文本末尾的大数字，返回数值（不含逗号，保留2位小数）
+4. Payee (收款方/付款方): 提取交易对手方名称，如果无法识别返回"Unknown"
+
+金融常识提示：
+- Balance 通常出现在行末
+- Debit 通常用于 Withdrawal/POS/转账支出等场景
+- Credit 通常用于 Deposit/转账收入/Interest 等场景
+- 同一行通常只有 Debit 或 Credit 其中之一，不会同时存在"""
+
+
+# 已记录过的"AI 不可用"警告（每个原因每个进程只记录一次）
+_unavailable_warned = set()
+
+
+def _warn_unavailable(message: str):
+    if message not in _unavailable_warned:
+        _unavailable_warned.add(message)
+        logger.warning(message)
+
+
+def is_configured() -> bool:
+    """是否可以调用 AI（已配置 API Key 且已安装 openai 库）；不可用时记录一次警告"""
+    if not config or not getattr(config, 'DEEPSEEK_API_KEY', ''):
+        _warn_unavailable("DeepSeek API Key 未配置，跳过 AI 解析")
+        return False
+    if not OpenAI:
+        _warn_unavailable("openai 库未安装，无法使用 AI 解析")
+        return False
+    return True
+
+
+def model_name() -> str:
+    return getattr(config, 'DEEPSEEK_MODEL', 'deepseek-chat') if config else 'deepseek-chat'
+
+
+def request_timeout():
+    """请求超时：连接超时 config.AI_CONNECT_TIMEOUT_SECONDS，读取超时 config.AI_TIMEOUT_SECONDS"""
+    read = getattr(config, 'AI_TIMEOUT_SECONDS', 60.0) if config else 60.0
+    connect = getattr(config, 'AI_CONNECT_TIMEOUT_SECONDS', 5.0) if config else 5.0
+    return Timeout(read, connect=connect) if Timeout else read
+
+
+def create_client():
+    """
+    创建 DeepSeek 客户端（OpenAI 兼容接口）
+
+    关闭客户端自带的重试：每次失败都要及时计入熔断器，重试（config.AI_MAX_RETRIES）
+    由 AsyncAIResolver 的退避循环负责，单次调用的耗时不超过一个请求超时
+    """
+    return OpenAI(
+        api_key=config.DEEPSEEK_API_KEY,
+        base_url=getattr(config, 'DEEPSEEK_BASE_URL', 'https://api.deepseek.com'),
+        timeout=request_timeout(),
+        max_retries=0
+    )
+
+
+_shared_client = None
+_shared_client_pid: Optional[int] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_client():
+    """进程内共享的客户端（连接池复用 keep-alive 连接；fork 出的子进程重新创建）"""
+    global _shared_client, _shared_client_pid
+    with _shared_client_lock:
+        if _shared_client is None or _shared_client_pid != os.getpid():
+            _shared_client = create_client()
+            _shared_client_pid = os.getpid()
+        return _shared_client
+
+
+def build_line_prompt(line_text: str, date_str: str) -> str:
+    """单行解析提示词"""
+    return f"""你是一个银行对账单解析专家。请从以下一行银行交易文本中提取结构化信息。
+
+输入文本（可能格式错乱）：
+日期: {date_str}
+交易详情: {line_text}
+
+{FIELD_RULES}
+
+请返回 JSON 格式，示例：
+{{
+    "debit": "1234.56",
+    "credit": "",
+    "balance": "98765.43",
+    "payee": "MERCHANT NAME"
+}}
+
+或：
+{{
+    "debit": "",
+    "credit": "5000.00",
+    "balance": "103765.43",
+    "payee": "PAYER NAME"
+}}
+
+只返回 JSON，不要其他文字说明。"""
+
+
+def build_batch_prompt(items: List[Tuple[str, str]]) -> str:
+    """
+    批量解析提示词
+
+    参数:
+        items: [(交易详情, 日期), ...]，按 1 开始编号
+    """
+    numbered = "\n".join(f"{i}. 日期: {date_str} | 交易详情: {line_text}" for i, (line_text, date_str) in enumerate(items, 1))
+    return f"""你是一个银行对账单解析专家。以下是编号的银行交易文本列表（每行可能格式错乱），请逐条提取结构化信息。
+
+{numbered}
+
+{FIELD_RULES}
+
+请返回 JSON 数组，每条记录一个对象，用 "id" 字段标明对应的编号，示例：
+[
+    {{"id": 1, "debit": "1234.56", "credit": "", "balance": "98765.43", "payee": "MERCHANT NAME"}},
+    {{"id": 2, "debit": "", "credit": "5000.00", "balance": "103765.43", "payee": "PAYER NAME"}}
+]
+
+只返回 JSON，不要其他文字说明。"""
+
+
+def strip_code_fence(text: str) -> str:
+    """清理可能的 markdown 代码块标记"""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def to_line_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    AI 返回的单条记录 -> 解析结果
+
+    返回:
+        {"debit": float或'', "credit": float或'', "balance": float或None, "payee": str}
+    """
+    return {
+        "debit": parse_amount(str(result.get("debit", ""))) if result.get("debit") else '',
+        "credit": parse_amount(str(result.get("credit", ""))) if result.get("credit") else '',
+        "balance": parse_amount(str(result.get("balance", ""))) if result.get("balance") else None,
+        "payee": result.get("payee", "Unknown")
+    }
+
+
+def build_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def batch_max_tokens(count: int) -> int:
+    """批量请求的 max_tokens（每行结果约 60 tokens，留出余量）"""
+    return min(8000, 200 + 120 * count)
+
+
+@metrics.timed("ai.request")
+def _complete(client, prompt: str, max_tokens: int) -> str:
+    response = client.chat.completions.create(
+        model=model_name(),
+        messages=build_messages(prompt),
+        temperature=0.1,
+        max_tokens=max_tokens
+    )
+    return strip_code_fence(response.choices[0].message.content)
+
+
+def parse_line(line_text: str, date_str: str, client=None) -> Optional[Dict[str, Any]]:
+    """
+    使用 DeepSeek 解析单行交易文本
+
+    返回:
+        {"debit", "credit", "balance", "payee"}，失败返回 None
+    """
+    breaker = get_circuit_breaker()
+    if breaker.is_open:
+        return None
+    if client is None:
+        if not is_configured():
+            return None
+        client = get_client()
+
+    try:
+        result_text = _complete(client, build_line_prompt(line_text, date_str), max_tokens=500)
+    except Exception as e:
+        breaker.record_failure()
+        logger.warning(f"AI 解析失败: {e}, 将使用降级处理")
+        return None
+    breaker.record_success()
+
+    try:
+        parsed_result = to_line_result(json.loads(result_text))
+        logger.info(f"AI 解析成功: {parsed_result}")
+        return parsed_result
+    except json.JSONDecodeError as e:
+        logger.warning(f"AI 返回的 JSON 解析失败: {e}, 原始响应: {result_text[:200]}")
+        return None
+    except Exception as e:
+        logger.warning(f"AI 解析失败: {e}, 将使用降级处理")
+        return None
+
+
+def parse_batch_response(result_text: str, count: int) -> List[Optional[Dict[str, Any]]]:
+    """
+    解析批量响应：按 "id" 对应回输入编号（缺少 id 时按数组顺序），缺失或无效的记录为 None
+    """
+    records = json.loads(result_text)
+    if isinstance(records, dict):
+        # 部分模型会把数组包在一个对象里，如 {"results": [...]}
+        records = next((v for v in records.values() if isinstance(v, list)), [])
+
+    results: List[Optional[Dict[str, Any]]] = [None] * count
+    for position, record in enumerate(records):
+        if not isinstance(record, dict):
+            continue
+        try:
+            index = int(record.get("id", position + 1)) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < count and results[index] is None:
+            results[index] = to_line_result(record)
+    return results
+
+
+def parse_lines_batch(items: List[Tuple[str, str]], client=None) -> List[Optional[Dict[str, Any]]]:
+    """
+    一次请求解析多行交易文本
+
+    参数:
+        items: [(交易详情, 日期), ...]，建议不超过 BATCH_SIZE 行
+        client: OpenAI 兼容客户端，默认为进程内共享的客户端（get_client）
+
+    返回:
+        与 items 一一对应的结果列表；整批失败或某条缺失时对应位置为 None（保留正则结果）
+    """
+    if not items:
+        return []
+    breaker = get_circuit_breaker()
+    if breaker.is_open:
+        return [None] * len(items)
+    if client is None:
+        if not is_configured():
+            return [None] * len(items)
+        client = get_client()
+
+    try:
+        result_text = _complete(client, build_batch_prompt(items), max_tokens=batch_max_tokens(len(items)))
+    except Exception as e:
+        breaker.record_failure()
+        logger.warning(f"AI 批量解析失败: {e}, 本批使用降级处理")
+        return [None] * len(items)
+    breaker.record_success()
+
+    try:
+        results = parse_batch_response(result_text, len(items))
+        logger.info(f"AI 批量解析: {len(items)} 行，成功 {sum(r is not None for r in results)} 行")
+        return results
+    except (json.JSONDecodeError, AttributeError) as e:
+        logger.warning(f"AI 批量返回的 JSON 解析失败: {e}, 原始响应: {result_text[:200]}")
+    except Exception as e:
+        logger.warning(f"AI 批量解析失败: {e}, 本批使用降级处理")
+    return [None] * len(items)
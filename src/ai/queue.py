@@ -0,0 +1,209 @@
+"""
+AI 兜底队列 - 解析过程中只记录需要 AI 兜底的行，全部页面解析完后分批请求，再回填交易记录
+
+原先每遇到一行数学校验失败的交易就同步请求一次 AI；现在同一文件的所有待解析行
+按 BATCH_SIZE 编号成批，一个文件通常只需要一两次请求。
+
+submit() 把各批同时交给异步解析器（见 resolver.py）并立即返回 Future，
+调用方可以在请求进行期间继续解析下一个文件；resolve() 是其同步形式。
+"""
+import logging
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional, Callable, Tuple, NamedTuple
+
+from .deepseek import BATCH_SIZE, model_name
+from .resolver import get_default_resolver
+from ..futures import completed_future, chain_future, gather_futures
+
+
+logger = logging.getLogger(__name__)
+
+
+class PendingLine(NamedTuple):
+    """
+    等待 AI 解析的交易行
+
+    字段:
+        index: 交易在 transactions 列表中的位置（已按正则结果写入）
+        line_text: 合并后的交易详情
+        date_str: 原始日期，如 "8 May"
+    """
+    index: int
+    line_text: str
+    date_str: str
+
+
+class AIFallbackQueue:
+    """
+    AI 兜底队列
+
+    - add(): 交易先按正则结果保存，同时登记待解析行
+    - mark_computed_balance(): 登记余额由「上一笔余额 + 收入 - 支出」推算（而非对账单上印出）的交易
+    - seed_balance(): 登记承前余额（某币种从该位置起的起始余额），重放时使用相同的起点
+    - closing_balances(): 最后一笔交易之后各币种的运行余额（逐页解析时延续到下一页）
+    - submit(): 分批请求 AI，返回 Future；请求完成后回填 Debit/Credit/Balance/Payee，并重放推算的余额
+    - resolve(): submit() 的同步形式
+    - 传入 cache（src.cache.AIResponseCache）时，命中缓存的行不再请求，新的结果写回缓存
+    - 传入 rules（RuleBook）时，匹配已学到模板的行直接按模板解析，新的 AI 答案用于学习模板
+
+    与逐行同步调用的差异：AI 结果只影响其后推算出来的余额；后续行的正则判断
+    （收支方向、数学校验）仍基于正则阶段的余额。
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE,
+                 resolver: Optional[Callable[[List[Tuple[str, str]]], List[Optional[Dict[str, Any]]]]] = None,
+                 cache=None, rules=None):
+        """
+        参数:
+            batch_size: 每次请求的行数
+            resolver: 批量解析函数，输入 [(交易详情, 日期), ...]，返回一一对应的结果；
+                      若还提供 submit(items) -> Future，各批并发提交（默认为进程内共享的 AsyncAIResolver）
+            cache: AI 响应缓存（AIResponseCache），None 表示不使用
+            rules: 行模板库（RuleBook），None 表示不使用
+        """
+        self.batch_size = batch_size
+        self.resolver = resolver or get_default_resolver()
+        self.cache = cache
+        self.rules = rules
+        self.pending: List[PendingLine] = []
+        self.computed_balance_rows = set()
+        self.opening_balances: Dict[int, List[Tuple[str, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def add(self, index: int, line_text: str, date_str: str):
+        self.pending.append(PendingLine(index, line_text, date_str))
+
+    def mark_computed_balance(self, index: int):
+        self.computed_balance_rows.add(index)
+
+    def seed_balance(self, index: int, currency: str, balance: float):
+        """从第 index 笔交易起，currency 的运行余额以 balance 为起点"""
+        self.opening_balances.setdefault(index, []).append((currency, balance))
+
+    def resolve(self, transactions: List[Dict[str, Any]]) -> int:
+        """
+        分批解析所有待解析行并回填
+
+        返回:
+            被 AI 结果更新的交易笔数
+        """
+        return self.submit(transactions).result()
+
+    def submit(self, transactions: List[Dict[str, Any]]) -> Future:
+        """
+        提交所有待解析行，立即返回；请求完成后（在解析器的后台线程中）回填 transactions
+
+        返回:
+            Future，结果为被 AI 结果更新的交易笔数
+        """
+        if not self.pending:
+            return completed_future(0)
+
+        pending, self.pending = self.pending, []
+        model = model_name()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(pending)
+        to_request = []
+        for position, line in enumerate(pending):
+            known = self.cache.get(line.line_text, line.date_str, model) if self.cache else None
+            if known is None and self.rules:
+                known = self.rules.match(line.line_text)
+            if known is not None:
+                results[position] = known
+            else:
+                to_request.append(position)
+        if len(to_request) < len(pending):
+            logger.info(f"AI 响应缓存/行模板命中 {len(pending) - len(to_request)} 行")
+
+        batches = [to_request[start:start + self.batch_size] for start in range(0, len(to_request), self.batch_size)]
+        futures = []
+        for number, batch in enumerate(batches, 1):
+            logger.info(f"AI 兜底批量解析: 第 {number} 批，{len(batch)} 行")
+            items = [(pending[position].line_text, pending[position].date_str) for position in batch]
+            if hasattr(self.resolver, "submit"):
+                futures.append(self.resolver.submit(items))
+            else:
+                futures.append(completed_future(self.resolver(items)))
+
+        def apply(batch_results: List[List[Optional[Dict[str, Any]]]]) -> int:
+            for batch, batch_result in zip(batches, batch_results):
+                for position, result in zip(batch, batch_result):
+                    results[position] = result
+                    if result is None:
+                        continue
+                    if self.cache:
+                        self.cache.put(pending[position].line_text, pending[position].date_str, model, result)
+                    if self.rules:
+                        self.rules.learn(pending[position].line_text, result)
+            if self.cache:
+                self.cache.flush()
+            if self.rules:
+                self.rules.save()
+            return self._apply(transactions, pending, results)
+
+        return chain_future(gather_futures(futures), apply)
+
+    def _apply(self, transactions: List[Dict[str, Any]], pending_lines: List[PendingLine],
+               results: List[Optional[Dict[str, Any]]]) -> int:
+        """按 AI 结果回填交易记录并重放推算余额，返回更新的笔数"""
+        patched = 0
+        first_patched = None
+        for pending, ai_result in zip(pending_lines, results):
+            if not ai_result:
+                # AI 解析失败，使用降级处理（保留正则结果）
+                logger.warning(f"AI 解析失败，使用降级处理: {pending.line_text[:100]}")
+                continue
+
+            tx = transactions[pending.index]
+            ai_payee = ai_result.get("payee")
+            if ai_payee and ai_payee != "Unknown":
+                tx['Payee'] = ai_payee
+
+            ai_debit = ai_result.get("debit", '')
+            ai_credit = ai_result.get("credit", '')
+            ai_balance = ai_result.get("balance")
+            # 如果 AI 返回了有效数据，使用 AI 的结果
+            if ai_balance is not None or ai_debit or ai_credit:
+                tx['Debit'] = ai_debit
+                tx['Credit'] = ai_credit
+                if ai_balance is not None:
+                    tx['Balance'] = ai_balance
+                    self.computed_balance_rows.discard(pending.index)
+                else:
+                    # AI 没有返回余额，基于运行余额计算
+                    self.computed_balance_rows.add(pending.index)
+                patched += 1
+                if first_patched is None or pending.index < first_patched:
+                    first_patched = pending.index
+                logger.info(f"使用 AI 解析结果: debit={ai_debit}, credit={ai_credit}, balance={ai_balance}")
+
+        if first_patched is not None:
+            self._replay_balances(transactions, first_patched)
+
+        return patched
+
+    def closing_balances(self, transactions: List[Dict[str, Any]]) -> Dict[str, float]:
+        """各币种在最后一笔交易（及其后登记的承前余额）之后的运行余额，不修改交易记录"""
+        return self._replay_balances(transactions, len(transactions))
+
+    def _replay_balances(self, transactions: List[Dict[str, Any]], start: int) -> Dict[str, float]:
+        """
+        从 start 开始按币种重放推算余额（对账单印出的余额和 AI 给出的余额保持不变；承前余额处重新起算）
+
+        返回:
+            重放结束时各币种的运行余额
+        """
+        running_balance: Dict[str, float] = {}
+        for index, tx in enumerate(transactions):
+            for seed_currency, balance in self.opening_balances.get(index, ()):
+                running_balance[seed_currency] = balance
+            currency = tx['Account Currency']
+            if index >= start and index in self.computed_balance_rows:
+                credit_val = tx['Credit'] if tx['Credit'] else 0.0
+                debit_val = tx['Debit'] if tx['Debit'] else 0.0
+                tx['Balance'] = running_balance.get(currency, 0.0) + credit_val - debit_val
+            running_balance[currency] = tx['Balance']
+        for seed_currency, balance in self.opening_balances.get(len(transactions), ()):
+            running_balance[seed_currency] = balance
+        return running_balance
@@ -0,0 +1,254 @@
+"""
+异步 AI 解析 - 在后台事件循环线程中并发请求 DeepSeek
+
+- 并发上限：asyncio.Semaphore（config.AI_MAX_CONCURRENCY）
+- 限速：令牌桶（config.AI_RATE_LIMIT_PER_SECOND / AI_RATE_LIMIT_BURST）
+- 单次请求超时：config.AI_TIMEOUT_SECONDS
+- 失败重试：指数退避 + 全抖动（config.AI_MAX_RETRIES）
+- 熔断：连续失败达到阈值后不再请求（见 breaker.py）
+
+submit() 立即返回 concurrent.futures.Future，解析线程可以继续解析下一个文件，
+请求在后台线程中进行。
+"""
+import os
+import atexit
+import random
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+try:
+    from openai import AsyncOpenAI
+except ImportError:
+    AsyncOpenAI = None
+
+from . import deepseek
+from .. import metrics
+from ..futures import completed_future, chain_future, gather_futures
+from .breaker import CircuitBreaker, get_circuit_breaker
+
+# 导入配置文件
+try:
+    import config
+except ImportError:
+    config = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _config_value(name: str, default):
+    return getattr(config, name, default) if config else default
+
+
+class TokenBucket:
+    """
+    令牌桶限速：平均每秒 rate 个令牌，最多累积 capacity 个（允许的突发请求数）
+
+    只在事件循环线程中使用，检查与扣减之间没有 await，不需要加锁
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """等待直到有足够令牌并扣减"""
+        while True:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0, rng: random.Random = random) -> float:
+    """
+    第 attempt 次重试（从0开始）前的等待时间：指数退避 + 全抖动
+
+    在 [0, min(cap, base * 2^attempt)] 中均匀取值，避免并发请求同时失败后同时重试
+    """
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AsyncAIResolver:
+    """
+    异步批量解析器
+
+    用法:
+        resolver = AsyncAIResolver()
+        future = resolver.submit([(交易详情, 日期), ...])   # 立即返回
+        ...                                                  # 继续解析其他文件
+        results = future.result()                            # 与输入一一对应，失败为 None
+
+    也可以直接作为 AIFallbackQueue 的 resolver（同步调用 resolver(items)）
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, rate_per_second: Optional[float] = None,
+                 burst: Optional[float] = None, timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                 retry_base_delay: float = 0.5, client_factory: Optional[Callable[[], Any]] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        参数:
+            max_concurrency: 同时进行的请求数上限
+            rate_per_second: 平均每秒请求数
+            burst: 令牌桶容量（允许的突发请求数）
+            timeout: 单次请求超时（秒）
+            max_retries: 失败后的最大重试次数
+            retry_base_delay: 退避基数（秒）
+            client_factory: 创建异步客户端的函数（默认按 config 创建 AsyncOpenAI），测试时可指向模拟服务
+            breaker: 熔断器，每次请求失败都计入（默认新建，阈值为 config.AI_CIRCUIT_BREAKER_THRESHOLD）
+        """
+        self.max_concurrency = max_concurrency or _config_value('AI_MAX_CONCURRENCY', 4)
+        self.rate_per_second = rate_per_second or _config_value('AI_RATE_LIMIT_PER_SECOND', 5.0)
+        self.burst = burst or _config_value('AI_RATE_LIMIT_BURST', self.rate_per_second)
+        self.timeout = timeout or _config_value('AI_TIMEOUT_SECONDS', 60.0)
+        self.max_retries = max_retries if max_retries is not None else _config_value('AI_MAX_RETRIES', 3)
+        self.retry_base_delay = retry_base_delay
+        self.client_factory = client_factory
+        self.breaker = breaker or CircuitBreaker()
+
+        self.stats = {"batches": 0, "requests": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bucket: Optional[TokenBucket] = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """惰性启动后台事件循环线程"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._bucket = TokenBucket(self.rate_per_second, self.burst)
+                self._thread = threading.Thread(target=self._loop.run_forever, name="ai-resolver", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, items: List[Tuple[str, str]]) -> Future:
+        """
+        提交一批待解析行
+
+        返回:
+            Future，结果为与 items 一一对应的解析结果列表（失败为 None）
+        """
+        if not items:
+            return completed_future([])
+        if self.breaker.is_open:
+            self.stats["short_circuited"] += 1
+            return completed_future([None] * len(items))
+        if self.client_factory is None and (AsyncOpenAI is None or not deepseek.is_configured()):
+            return completed_future([None] * len(items))
+        # 请求在后台线程中计时，显式带上提交时的文件指标，ai.request 计入对应文件
+        collector = metrics.current_collector()
+        return asyncio.run_coroutine_threadsafe(self._resolve(items, collector), self._ensure_loop())
+
+    def __call__(self, items: List[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        return self.submit(items).result()
+
+    def _get_client(self):
+        if self._client is None:
+            if self.client_factory is not None:
+                self._client = self.client_factory()
+            else:
+                # 整个运行期间复用同一客户端（连接池 keep-alive）；重试由本类负责，关闭客户端自带的重试
+                self._client = AsyncOpenAI(
+                    api_key=config.DEEPSEEK_API_KEY,
+                    base_url=getattr(config, 'DEEPSEEK_BASE_URL', 'https://api.deepseek.com'),
+                    timeout=deepseek.request_timeout(),
+                    max_retries=0
+                )
+        return self._client
+
+    async def _complete(self, prompt: str, max_tokens: int) -> str:
+        response = await self._get_client().chat.completions.create(
+            model=deepseek.model_name(),
+            messages=deepseek.build_messages(prompt),
+            temperature=0.1,
+            max_tokens=max_tokens
+        )
+        return deepseek.strip_code_fence(response.choices[0].message.content)
+
+    async def _resolve(self, items: List[Tuple[str, str]],
+                       collector: Optional[metrics.FileMetrics] = None) -> List[Optional[Dict[str, Any]]]:
+        self.stats["batches"] += 1
+        prompt = deepseek.build_batch_prompt(items)
+        max_tokens = deepseek.batch_max_tokens(len(items))
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    if self.breaker.is_open:
+                        # 等待期间已熔断（排队中的批次不再请求）
+                        self.stats["short_circuited"] += 1
+                        return [None] * len(items)
+                    await self._bucket.acquire()
+                    self.stats["requests"] += 1
+                    try:
+                        with metrics.collect(collector), metrics.span("ai.request"):
+                            result_text = await asyncio.wait_for(self._complete(prompt, max_tokens), self.timeout)
+                    except Exception:
+                        self.breaker.record_failure()
+                        raise
+                    self.breaker.record_success()
+                results = deepseek.parse_batch_response(result_text, len(items))
+                logger.info(f"AI 批量解析: {len(items)} 行，成功 {sum(r is not None for r in results)} 行")
+                return results
+            except Exception as e:
+                reason = "请求超时" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+                if attempt >= self.max_retries or self.breaker.is_open:
+                    self.stats["failures"] += 1
+                    logger.warning(f"AI 批量解析失败（已重试 {attempt} 次）: {reason}，本批使用降级处理")
+                    return [None] * len(items)
+                delay = backoff_delay(attempt, self.retry_base_delay)
+                self.stats["retries"] += 1
+                logger.info(f"AI 请求失败: {reason}，{delay:.2f}s 后重试（第 {attempt + 1} 次）")
+                await asyncio.sleep(delay)
+
+    def close(self):
+        """关闭客户端并停止后台事件循环"""
+        with self._lock:
+            loop, thread, client = self._loop, self._thread, self._client
+            self._loop = self._thread = self._client = None
+        if loop is None:
+            return
+        if client is not None and hasattr(client, "close"):
+            try:
+                asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout=5)
+            except Exception as e:
+                logger.debug(f"关闭 AI 客户端失败: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+
+_default_resolver: Optional[AsyncAIResolver] = None
+_default_resolver_pid: Optional[int] = None
+
+
+def get_default_resolver() -> AsyncAIResolver:
+    """进程内共享的解析器（与同步请求共用熔断器；fork 出的子进程会重新创建，后台线程不会随 fork 复制）"""
+    global _default_resolver, _default_resolver_pid
+    if _default_resolver is None or _default_resolver_pid != os.getpid():
+        _default_resolver = AsyncAIResolver(breaker=get_circuit_breaker())
+        _default_resolver_pid = os.getpid()
+    return _default_resolver
+
+
+@atexit.register
+def _close_default_resolver():
+    if _default_resolver is not None and _default_resolver_pid == os.getpid():
+        _default_resolver.close()
@@ -0,0 +1,290 @@
+"""
+规则学习 - 把 AI 兜底的解析结果归纳为可复用的行模板，之后同形状的行不再请求 AI
+
+行文本按空白切分为词，每个词映射为形状：
+- 金额（如 1,234.56）为 AMT
+- 行首的前两个纯字母词保留原文（如 POS MDC / CASH REBATE），区分交易类型
+- 其他词按字符类折叠：大写字母串为 A，小写为 a，数字串为 9，标点保留，如 (16DEC23) -> (9A9)
+相邻的同形状词（非金额）合并为一个元素，使不同长度的商户名得到相同的签名。
+
+模板 = 签名 -> 各字段所在的元素位置：
+    "POS MDC (9A9) A *A AMT" -> {"debit": 5, "credit": null, "balance": null, "payee": [3, 5]}
+
+AI 的答案中每个金额都能在行内唯一定位、payee 恰好是连续的若干元素时才学习（否则无法复用）。
+同一签名得到 min_support 次一致的答案后启用；出现不一致的答案则停用该签名。
+模板保存在带版本号的 JSON 规则文件中（config.AI_RULES_FILE，默认为缓存目录下的 ai_rules.json）。
+"""
+import os
+import re
+import json
+import time
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..utils import parse_amount
+from ..cache import default_cache_dir
+
+# 导入配置文件
+try:
+    import config
+except ImportError:
+    config = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# 规则文件格式版本：修改切词或签名规则后递增，旧文件中的模板自动失效
+RULES_FORMAT_VERSION = 1
+
+# 模板中的金额字段
+AMOUNT_FIELDS = ("debit", "credit", "balance")
+
+AMOUNT_TOKEN = re.compile(r'^[\d,]*\d\.\d{2}$')
+CHAR_CLASSES = ((re.compile(r'[A-Z]+'), 'A'), (re.compile(r'[a-z]+'), 'a'), (re.compile(r'\d+'), '9'))
+LITERAL_PREFIX_TOKENS = 2
+
+
+def token_shape(token: str) -> str:
+    """单个词的形状：金额为 AMT，其余按字符类折叠"""
+    if AMOUNT_TOKEN.match(token):
+        return "AMT"
+    shape = token
+    for pattern, symbol in CHAR_CLASSES:
+        shape = pattern.sub(symbol, shape)
+    return shape
+
+
+def tokenize(line_text: str) -> List[Tuple[str, str]]:
+    """
+    切分为元素
+
+    返回:
+        [(形状, 原文), ...]；相邻的同形状词合并为一个元素（金额和行首保留原文的词除外）
+    """
+    elements: List[Tuple[str, str]] = []
+    mergeable = False  # 上一个元素能否与同形状的词合并
+    for position, token in enumerate(line_text.split()):
+        if position < LITERAL_PREFIX_TOKENS and token.isalpha():
+            elements.append((token.upper(), token))
+            mergeable = False
+            continue
+        shape = token_shape(token)
+        if mergeable and shape != "AMT" and elements[-1][0] == shape:
+            elements[-1] = (shape, f"{elements[-1][1]} {token}")
+        else:
+            elements.append((shape, token))
+        mergeable = shape != "AMT"
+    return elements
+
+
+def signature(elements: List[Tuple[str, str]]) -> str:
+    return " ".join(shape for shape, _ in elements)
+
+
+def _same_amount(a: float, b: float) -> bool:
+    return abs(a - b) < 0.005
+
+
+def derive_fields(elements: List[Tuple[str, str]], result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    从 AI 答案推导字段位置
+
+    返回:
+        {"debit": 元素位置或None, "credit": ..., "balance": ..., "payee": [起, 止) 或 None}；
+        某个金额无法在行内唯一定位、或 payee 不是连续元素时返回 None（不学习）
+    """
+    amounts = {i: parse_amount(text) for i, (shape, text) in enumerate(elements) if shape == "AMT"}
+    fields: Dict[str, Any] = {}
+    used = set()
+    for field in AMOUNT_FIELDS:
+        value = result.get(field)
+        if value in ('', None):
+            fields[field] = None
+            continue
+        matches = [i for i, amount in amounts.items() if _same_amount(amount, float(value)) and i not in used]
+        if len(matches) != 1:
+            return None
+        fields[field] = matches[0]
+        used.add(matches[0])
+
+    payee = " ".join(str(result.get("payee") or "").split())
+    fields["payee"] = None
+    if payee and payee != "Unknown":
+        texts = [text.upper() for _, text in elements]
+        spans = [
+            [start, end]
+            for start in range(len(elements))
+            for end in range(start + 1, len(elements) + 1)
+            if " ".join(texts[start:end]) == payee.upper()
+        ]
+        if len(spans) != 1:
+            return None
+        fields["payee"] = spans[0]
+    return fields
+
+
+def apply_fields(elements: List[Tuple[str, str]], fields: Dict[str, Any]) -> Dict[str, Any]:
+    """按模板取出字段，格式同 AI 的解析结果"""
+    result: Dict[str, Any] = {}
+    for field in AMOUNT_FIELDS:
+        index = fields.get(field)
+        value = parse_amount(elements[index][1]) if index is not None else None
+        result[field] = value if value is not None or field == "balance" else ''
+    span = fields.get("payee")
+    result["payee"] = " ".join(text for _, text in elements[span[0]:span[1]]) if span else "Unknown"
+    return result
+
+
+def default_rules_path() -> str:
+    """规则文件路径：config.AI_RULES_FILE，未配置时与其他持久缓存一样放在缓存目录下"""
+    path = getattr(config, 'AI_RULES_FILE', '') if config else ''
+    return path or str(Path(default_cache_dir()) / "ai_rules.json")
+
+
+class RuleBook:
+    """
+    行模板库
+
+    - match(line_text): 用已启用的模板解析，未命中返回 None
+    - learn(line_text, result): 记录一条 AI 答案
+    - save(): 模板有变化（learn）时写回规则文件（与磁盘上的版本合并后原子替换）
+    - hits / misses: 本实例的模板命中与未命中次数；各模板的命中次数只在内存中累计，
+      随下一次模板变化一起写回，纯命中的运行不重写规则文件
+    """
+
+    def __init__(self, path: Optional[str] = None, min_support: Optional[int] = None):
+        if min_support is None:
+            min_support = getattr(config, 'AI_RULES_MIN_SUPPORT', 2) if config else 2
+        self.path = Path(path or default_rules_path())
+        self.min_support = min_support
+        self.templates: Dict[str, Dict[str, Any]] = {}
+        self.revision = 0
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.templates, self.revision = self._read()
+
+    def _read(self) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """读取规则文件；不存在、损坏或格式版本不同时返回空模板"""
+        if not self.path.exists():
+            return {}, 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"规则文件读取失败，忽略: {self.path}: {e}")
+            return {}, 0
+        if data.get("format") != RULES_FORMAT_VERSION:
+            logger.warning(f"规则文件格式版本 {data.get('format')} 与当前版本 {RULES_FORMAT_VERSION} 不同，忽略已有模板")
+            return {}, 0
+        return data.get("templates", {}), int(data.get("revision", 0))
+
+    def is_active(self, template: Dict[str, Any]) -> bool:
+        return template["support"] >= self.min_support and template["conflicts"] == 0
+
+    def match(self, line_text: str) -> Optional[Dict[str, Any]]:
+        """
+        用已启用的模板解析一行
+
+        返回:
+            {"debit", "credit", "balance", "payee"}（同 AI 的解析结果），没有可用模板时返回 None
+        """
+        elements = tokenize(line_text)
+        with self._lock:
+            template = self.templates.get(signature(elements))
+            if template is None or not self.is_active(template):
+                self.misses += 1
+                return None
+            self.hits += 1
+            template["hits"] = template.get("hits", 0) + 1
+        return apply_fields(elements, template["fields"])
+
+    def learn(self, line_text: str, result: Dict[str, Any]) -> bool:
+        """
+        记录一条 AI 答案
+
+        返回:
+            答案能否归纳为模板（False 表示该行无法复用）
+        """
+        elements = tokenize(line_text)
+        fields = derive_fields(elements, result)
+        if fields is None:
+            return False
+
+        key = signature(elements)
+        with self._lock:
+            template = self.templates.get(key)
+            if template is None:
+                self.templates[key] = {"fields": fields, "support": 1, "conflicts": 0, "hits": 0, "example": line_text}
+            elif template["fields"] == fields:
+                template["support"] += 1
+            else:
+                if template["conflicts"] == 0:
+                    logger.info(f"模板答案不一致，停用: {key}")
+                template["conflicts"] += 1
+            self._dirty = True
+        return True
+
+    def save(self):
+        """模板有变化时与磁盘上的规则合并后写回（先写临时文件再原子替换）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            on_disk, revision = self._read()
+            for key, theirs in on_disk.items():
+                ours = self.templates.get(key)
+                if ours is None:
+                    self.templates[key] = theirs
+                elif ours["fields"] != theirs["fields"]:
+                    ours["conflicts"] = max(ours["conflicts"], 1)
+                else:
+                    for counter in ("support", "conflicts", "hits"):
+                        ours[counter] = max(ours.get(counter, 0), theirs.get(counter, 0))
+            self.revision = max(self.revision, revision) + 1
+            data = {
+                "format": RULES_FORMAT_VERSION,
+                "revision": self.revision,
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "templates": self.templates
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+            self._dirty = False
+
+    def stats(self) -> Dict[str, Any]:
+        """模板统计：总数、已启用数、本实例命中率"""
+        lookups = self.hits + self.misses
+        return {
+            "规则文件": str(self.path),
+            "版本": self.revision,
+            "模板数": len(self.templates),
+            "已启用": sum(1 for t in self.templates.values() if self.is_active(t)),
+            "命中": self.hits,
+            "未命中": self.misses,
+            "命中率": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+_default_rule_book: Optional[RuleBook] = None
+_default_rule_book_pid: Optional[int] = None
+
+
+def get_rule_book() -> RuleBook:
+    """进程内共享的模板库（config.AI_RULES_FILE）"""
+    global _default_rule_book, _default_rule_book_pid
+    if _default_rule_book is None or _default_rule_book_pid != os.getpid():
+        _default_rule_book = RuleBook()
+        _default_rule_book_pid = os.getpid()
+    return _default_rule_book
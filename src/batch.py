@@ -0,0 +1,345 @@
+"""
+批量转换模块 - 多进程并行转换整个目录的对账单（解析 → 标准化 → 导出Excel/Parquet/Arrow/CSV）
+"""
+import os
+import time
+import logging
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterable, Callable
+
+from . import metrics
+from .parsers import BaseParser, registry
+from .parsers.document import PDFDocument, PDFSource, MemoryLimits, get_memory_limits, set_memory_limits
+from .normalizer import normalize_dataframe, normalize_summary, normalize_stream
+from .sinks import get_sink
+from .cache import ParseCache, PageCache, AIResponseCache
+from .ai import get_rule_book
+from .futures import completed_future
+
+
+logger = logging.getLogger(__name__)
+
+
+# 串行转换时同时等待 AI 结果的文件数（超过后先完成最早的文件再解析下一个）
+PIPELINE_DEPTH = 4
+
+
+def find_pdf_files(paths: Iterable[str]) -> List[Path]:
+    """
+    收集待转换的 PDF 文件
+
+    参数:
+        paths: 目录或文件路径列表，目录会递归查找 *.pdf
+
+    返回:
+        去重并排序后的 PDF 文件路径列表
+    """
+    found = set()
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            found.update(p for p in path.rglob("*") if p.suffix.lower() == ".pdf" and p.is_file())
+        elif path.is_file() and path.suffix.lower() == ".pdf":
+            found.add(path)
+        else:
+            logger.warning(f"跳过无效路径: {path}")
+    return sorted(found)
+
+
+def detect_parser(doc: PDFDocument) -> Optional[BaseParser]:
+    """
+    按文件名和首页识别银行并创建解析器（registry.detect），只导入选中的解析器模块
+
+    识别读取的首页留在文档会话中，把同一个 doc 交给解析器即可，不需要再次打开文件。
+
+    返回:
+        解析器实例，文件名和首页都不匹配任何解析器时返回 None
+        （文件无法打开或首页无法读取时抛出异常，由调用方记为失败）
+    """
+    spec = registry.detect(doc)
+    return spec.create() if spec is not None else None
+
+
+def select_parser(pdf_path: PDFSource, name: Optional[str] = None) -> Optional[BaseParser]:
+    """
+    选择解析器（打开文件读取首页识别，见 detect_parser）
+
+    参数:
+        pdf_path: PDF文件路径、字节或二进制文件对象
+        name: 可选的原始文件名
+
+    返回:
+        解析器实例，无法识别时返回 None；文件无法读取时抛出异常
+    """
+    with PDFDocument(pdf_path, name=name) as doc:
+        return detect_parser(doc)
+
+
+def convert_file(pdf_path: str, output_dir: str, cache_dir: Optional[str] = None,
+                 use_cache: bool = True, output_format: str = "xlsx",
+                 amount_unit: str = "float") -> Dict[str, Any]:
+    """
+    转换单个文件：解析 → 标准化 → 导出（默认Excel，见 sinks.SINKS）
+
+    在工作进程中执行，异常不会抛出，而是记录在返回结果中。
+    启用缓存时，相同内容的PDF直接读取已标准化的结果，跳过解析；
+    解析结果未命中（如解析器版本已更新）时，仍可复用逐页提取缓存，只重跑解析逻辑。
+
+    返回:
+        {"file", "bank", "status", "cached", "rows", "ai_fallback", "seconds", "spans", "output", "error"}
+        ai_fallback 为交给 AI 兜底的行数（解析器的 fallback_stats，缓存命中时为 0）；
+        spans 为各阶段耗时（metrics 启用时，{span名: {"count", "seconds", "max"}}）
+    """
+    return start_conversion(pdf_path, output_dir, cache_dir, use_cache, output_format, amount_unit)()
+
+
+def start_conversion(pdf_path: str, output_dir: str, cache_dir: Optional[str] = None,
+                     use_cache: bool = True, output_format: str = "xlsx",
+                     amount_unit: str = "float") -> Callable[[], Dict[str, Any]]:
+    """
+    转换的第一阶段：识别银行并解析页面，AI 兜底请求提交后立即返回
+
+    参数同 convert_file
+
+    返回:
+        无参函数，调用时等待 AI 结果，完成标准化和导出，返回值同 convert_file
+    """
+    start = time.perf_counter()
+    result = {
+        "file": pdf_path,
+        "bank": "Unknown",
+        "status": "failed",
+        "cached": False,
+        "rows": 0,
+        "ai_fallback": 0,
+        "seconds": 0.0,
+        "spans": {},
+        "output": "",
+        "error": ""
+    }
+
+    file_metrics = metrics.FileMetrics()
+
+    def finished() -> Dict[str, Any]:
+        result["seconds"] = time.perf_counter() - start
+        result["spans"] = file_metrics.spans
+        return result
+
+    try:
+        cache = ParseCache(cache_dir) if use_cache else None
+        cached = None
+        # 文件名只指向一个银行时先查解析结果缓存，命中则不必打开文件
+        # （缓存项只在按内容识别并解析成功后写入，命中即可信）
+        guess = registry.detect_name(pdf_path) if cache else None
+        if guess is not None:
+            parser = guess.create()
+            cached = cache.get(pdf_path, parser)
+
+        if cached is not None:
+            parsed = completed_future(cached)
+            result["bank"] = parser.BANK_NAME
+            result["cached"] = True
+        else:
+            page_cache = PageCache(cache_dir) if use_cache else None
+            with PDFDocument(pdf_path, page_cache=page_cache) as doc:
+                # 识别读取的首页留在文档会话中，解析时直接复用
+                parser = detect_parser(doc)
+                if parser is None:
+                    result["status"] = "skipped"
+                    result["error"] = "无法识别银行类型"
+                    return finished
+                result["bank"] = parser.BANK_NAME
+                if cache and (guess is None or guess.bank != parser.BANK_NAME):
+                    cached = cache.get(pdf_path, parser)
+
+                if cached is not None:
+                    parsed = completed_future(cached)
+                    result["cached"] = True
+                else:
+                    parser.page_cache = page_cache
+                    if use_cache:
+                        # 学到的行模板与其他缓存一样放在缓存目录，--no-cache 时不读写
+                        parser.ai_cache = AIResponseCache(cache_dir)
+                        parser.ai_rules = get_rule_book()
+                    with metrics.collect(file_metrics), metrics.span("parse"):
+                        parsed = parser.parse_document_async(doc)
+                    result["ai_fallback"] = getattr(parser, "fallback_stats", {}).get("AI兜底行数", 0)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        logger.debug(traceback.format_exc())
+        return finished
+
+    @metrics.collect(file_metrics)
+    def finish() -> Dict[str, Any]:
+        try:
+            with metrics.span("ai.wait"):
+                df, summary = parsed.result()
+            if not result["cached"]:
+                df = normalize_dataframe(df)
+                summary = normalize_summary(summary)
+                if cache:
+                    cache.put(pdf_path, parser, df, summary)
+
+            sink = get_sink(output_format, amount_unit)
+            target_dir = Path(output_dir) / result["bank"]
+            target_dir.mkdir(parents=True, exist_ok=True)
+            output_path = str(target_dir / f"{Path(pdf_path).stem}{sink.suffix}")
+            with metrics.span("export"):
+                sink.write(df, summary, output_path)
+
+            result["status"] = "ok"
+            result["rows"] = len(df)
+            result["output"] = output_path
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+            logger.debug(traceback.format_exc())
+        return finished()
+
+    return finish
+
+
+def stream_file(pdf_path: str, output_path: str, output_format: str = "xlsx", amount_unit: str = "float") -> str:
+    """
+    边解析边导出单个文件：逐页解析 → 逐批标准化 → 流式写出
+
+    不使用缓存；内存占用与对账单页数无关，第一页解析完即开始写出。
+    只支持汇总写在交易之后的格式（xlsx / csv）：列式格式的汇总在 schema 中，打开文件时就要确定。
+
+    返回:
+        输出文件路径
+    """
+    sink = get_sink(output_format, amount_unit)
+    if not sink.summary_after_rows:
+        raise ValueError(f"{output_format} 格式需要完整的汇总信息才能开始写出，不支持边解析边导出")
+
+    with PDFDocument(pdf_path) as doc:
+        parser = detect_parser(doc)
+        if parser is None:
+            raise ValueError(f"无法识别银行类型: {pdf_path}")
+        summary = parser.stream_summary = {}
+        batches = parser.iter_document_transactions(doc)
+        return sink.write(normalize_stream(batches, summary), summary, output_path)
+
+
+def run_batch(paths: Iterable[str], output_dir: str = "output", jobs: Optional[int] = None,
+              cache_dir: Optional[str] = None, use_cache: bool = True, output_format: str = "xlsx",
+              amount_unit: str = "float", metrics_file: Optional[str] = None,
+              prometheus_file: Optional[str] = None,
+              memory_limits: Optional[MemoryLimits] = None) -> Dict[str, Any]:
+    """
+    批量转换
+
+    参数:
+        paths: 目录或文件路径列表
+        output_dir: 输出根目录（按银行分子目录）
+        jobs: 并行进程数，默认为 CPU 核数；1 表示在当前进程内串行执行
+              （串行时最多 PIPELINE_DEPTH 个文件的 AI 请求在后台进行，同时解析后续文件）
+        cache_dir: 解析结果缓存目录，默认为 config.CACHE_DIR
+        use_cache: 是否使用解析结果缓存
+        output_format: 输出格式（xlsx / parquet / feather / csv）
+        amount_unit: 列式和CSV输出的金额单位（float 或 cents）
+        metrics_file: 启用 metrics 时每个文件追加一行 JSON，默认为 config.METRICS_FILE
+        prometheus_file: 启用 metrics 时把 metrics_file 的全部记录汇总为 Prometheus 文本文件，
+                         默认为 config.METRICS_PROMETHEUS_FILE（空表示不写）
+        memory_limits: 每个文件的页数/内存上限和逐页释放模式，默认取自 config；
+                       超出上限的文件记为失败（ResourceLimitError），不影响其他文件
+
+    返回:
+        {"results": [...], "total", "ok", "failed", "skipped", "seconds", "files_per_second"}
+    """
+    get_sink(output_format, amount_unit)  # 提前校验输出格式，避免每个文件都报同样的错误
+    if memory_limits is not None:
+        set_memory_limits(memory_limits)
+    pdf_files = find_pdf_files(paths)
+    jobs = jobs or os.cpu_count() or 1
+    logger.info(f"共找到 {len(pdf_files)} 个PDF文件，并行进程数: {jobs}")
+
+    start = time.perf_counter()
+    results = []
+
+    if jobs == 1 or len(pdf_files) <= 1:
+        in_flight = deque()
+        for pdf_path in pdf_files:
+            in_flight.append(start_conversion(str(pdf_path), output_dir, cache_dir, use_cache, output_format, amount_unit))
+            if len(in_flight) >= PIPELINE_DEPTH:
+                results.append(in_flight.popleft()())
+        while in_flight:
+            results.append(in_flight.popleft()())
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pdf_files)),
+                                 initializer=_init_worker,
+                                 initargs=(metrics.is_enabled(), get_memory_limits())) as executor:
+            futures = [
+                executor.submit(convert_file, str(pdf_path), output_dir, cache_dir, use_cache, output_format, amount_unit)
+                for pdf_path in pdf_files
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+    elapsed = time.perf_counter() - start
+    results.sort(key=lambda r: r["file"])
+    if metrics.is_enabled():
+        _write_metrics(results, metrics_file or metrics.default_metrics_file(),
+                       prometheus_file or metrics.default_prometheus_file())
+
+    return {
+        "results": results,
+        "total": len(results),
+        "ok": sum(1 for r in results if r["status"] == "ok"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "cached": sum(1 for r in results if r["cached"]),
+        "ai_fallback": sum(r.get("ai_fallback", 0) for r in results),
+        "seconds": elapsed,
+        "files_per_second": len(results) / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def _init_worker(metrics_enabled: bool, memory_limits: MemoryLimits):
+    """工作进程初始化：沿用主进程的指标开关和内存限制"""
+    metrics.enable(metrics_enabled)
+    set_memory_limits(memory_limits)
+
+
+def _write_metrics(results: List[Dict[str, Any]], metrics_file: str, prometheus_file: str):
+    """每个文件一行 JSON 追加到 metrics_file；指定 prometheus_file 时重新汇总整个文件"""
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    metrics.write_json_lines(metrics_file, [
+        {"time": timestamp, **{key: r[key] for key in ("file", "bank", "status", "cached", "rows",
+                                                      "ai_fallback", "seconds", "spans")}}
+        for r in results
+    ])
+    if prometheus_file:
+        metrics.write_prometheus(prometheus_file, metrics.read_json_lines(metrics_file))
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """生成批量转换报告文本（含逐文件错误列表）"""
+    lines = []
+    lines.append("=" * 60)
+    lines.append("批量转换报告")
+    lines.append("=" * 60)
+
+    for r in report["results"]:
+        status = {"ok": "✅", "failed": "❌", "skipped": "⚠️"}.get(r["status"], "?")
+        cached = "（缓存）" if r["cached"] else ""
+        fallback = f", AI兜底 {r['ai_fallback']} 行" if r.get("ai_fallback") else ""
+        lines.append(f"{status} [{r['bank']}] {Path(r['file']).name}: {r['rows']} 条{fallback}, {r['seconds']:.2f}s{cached}")
+
+    errors = [r for r in report["results"] if r["status"] != "ok"]
+    if errors:
+        lines.append("")
+        lines.append("错误报告:")
+        for r in errors:
+            lines.append(f"  - {r['file']}: {r['error']}")
+
+    lines.append("")
+    lines.append(
+        f"总计 {report['total']} 个文件: 成功 {report['ok']}（缓存命中 {report['cached']}），"
+        f"失败 {report['failed']}，跳过 {report['skipped']}，AI兜底 {report.get('ai_fallback', 0)} 行；"
+        f"耗时 {report['seconds']:.2f}s（{report['files_per_second']:.2f} 文件/秒）"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,430 @@
+"""
+缓存模块
+- ParseCache: 以 PDF 内容哈希 + 解析器版本为键，缓存标准化后的交易记录和汇总信息
+- PageCache: 以 PDF 内容哈希 + 页码 + 提取参数为键，缓存 pdfplumber 的逐页文本/表格提取结果
+- AIResponseCache: 以规范化的行文本 + 日期 + 模型名为键，缓存 AI 兜底的解析结果
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from .utils import file_sha256
+
+# 导入配置文件
+try:
+    import config
+except ImportError:
+    config = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# Parquet schema 元数据中存放汇总信息的键
+SUMMARY_METADATA_KEY = b"bank_converter.summary"
+
+
+def default_cache_dir() -> str:
+    """默认缓存目录（config.CACHE_DIR，未配置时为 .cache）"""
+    return getattr(config, 'CACHE_DIR', '.cache') if config else '.cache'
+
+
+class ParseCache:
+    """
+    解析结果磁盘缓存
+
+    - 键: sha256(PDF内容) + 银行 + 解析器版本（PARSER_VERSION）
+    - 值: 每个条目一个 Parquet 文件，交易记录按列存储，汇总信息放在 schema 元数据中
+    - 容量: 超过 max_bytes 后按最近使用时间（文件 mtime，命中时刷新）淘汰
+    - 需要 pyarrow；未安装时缓存自动禁用，get 总是未命中
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_mb = getattr(config, 'CACHE_MAX_MB', 512) if config else 512
+            max_bytes = int(max_mb * 1024 * 1024)
+        self.cache_dir = Path(cache_dir or default_cache_dir()) / "parse"
+        self.max_bytes = max_bytes
+        self.enabled = pa is not None
+        self._hashes: Dict[Tuple[str, int, int], str] = {}  # (路径, 大小, mtime) -> sha256，避免 get/put 重复计算
+        if not self.enabled:
+            logger.warning("pyarrow 库未安装，解析结果缓存已禁用")
+
+    def make_key(self, pdf_path: str, parser) -> str:
+        """生成缓存键：{sha256}-{银行}-v{解析器版本}"""
+        stat = os.stat(pdf_path)
+        hash_key = (str(pdf_path), stat.st_size, stat.st_mtime_ns)
+        if hash_key not in self._hashes:
+            self._hashes[hash_key] = file_sha256(pdf_path)
+        bank = getattr(parser, "BANK_NAME", None) or parser.identify_bank(pdf_path)
+        return f"{self._hashes[hash_key]}-{bank}-v{parser.PARSER_VERSION}"
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.parquet"
+
+    def get(self, pdf_path: str, parser) -> Optional[Tuple[pd.DataFrame, Dict[str, Any]]]:
+        """
+        查询缓存
+
+        返回:
+            命中时返回 (df, summary)，未命中返回 None
+        """
+        if not self.enabled:
+            return None
+
+        entry = self._entry_path(self.make_key(pdf_path, parser))
+        if not entry.exists():
+            return None
+
+        try:
+            table = pq.read_table(entry)
+            df = table.to_pandas()
+            summary = json.loads(table.schema.metadata[SUMMARY_METADATA_KEY].decode('utf-8'))
+        except Exception as e:
+            logger.warning(f"缓存条目损坏，已删除: {entry.name}: {e}")
+            entry.unlink(missing_ok=True)
+            return None
+
+        # 同一内容的文件可能换了路径，汇总中的原始文件以本次为准
+        summary["原始文件"] = pdf_path
+        # 刷新 mtime，作为 LRU 的最近使用时间
+        os.utime(entry, None)
+        logger.info(f"解析结果缓存命中: {pdf_path}")
+        return df, summary
+
+    def put(self, pdf_path: str, parser, df: pd.DataFrame, summary: Dict[str, Any]):
+        """写入缓存（先写临时文件再原子替换，多进程并发写入安全）"""
+        if not self.enabled:
+            return
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = self._entry_path(self.make_key(pdf_path, parser))
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[SUMMARY_METADATA_KEY] = json.dumps(summary, ensure_ascii=False, default=str).encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, entry)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        self._evict()
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        return list(self.cache_dir.glob("*.parquet"))
+
+    def _evict(self):
+        """总大小超过上限时，按最近使用时间从旧到新删除条目"""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        for _, size, entry in sorted(entries):
+            entry.unlink(missing_ok=True)
+            total -= size
+            logger.info(f"缓存超出上限，淘汰条目: {entry.name}")
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计：条目数、总大小、上限、最早/最近使用时间"""
+        entries = [(e.stat().st_mtime, e.stat().st_size) for e in self._entries()]
+        return {
+            "目录": str(self.cache_dir),
+            "条目数": len(entries),
+            "总大小(MB)": round(sum(size for _, size in entries) / 1024 / 1024, 2),
+            "上限(MB)": round(self.max_bytes / 1024 / 1024, 2),
+            "最早使用": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(min(m for m, _ in entries))) if entries else "",
+            "最近使用": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(max(m for m, _ in entries))) if entries else ""
+        }
+
+    def purge(self, older_than_days: Optional[float] = None) -> int:
+        """
+        清理缓存
+
+        参数:
+            older_than_days: 只删除超过该天数未使用的条目；None 表示全部删除
+
+        返回:
+            删除的条目数
+        """
+        cutoff = time.time() - older_than_days * 86400 if older_than_days is not None else None
+        removed = 0
+        for entry in self._entries():
+            if cutoff is None or entry.stat().st_mtime < cutoff:
+                entry.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+class PageCache:
+    """
+    逐页提取结果磁盘缓存（SQLite）
+
+    pdfplumber 的 extract_text() / extract_tables() 是解析中最耗时的部分，
+    而其后的正则/状态机逻辑很便宜。缓存原始提取结果后，修改解析规则重跑整个样本库时
+    只需重新执行 Python 解析层。
+
+    - 键: (文件SHA-256, 页码, 提取类型+参数)，参数中包含 pdfplumber 版本，升级后自动失效
+    - 值: JSON 序列化的文本或表格
+    - 写入先暂存在事务中，由 flush() 统一提交（PDFDocument.close 时调用）
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.db_path = Path(cache_dir or default_cache_dir()) / "pages.sqlite3"
+        self._conn = None
+        self._conn_pid = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """数据库连接（惰性创建；fork 出的子进程会重新连接）"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "file_hash TEXT, page INTEGER, settings TEXT, payload TEXT, "
+                "PRIMARY KEY (file_hash, page, settings))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents (file_hash TEXT PRIMARY KEY, page_count INTEGER)"
+            )
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def get_page_count(self, file_hash: str) -> Optional[int]:
+        """查询已缓存的总页数"""
+        row = self.conn.execute("SELECT page_count FROM documents WHERE file_hash = ?", (file_hash,)).fetchone()
+        return row[0] if row else None
+
+    def put_page_count(self, file_hash: str, page_count: int):
+        self.conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?)", (file_hash, page_count))
+
+    def get(self, file_hash: str, page: int, settings: str) -> Optional[Any]:
+        """
+        查询某页的提取结果
+
+        参数:
+            settings: 提取类型与参数的标识，如 "text:pdfplumber-0.11.0:{}"
+
+        返回:
+            命中时返回文本或表格，未命中返回 None
+        """
+        row = self.conn.execute(
+            "SELECT payload FROM pages WHERE file_hash = ? AND page = ? AND settings = ?",
+            (file_hash, page, settings)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, file_hash: str, page: int, settings: str, value: Any):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+            (file_hash, page, settings, json.dumps(value, ensure_ascii=False))
+        )
+
+    def flush(self):
+        """提交暂存的写入"""
+        if self._conn is not None and self._conn_pid == os.getpid():
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计：文档数、页面条目数、数据库大小"""
+        if not self.db_path.exists():
+            return {"数据库": str(self.db_path), "文档数": 0, "页面条目数": 0, "大小(MB)": 0.0}
+        documents = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        pages = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {
+            "数据库": str(self.db_path),
+            "文档数": documents,
+            "页面条目数": pages,
+            "大小(MB)": round(self.db_path.stat().st_size / 1024 / 1024, 2)
+        }
+
+    def purge(self) -> int:
+        """清空所有页面缓存，返回删除的页面条目数"""
+        if not self.db_path.exists():
+            return 0
+        removed = self.conn.execute("DELETE FROM pages").rowcount
+        self.conn.execute("DELETE FROM documents")
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+        return removed
+
+    def close(self):
+        if self._conn is not None and self._conn_pid == os.getpid():
+            self._conn.commit()
+            self._conn.close()
+        self._conn = None
+        self._conn_pid = None
+
+
+class AIResponseCache:
+    """
+    AI 兜底解析结果磁盘缓存（SQLite）
+
+    同样的格式错乱行（常见的 POS MDC 商户、固定入账）在每次重跑每份对账单时都会再次请求 AI；
+    缓存后重跑不再访问网络。
+
+    - 键: sha256(模型名 + 日期 + 规范化的行文本)，行文本合并连续空白
+    - 值: JSON 序列化的解析结果（{"debit", "credit", "balance", "payee"}）；失败的解析不缓存
+    - 过期: 超过 ttl_days 的条目视为未命中（config.AI_CACHE_TTL_DAYS）
+    - 容量: 超过 max_bytes 后按最近使用时间淘汰（config.AI_CACHE_MAX_MB）
+    - hits / misses: 本实例的命中与未命中次数
+    - 可在 AI 解析器的后台线程中写入，连接访问由锁保护
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, ttl_days: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        if ttl_days is None:
+            ttl_days = getattr(config, 'AI_CACHE_TTL_DAYS', 90) if config else 90
+        if max_bytes is None:
+            max_mb = getattr(config, 'AI_CACHE_MAX_MB', 64) if config else 64
+            max_bytes = int(max_mb * 1024 * 1024)
+        self.db_path = Path(cache_dir or default_cache_dir()) / "ai_responses.sqlite3"
+        self.ttl_seconds = ttl_days * 86400
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """数据库连接（惰性创建；fork 出的子进程会重新连接）"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, payload TEXT, size INTEGER, created REAL, accessed REAL)"
+            )
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def make_key(line_text: str, date_str: str, model: str) -> str:
+        """缓存键：模型名、日期和合并空白后的行文本的 sha256"""
+        normalized = " ".join(line_text.split())
+        return hashlib.sha256(f"{model}\x1f{date_str.strip()}\x1f{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, line_text: str, date_str: str, model: str) -> Optional[Dict[str, Any]]:
+        """
+        查询缓存
+
+        返回:
+            命中时返回解析结果，未命中或已过期返回 None
+        """
+        key = self.make_key(line_text, date_str, model)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT payload, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, line_text: str, date_str: str, model: str, result: Dict[str, Any]):
+        """写入一条解析结果（由 flush 统一提交）"""
+        payload = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (self.make_key(line_text, date_str, model), model, payload, len(payload.encode('utf-8')), now, now)
+            )
+
+    def flush(self):
+        """提交暂存的写入，并清理过期和超出容量的条目"""
+        with self._lock:
+            if self._conn is None or self._conn_pid != os.getpid():
+                return
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """删除过期条目；总大小超过上限时按最近使用时间从旧到新删除"""
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            removed += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+        logger.info(f"AI 响应缓存超出上限，淘汰 {removed} 个条目")
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计：条目数、数据大小、上限、本实例命中率"""
+        lookups = self.hits + self.misses
+        stats = {
+            "数据库": str(self.db_path),
+            "条目数": 0,
+            "数据大小(MB)": 0.0,
+            "上限(MB)": round(self.max_bytes / 1024 / 1024, 2),
+            "命中": self.hits,
+            "未命中": self.misses,
+            "命中率": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+        if self.db_path.exists():
+            with self._lock:
+                count, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            stats["条目数"] = count
+            stats["数据大小(MB)"] = round(size / 1024 / 1024, 2)
+        return stats
+
+    def purge(self) -> int:
+        """清空缓存，返回删除的条目数"""
+        if not self.db_path.exists():
+            return 0
+        with self._lock:
+            removed = self.conn.execute("DELETE FROM responses").rowcount
+            self.conn.commit()
+            self.conn.execute("VACUUM")
+        return removed
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.commit()
+                self._conn.close()
+            self._conn = None
+            self._conn_pid = None
@@ -1,29 +1,70 @@
 """
 Excel导出模块 - 将标准化后的数据导出为Excel文件
 """
+import math
+import itertools
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from copy import copy
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
 from openpyxl.utils import get_column_letter
-from typing import Dict, Any
+from typing import Dict, Any, List, Iterable, Iterator, Tuple, Union
 import logging
 from pathlib import Path
 
+from .normalizer import STANDARD_COLUMNS
+from . import metrics
+
 
 logger = logging.getLogger(__name__)
 
 
+# 金额列（数值格式，2位小数，千位分隔符）
+AMOUNT_COLUMNS = ['Debit', 'Credit', 'Balance']
+AMOUNT_FORMAT = '#,##0.00'
+DATE_FORMAT = 'YYYY-MM-DD'
+
+# 交易记录Sheet列宽
+TRANSACTIONS_COLUMN_WIDTHS = {
+    'A': 12,  # Date
+    'B': 15,  # Account Currency
+    'C': 25,  # Payer
+    'D': 25,  # Payee
+    'E': 15,  # Debit
+    'F': 15,  # Credit
+    'G': 15,  # Balance
+    'H': 20,  # Reference
+    'I': 50   # Description
+}
+
+# 汇总信息Sheet列宽
+SUMMARY_COLUMN_WIDTHS = {
+    'A': 25,  # 项目
+    'B': 30   # 值
+}
+
+
 class FileLockedError(Exception):
     """文件被占用异常"""
     pass
 
 
-def export_to_excel(df: pd.DataFrame, summary: Dict[str, Any], output_path: str) -> str:
+@metrics.timed("export.excel")
+def export_to_excel(df: Union[pd.DataFrame, Iterable[pd.DataFrame]], summary: Dict[str, Any],
+                    output_path: str) -> str:
     """
     导出数据到Excel文件
     
+    使用 openpyxl 只写模式一次写出：单元格在写入时直接引用共享的命名样式，
+    不再先用 pd.ExcelWriter 写文件、再整体加载逐格设置样式后二次保存。
+    
+    df 也可以是分块DataFrame的迭代器（如逐页/逐文件解析的结果），
+    各块依次流式写入磁盘，内存占用与总行数无关。
+    
     参数:
-        df: 标准化后的交易记录DataFrame（9列标准字段）
+        df: 标准化后的交易记录DataFrame（9列标准字段），或列相同的分块DataFrame迭代器
         summary: 汇总信息字典
         output_path: 输出文件路径
         
@@ -36,17 +77,20 @@ def export_to_excel(df: pd.DataFrame, summary: Dict[str, Any], output_path: str)
     logger.info(f"开始导出Excel文件: {output_path}")
     
     try:
-        # 使用ExcelWriter创建Excel文件
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            # Sheet1: Transactions（交易记录）
-            df.to_excel(writer, sheet_name='Transactions', index=False)
-            
-            # Sheet2: Summary（汇总信息）
-            summary_df = _create_summary_dataframe(summary)
-            summary_df.to_excel(writer, sheet_name='Summary', index=False)
+        workbook = Workbook(write_only=True)
+        styles = _register_named_styles(workbook)
         
-        # 格式化Excel文件
-        _format_excel_file(output_path)
+        # Sheet1: Transactions（交易记录）
+        if isinstance(df, pd.DataFrame):
+            columns, rows = list(df.columns), _dataframe_rows(df)
+        else:
+            columns, rows = _chunked_rows(df)
+        _write_transactions_sheet(workbook, styles, columns, rows)
+        
+        # Sheet2: Summary（汇总信息）
+        _write_summary_sheet(workbook, styles, _create_summary_dataframe(summary))
+        
+        workbook.save(output_path)
         
         logger.info(f"✅ Excel文件导出成功: {output_path}")
         return output_path
@@ -61,6 +105,183 @@ def export_to_excel(df: pd.DataFrame, summary: Dict[str, Any], output_path: str)
         raise
 
 
+def _thin_border() -> Border:
+    side = Side(style='thin')
+    return Border(left=side, right=side, top=side, bottom=side)
+
+
+def _register_named_styles(workbook: Workbook) -> Dict[str, NamedStyle]:
+    """
+    注册导出用的命名样式（与 _format_transactions_sheet / _format_summary_sheet 的格式一致）
+    
+    返回:
+        {样式名: NamedStyle}
+    """
+    styles = [
+        NamedStyle(
+            name="tx_header",
+            font=Font(bold=True, color="FFFFFF", size=11),
+            fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+            alignment=Alignment(horizontal="center", vertical="center", wrap_text=True),
+            border=_thin_border()
+        ),
+        NamedStyle(
+            name="tx_amount",
+            font=copy(DEFAULT_FONT),
+            number_format=AMOUNT_FORMAT,
+            alignment=Alignment(horizontal="right", vertical="center"),
+            border=_thin_border()
+        ),
+        NamedStyle(
+            name="tx_date",
+            font=copy(DEFAULT_FONT),
+            number_format=DATE_FORMAT,
+            alignment=Alignment(horizontal="center", vertical="center"),
+            border=_thin_border()
+        ),
+        NamedStyle(
+            name="tx_text",
+            font=copy(DEFAULT_FONT),
+            alignment=Alignment(horizontal="left", vertical="center", wrap_text=True),
+            border=_thin_border()
+        ),
+        NamedStyle(
+            name="summary_header",
+            font=Font(bold=True, color="FFFFFF", size=11),
+            fill=PatternFill(start_color="70AD47", end_color="70AD47", fill_type="solid"),
+            alignment=Alignment(horizontal="center", vertical="center"),
+            border=_thin_border()
+        ),
+        NamedStyle(
+            name="summary_item",
+            font=Font(bold=True),
+            alignment=Alignment(horizontal="left", vertical="center"),
+            border=_thin_border()
+        ),
+        NamedStyle(
+            name="summary_value",
+            font=copy(DEFAULT_FONT),
+            alignment=Alignment(horizontal="right", vertical="center"),
+            border=_thin_border()
+        ),
+    ]
+    for style in styles:
+        workbook.add_named_style(style)
+    return {style.name: style for style in styles}
+
+
+def _styled_row(worksheet, values: Iterable[Any], prototypes: List[WriteOnlyCell]) -> List[WriteOnlyCell]:
+    """按列原型样式生成一行只写单元格（样式只是共享样式表的索引，复制代价很小）"""
+    row = []
+    for value, prototype in zip(values, prototypes):
+        cell = WriteOnlyCell(worksheet, value=value)
+        cell._style = copy(prototype._style)
+        row.append(cell)
+    return row
+
+
+def _prototype_cell(worksheet, style: NamedStyle) -> WriteOnlyCell:
+    cell = WriteOnlyCell(worksheet)
+    cell.style = style
+    return cell
+
+
+def _transactions_column_style(column: str) -> str:
+    """交易记录列对应的命名样式"""
+    if column in AMOUNT_COLUMNS:
+        return "tx_amount"
+    if column == 'Date':
+        return "tx_date"
+    return "tx_text"
+
+
+def _dataframe_rows(df: pd.DataFrame) -> Iterable[tuple]:
+    """逐行产出单元格值（空值转换为 None，即空单元格）"""
+    values = df.astype(object).where(df.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+def _chunked_rows(chunks: Iterable[pd.DataFrame]) -> Tuple[List[str], Iterator[tuple]]:
+    """
+    分块DataFrame -> (列名, 逐行值迭代器)
+    
+    列名取自第一块，后续各块按相同列顺序输出；没有任何分块时使用标准列。
+    每次只转换当前一块，已写出的块可以被回收。
+    """
+    iterator = iter(chunks)
+    first = next(iterator, None)
+    if first is None:
+        return list(STANDARD_COLUMNS), iter(())
+    
+    columns = list(first.columns)
+    
+    def rows():
+        for chunk in itertools.chain([first], iterator):
+            yield from _dataframe_rows(chunk[columns])
+    
+    return columns, rows()
+
+
+def _cell_value(value: Any) -> Any:
+    """空字符串和 NaN 写为空单元格"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _write_transactions_sheet(workbook: Workbook, styles: Dict[str, NamedStyle],
+                              columns: List[str], rows: Iterable[Iterable[Any]]):
+    """
+    写入交易记录Sheet（表头、列宽、冻结首行、金额/日期的列级数字格式）
+    
+    参数:
+        columns: 列名
+        rows: 行值的可迭代对象，按顺序逐行写出
+    """
+    worksheet = workbook.create_sheet('Transactions')
+    
+    for col_letter, width in TRANSACTIONS_COLUMN_WIDTHS.items():
+        worksheet.column_dimensions[col_letter].width = width
+    for col_idx, column in enumerate(columns, 1):
+        # 列级数字格式：在数据区以外新录入的金额/日期也使用相同格式
+        if column in AMOUNT_COLUMNS:
+            worksheet.column_dimensions[get_column_letter(col_idx)].number_format = AMOUNT_FORMAT
+        elif column == 'Date':
+            worksheet.column_dimensions[get_column_letter(col_idx)].number_format = DATE_FORMAT
+    
+    # 冻结首行
+    worksheet.freeze_panes = 'A2'
+    
+    header_prototype = _prototype_cell(worksheet, styles["tx_header"])
+    worksheet.append(_styled_row(worksheet, columns, [header_prototype] * len(columns)))
+    
+    prototypes = [_prototype_cell(worksheet, styles[_transactions_column_style(column)]) for column in columns]
+    for values in rows:
+        worksheet.append(_styled_row(worksheet, (_cell_value(v) for v in values), prototypes))
+
+
+def _write_summary_sheet(workbook: Workbook, styles: Dict[str, NamedStyle], summary_df: pd.DataFrame):
+    """写入汇总信息Sheet"""
+    worksheet = workbook.create_sheet('Summary')
+    
+    for col_letter, width in SUMMARY_COLUMN_WIDTHS.items():
+        worksheet.column_dimensions[col_letter].width = width
+    
+    # 冻结首行
+    worksheet.freeze_panes = 'A2'
+    
+    columns = list(summary_df.columns)
+    header_prototype = _prototype_cell(worksheet, styles["summary_header"])
+    worksheet.append(_styled_row(worksheet, columns, [header_prototype] * len(columns)))
+    
+    prototypes = [_prototype_cell(worksheet, styles["summary_item"])] + \
+        [_prototype_cell(worksheet, styles["summary_value"])] * (len(columns) - 1)
+    for values in summary_df.itertuples(index=False, name=None):
+        worksheet.append(_styled_row(worksheet, (_cell_value(v) for v in values), prototypes))
+
+
 def _create_summary_dataframe(summary: Dict[str, Any]) -> pd.DataFrame:
     """
     创建汇总信息DataFrame
@@ -108,9 +329,13 @@ def _create_summary_dataframe(summary: Dict[str, Any]) -> pd.DataFrame:
     return pd.DataFrame(data)
 
 
+@metrics.timed("export.format")
 def _format_excel_file(file_path: str):
     """
-    格式化Excel文件（设置样式、列宽等）
+    格式化已有的Excel文件（设置样式、列宽等）
+    
+    export_to_excel 已在写入时直接应用样式；本函数用于格式化其他方式生成的文件，
+    需要整体加载和二次保存，大文件较慢。
     
     参数:
         file_path: Excel文件路径
@@ -169,35 +394,23 @@ def _format_transactions_sheet(worksheet):
             header_cell = worksheet.cell(row=1, column=col_idx)
             header_value = header_cell.value
             
-            if header_value in ['Debit', 'Credit', 'Balance']:
+            if header_value in AMOUNT_COLUMNS:
                 # 金额列：数值格式，2位小数，千位分隔符
-                cell.number_format = '#,##0.00'
+                cell.number_format = AMOUNT_FORMAT
                 cell.alignment = Alignment(horizontal="right", vertical="center")
                 # 确保空值显示为空（不显示0）
                 if cell.value is None or cell.value == '':
                     cell.value = None
             elif header_value == 'Date':
                 # 日期列：日期格式
-                cell.number_format = 'YYYY-MM-DD'
+                cell.number_format = DATE_FORMAT
                 cell.alignment = Alignment(horizontal="center", vertical="center")
             else:
                 # 文本列：左对齐
                 cell.alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
     
     # 设置列宽
-    column_widths = {
-        'A': 12,  # Date
-        'B': 15,  # Account Currency
-        'C': 25,  # Payer
-        'D': 25,  # Payee
-        'E': 15,  # Debit
-        'F': 15,  # Credit
-        'G': 15,  # Balance
-        'H': 20,  # Reference
-        'I': 50   # Description
-    }
-    
-    for col_letter, width in column_widths.items():
+    for col_letter, width in TRANSACTIONS_COLUMN_WIDTHS.items():
         worksheet.column_dimensions[col_letter].width = width
     
     # 冻结首行
@@ -241,8 +454,8 @@ def _format_summary_sheet(worksheet):
                 cell.alignment = Alignment(horizontal="right", vertical="center")
     
     # 设置列宽
-    worksheet.column_dimensions['A'].width = 25  # 项目
-    worksheet.column_dimensions['B'].width = 30  # 值
+    for col_letter, width in SUMMARY_COLUMN_WIDTHS.items():
+        worksheet.column_dimensions[col_letter].width = width
     
     # 冻结首行
     worksheet.freeze_panes = 'A2'
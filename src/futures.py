@@ -0,0 +1,60 @@
+"""
+Future 工具 - 已完成的 Future、结果链接与汇总（只依赖标准库）
+
+解析器和批量转换用它们把同步解析结果与异步 AI 兜底请求统一为 Future；
+放在独立模块中，导入 src.parsers 时不会连带导入 AI 模块（openai 等）。
+"""
+import threading
+import contextvars
+from concurrent.futures import Future
+from typing import Any, List, Callable
+
+
+def completed_future(value: Any) -> Future:
+    """已完成的 Future"""
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def chain_future(future: Future, func: Callable[[Any], Any]) -> Future:
+    """
+    future 完成后以其结果调用 func，返回 func 结果的 Future（异常原样传递）
+
+    func 在调用 chain_future 时的上下文（contextvars）中运行，即使由后台线程完成 future
+    """
+    chained = Future()
+    context = contextvars.copy_context()
+
+    def on_done(done: Future):
+        try:
+            chained.set_result(context.run(func, done.result()))
+        except BaseException as e:
+            chained.set_exception(e)
+
+    future.add_done_callback(on_done)
+    return chained
+
+
+def gather_futures(futures: List[Future]) -> Future:
+    """所有 future 完成后返回结果列表（顺序与输入一致）的 Future"""
+    if not futures:
+        return completed_future([])
+
+    gathered = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            gathered.set_result([f.result() for f in futures])
+        except BaseException as e:
+            gathered.set_exception(e)
+
+    for future in futures:
+        future.add_done_callback(on_done)
+    return gathered
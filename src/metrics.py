@@ -0,0 +1,242 @@
+"""
+运行指标 - 分阶段计时（span），按文件输出 JSON 行，可选汇总为 Prometheus 文本文件
+
+用法:
+    with metrics.span("parse.transactions"):
+        ...
+
+    @metrics.timed("normalize")
+    def normalize_dataframe(...): ...
+
+未启用时 span() 直接返回共享的空上下文，timed() 包装的函数只多一次标志判断。
+启用后（config.METRICS_ENABLED 或 enable()），每次计时累加到：
+- 进程内总计（totals()）
+- 当前上下文的文件指标（collect(FileMetrics()) 期间，batch 按文件收集后写出 JSON 行）
+
+span 名称用点号分层：pdf.*（pdfplumber 提取）、parse.*（解析逻辑）、ai.*（AI 兜底）、
+normalize、export.*；嵌套的 span 各自计入完整耗时（外层包含内层）。
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+import functools
+import contextlib
+import contextvars
+from pathlib import Path
+from typing import Dict, Any, List, Iterable, Optional, Callable
+
+# 导入配置文件
+try:
+    import config
+except ImportError:
+    config = None
+
+
+# Prometheus 指标名前缀
+PROMETHEUS_PREFIX = "statement_converter"
+
+_enabled = bool(getattr(config, 'METRICS_ENABLED', False)) if config else False
+_NULL_SPAN = contextlib.nullcontext()
+_totals: Dict[str, Dict[str, float]] = {}
+_totals_lock = threading.Lock()
+_current: contextvars.ContextVar[Optional["FileMetrics"]] = contextvars.ContextVar("metrics_file", default=None)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable(flag: bool = True):
+    """启用或停用计时（也用作工作进程的 initializer）"""
+    global _enabled
+    _enabled = flag
+
+
+def default_metrics_file() -> str:
+    return getattr(config, 'METRICS_FILE', 'metrics.jsonl') if config else 'metrics.jsonl'
+
+
+def default_prometheus_file() -> str:
+    return getattr(config, 'METRICS_PROMETHEUS_FILE', '') if config else ''
+
+
+def _accumulate(spans: Dict[str, Dict[str, float]], name: str, seconds: float):
+    entry = spans.get(name)
+    if entry is None:
+        spans[name] = {"count": 1, "seconds": seconds, "max": seconds}
+    else:
+        entry["count"] += 1
+        entry["seconds"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+
+
+class FileMetrics:
+    """单个文件的 span 汇总：{span名: {"count", "seconds", "max"}}"""
+
+    def __init__(self):
+        self.spans: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            _accumulate(self.spans, name, seconds)
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        seconds = time.perf_counter() - self.start
+        with _totals_lock:
+            _accumulate(_totals, self.name, seconds)
+        collector = _current.get()
+        if collector is not None:
+            collector.add(self.name, seconds)
+        return False
+
+
+def span(name: str):
+    """计时上下文；未启用时返回共享的空上下文"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def timed(name: str) -> Callable:
+    """把整个函数作为一个 span 计时的装饰器"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_collector() -> Optional[FileMetrics]:
+    """当前上下文的文件指标（不在 collect 期间时为 None）"""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def collect(file_metrics: FileMetrics):
+    """在此期间（当前线程/上下文）结束的 span 同时计入 file_metrics"""
+    token = _current.set(file_metrics)
+    try:
+        yield file_metrics
+    finally:
+        _current.reset(token)
+
+
+def totals() -> Dict[str, Dict[str, float]]:
+    """进程内所有 span 的累计（副本）"""
+    with _totals_lock:
+        return {name: dict(entry) for name, entry in _totals.items()}
+
+
+def reset():
+    with _totals_lock:
+        _totals.clear()
+
+
+def write_json_lines(path: str, records: Iterable[Dict[str, Any]]):
+    """逐条追加为 JSON 行（每行一个文件的结果）"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, sort_keys=True) + "\n")
+
+
+def read_json_lines(path: str) -> List[Dict[str, Any]]:
+    """读取 JSON 行文件（跳过损坏的行）"""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_prometheus(records: Iterable[Dict[str, Any]]) -> str:
+    """
+    把按文件的 JSON 行记录汇总为 Prometheus 文本格式
+
+    指标:
+        <前缀>_files_total{bank, status}       文件数
+        <前缀>_file_seconds_total{bank}        文件总耗时
+        <前缀>_rows_total{bank}                输出行数
+        <前缀>_span_seconds_total{span}        各 span 累计耗时
+        <前缀>_span_count_total{span}          各 span 次数
+        <前缀>_span_max_seconds{span}          各 span 单次最长耗时
+    """
+    files: Dict[tuple, int] = {}
+    file_seconds: Dict[str, float] = {}
+    rows: Dict[str, int] = {}
+    spans: Dict[str, Dict[str, float]] = {}
+    for record in records:
+        bank = record.get("bank", "Unknown")
+        key = (bank, record.get("status", "unknown"))
+        files[key] = files.get(key, 0) + 1
+        file_seconds[bank] = file_seconds.get(bank, 0.0) + record.get("seconds", 0.0)
+        rows[bank] = rows.get(bank, 0) + record.get("rows", 0)
+        for name, entry in record.get("spans", {}).items():
+            total = spans.setdefault(name, {"count": 0, "seconds": 0.0, "max": 0.0})
+            total["count"] += entry["count"]
+            total["seconds"] += entry["seconds"]
+            total["max"] = max(total["max"], entry["max"])
+
+    lines: List[str] = []
+
+    def metric(name: str, kind: str, help_text: str, samples: List[tuple]):
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels)
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}{{{label_text}}} {value}")
+
+    metric("files_total", "counter", "Converted files by bank and status",
+           [((("bank", bank), ("status", status)), count) for (bank, status), count in sorted(files.items())])
+    metric("file_seconds_total", "counter", "Wall time spent per bank",
+           [((("bank", bank),), round(seconds, 6)) for bank, seconds in sorted(file_seconds.items())])
+    metric("rows_total", "counter", "Transaction rows written per bank",
+           [((("bank", bank),), count) for bank, count in sorted(rows.items())])
+    metric("span_seconds_total", "counter", "Time spent in each pipeline span",
+           [((("span", name),), round(entry["seconds"], 6)) for name, entry in sorted(spans.items())])
+    metric("span_count_total", "counter", "Number of times each pipeline span ran",
+           [((("span", name),), entry["count"]) for name, entry in sorted(spans.items())])
+    metric("span_max_seconds", "gauge", "Longest single run of each pipeline span",
+           [((("span", name),), round(entry["max"], 6)) for name, entry in sorted(spans.items())])
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str, records: Iterable[Dict[str, Any]]):
+    """写出 Prometheus 文本文件（先写临时文件再原子替换，供 node_exporter textfile 收集）"""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(format_prometheus(records))
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
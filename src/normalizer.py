@@ -2,9 +2,12 @@
 数据标准化模块 - 确保输出9列标准表头，处理缺失值
 """
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, List, Optional
 import logging
 
+from .utils import parse_dates_vectorized
+from . import metrics
+
 
 logger = logging.getLogger(__name__)
 
@@ -23,12 +26,15 @@ STANDARD_COLUMNS = [
 ]
 
 
-def normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+@metrics.timed("normalize")
+def normalize_dataframe(df: pd.DataFrame, parse_dates: bool = False) -> pd.DataFrame:
     """
     标准化DataFrame，确保输出9列标准表头
     
     参数:
         df: 原始DataFrame（可能列名不标准或缺失列）
+        parse_dates: 为 True 时 Date 列整列转换为 datetime64（无法解析为 NaT），
+                     默认保持 YYYY-MM-DD 字符串
         
     返回:
         标准化后的DataFrame，包含9列标准字段
@@ -38,9 +44,12 @@ def normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     # 创建新的DataFrame，确保包含所有标准列
     normalized_df = pd.DataFrame()
     
-    # 1. Date - 确保是字符串格式 YYYY-MM-DD
+    # 1. Date - 确保是字符串格式 YYYY-MM-DD（或按需转换为 datetime64）
     if 'Date' in df.columns:
-        normalized_df['Date'] = df['Date'].astype(str)
+        if parse_dates:
+            normalized_df['Date'] = parse_dates_vectorized(df['Date'])
+        else:
+            normalized_df['Date'] = df['Date'].astype(str)
     else:
         normalized_df['Date'] = ''
         logger.warning("缺少 Date 列，使用空字符串填充")
@@ -109,6 +118,29 @@ def normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     return normalized_df
 
 
+def normalize_stream(batches: Iterable[List[Dict[str, Any]]], summary: Optional[Dict[str, Any]] = None,
+                     parse_dates: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    逐批标准化解析器产出的交易记录（BaseParser.iter_transactions）
+    
+    参数:
+        batches: 交易记录批次 [{字段: 值}, ...]，空批次跳过
+        summary: 解析器的 stream_summary；流结束时原地替换为 normalize_summary 的结果，
+                 汇总写在交易之后的输出（Excel、CSV）因此拿到的是标准化后的汇总
+        parse_dates: 同 normalize_dataframe
+        
+    产出:
+        每批一个标准化后的 DataFrame（9列标准字段）
+    """
+    for batch in batches:
+        if batch:
+            yield normalize_dataframe(pd.DataFrame(batch), parse_dates=parse_dates)
+    if summary is not None:
+        normalized = normalize_summary(summary)
+        summary.clear()
+        summary.update(normalized)
+
+
 def _normalize_amount_column(series: pd.Series) -> pd.Series:
     """
     标准化金额列，确保是纯数值格式
@@ -118,48 +150,69 @@ def _normalize_amount_column(series: pd.Series) -> pd.Series:
         
     返回:
         标准化后的Series（float类型，空值保持为NaN）
+        
+    规则（整列向量化处理）:
+        - 空值、空字符串 -> NaN（不填0）
+        - 数值 -> float
+        - 字符串 -> 先整体转换；失败时（如带货币后缀、千位分隔符）取最后一个数字
+        - 其他类型或无法解析 -> NaN，并记录警告
     """
-    result = pd.Series(dtype=float)
-    
-    for idx, value in series.items():
-        if pd.isna(value) or value == '' or value is None:
-            # 空值保持为NaN（不填0）
-            result.loc[idx] = None
-        elif isinstance(value, (int, float)):
-            # 已经是数值，直接使用
-            result.loc[idx] = float(value)
-        elif isinstance(value, str):
-            # 字符串，尝试转换为数值
-            value_clean = value.strip()
-            if value_clean == '':
-                result.loc[idx] = None
-            else:
-                try:
-                    # 尝试直接转换
-                    result.loc[idx] = float(value_clean)
-                except ValueError:
-                    # 如果失败，可能是包含货币符号，尝试提取数字
-                    import re
-                    # 提取数字（包括小数点）
-                    numbers = re.findall(r'[\d,]+\.?\d*', value_clean)
-                    if numbers:
-                        # 取最后一个数字（通常是金额）
-                        num_str = numbers[-1].replace(',', '')
-                        try:
-                            result.loc[idx] = float(num_str)
-                        except ValueError:
-                            logger.warning(f"无法解析金额: {value}，设为 None")
-                            result.loc[idx] = None
-                    else:
-                        logger.warning(f"无法解析金额: {value}，设为 None")
-                        result.loc[idx] = None
-        else:
-            logger.warning(f"未知的金额类型: {type(value)}, 值: {value}，设为 None")
-            result.loc[idx] = None
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        # 已经是数值列，直接使用
+        return series.astype(float)
+    
+    # 按位置处理（索引可能重复，如多份对账单 concat 后），返回前恢复原索引
+    values = series.astype(object).reset_index(drop=True)
+    result = pd.Series(float('nan'), index=values.index, dtype=float)
+    
+    is_na = values.isna()
+    is_number = values.map(lambda v: isinstance(v, (int, float))) & ~is_na
+    is_str = values.map(lambda v: isinstance(v, str))
+    
+    # 已经是数值，直接使用
+    if is_number.any():
+        result[is_number] = pd.to_numeric(values[is_number]).astype(float)
     
+    # 字符串，尝试转换为数值（空字符串保持为NaN）
+    text = values[is_str].str.strip()
+    text = text[text != '']
+    if not text.empty:
+        direct = pd.to_numeric(text, errors='coerce')
+        result[direct.index] = direct
+        
+        failed = text[direct.isna() & (text.str.lower() != 'nan')]
+        if not failed.empty:
+            # float() 支持下划线分组（如 "1_000"），pandas 不支持，这类少见值单独转换
+            underscored = failed[failed.str.contains('_', regex=False)].map(_float_or_nan).dropna()
+            if not underscored.empty:
+                result[underscored.index] = underscored
+                failed = failed.drop(underscored.index)
+            
+            # 包含货币符号等，提取最后一个数字（通常是金额）；不含数字的值（如 "-"、"N/A"）保持为 NaN
+            numbers = failed.str.findall(r'[\d,]+\.?\d*').str.get(-1).dropna()
+            numbers = numbers.astype(str).str.replace(',', '', regex=False)
+            fallback = pd.to_numeric(numbers, errors='coerce').reindex(failed.index)
+            result[fallback.index] = fallback
+            
+            for value in failed[fallback.isna()]:
+                logger.warning(f"无法解析金额: {value}，设为 None")
+    
+    others = ~(is_na | is_number | is_str)
+    for value in values[others]:
+        logger.warning(f"未知的金额类型: {type(value)}, 值: {value}，设为 None")
+    
+    result.index = series.index
     return result
 
 
+def _float_or_nan(value: str) -> float:
+    """float() 转换，失败返回 NaN"""
+    try:
+        return float(value)
+    except ValueError:
+        return float('nan')
+
+
 def normalize_summary(summary: Dict[str, Any]) -> Dict[str, Any]:
     """
     标准化汇总信息字典
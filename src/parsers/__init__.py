@@ -1,9 +1,33 @@
 """
 解析器模块 - 支持Airwallex、HSBC等银行对账单解析
+
+具体的解析器类按需导入（PEP 562 模块 __getattr__）：只有访问 AirwallexParser / HSBCParser
+或 registry 选中对应银行时才加载其模块
 """
+import importlib
+
+from .document import PDFDocument, PDFSource, MemoryLimits, ResourceLimitError
 from .base_parser import BaseParser
-from .airwallex_parser import AirwallexParser
-from .hsbc_parser import HSBCParser
+from . import registry
+
+# 惰性导出：名称 -> 所在模块（相对本包）
+_LAZY_EXPORTS = {
+    'AirwallexParser': '.airwallex_parser',
+    'HSBCParser': '.hsbc_parser',
+}
+
+__all__ = ['PDFDocument', 'PDFSource', 'MemoryLimits', 'ResourceLimitError', 'BaseParser', 'registry',
+           'AirwallexParser', 'HSBCParser']
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
 
-__all__ = ['BaseParser', 'AirwallexParser', 'HSBCParser']
 
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
@@ -3,45 +3,53 @@ Airwallex 对账单解析器
 """
 import re
 import logging
-import pdfplumber
 import pandas as pd
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator
 from datetime import datetime
 
 from .base_parser import BaseParser
+from .document import PDFDocument
+from .. import metrics
 from ..utils import parse_date_airwallex, parse_amount
 
 
 class AirwallexParser(BaseParser):
     """Airwallex 对账单解析器"""
     
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
+    # 解析逻辑版本号：修改解析规则后递增，旧的缓存结果会自动失效
+    PARSER_VERSION = "1.0"
     
-    def identify_bank(self, pdf_path: str) -> str:
-        """识别银行类型"""
-        # 从文件名判断
-        if "ASR_" in pdf_path.upper() or "airwallex" in pdf_path.lower():
-            return "Airwallex"
-        return "Unknown"
+    BANK_NAME = "Airwallex"
+    # 首页账户汇总标题: "HKD Account Summary"
+    CURRENCY_PATTERN = re.compile(r'\b([A-Z]{3}) Account Summary')
+    
+    def __init__(self, page_cache=None, page_workers: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        # 可选的逐页提取磁盘缓存（src.cache.PageCache）
+        self.page_cache = page_cache
+        # 页面并行提取的进程数（None 表示取 config.PAGE_WORKERS）
+        self.page_workers = page_workers
+        # 最近一次 iter_transactions 的汇总信息
+        self.stream_summary: Dict[str, Any] = {}
     
-    def parse(self, pdf_path: str) -> tuple[pd.DataFrame, Dict[str, Any]]:
+    def parse_document(self, doc: PDFDocument) -> tuple[pd.DataFrame, Dict[str, Any]]:
         """
         解析 Airwallex PDF 对账单
         
         返回:
             (transactions_df, summary_dict)
         """
+        pdf_path = doc.pdf_path
         self.logger.info(f"开始解析 Airwallex 文件: {pdf_path}")
         
         # 提取币种
-        currency = self._extract_currency_from_filename(pdf_path)
+        currency = self._extract_currency(doc)
         
         # 提取交易记录
-        transactions = self._extract_transactions(pdf_path, currency)
+        transactions = self._extract_transactions(doc, currency)
         
         # 提取汇总信息（传入交易笔数，避免重复解析）
-        summary = self._extract_summary(pdf_path, currency, len(transactions))
+        summary = self._extract_summary(doc, currency, len(transactions))
         
         # 转换为 DataFrame
         df = pd.DataFrame(transactions)
@@ -50,6 +58,15 @@ class AirwallexParser(BaseParser):
         
         return df, summary
     
+    def _extract_currency(self, doc: PDFDocument) -> str:
+        """提取币种：优先取文件名，文件名中没有时（内存输入、重命名过的文件）取首页的账户汇总标题"""
+        currency = self._extract_currency_from_filename(doc.pdf_path)
+        if currency == "Unknown" and doc.page_count > 0:
+            match = self.CURRENCY_PATTERN.search(doc.page_text(0))
+            if match:
+                return match.group(1)
+        return currency
+    
     def _extract_currency_from_filename(self, pdf_path: str) -> str:
         """从文件名提取币种"""
         # 文件名格式: {序号}-{公司名}-ASR_{币种}_{开始日期}_{结束日期}.pdf
@@ -58,101 +75,142 @@ class AirwallexParser(BaseParser):
             return match.group(1)
         return "Unknown"
     
-    def _extract_transactions(self, pdf_path: str, currency: str) -> List[Dict[str, Any]]:
-        """提取交易记录"""
+    @metrics.timed("parse.transactions")
+    def _extract_transactions(self, doc: PDFDocument, currency: str) -> List[Dict[str, Any]]:
+        """
+        提取交易记录
+        
+        页数足够多时先在进程池中并行提取各页的表格和文本（各页互不依赖），
+        再按页序逐页解析：跨页的续行（没有日期的行）仍合并到上一页的最后一笔交易
+        """
+        self._prefetch_pages(doc)
+        
         transactions = []
         
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                # 提取表格
-                tables = page.extract_tables()
+        for page_index in range(doc.page_count):
+            self._parse_page(doc, page_index, currency, transactions)
+            doc.release_page(page_index)
+        
+        return transactions
+    
+    def _parse_page(self, doc: PDFDocument, page_index: int, currency: str, transactions: List[Dict[str, Any]]):
+        """解析一页的表格，交易追加到 transactions（没有日期的续行合并到 transactions 的最后一笔）"""
+        # 提取表格（复用文档会话的页面缓存）
+        tables = doc.page_tables(page_index)
+        
+        for table in tables:
+            if not table or len(table) < 2:
+                continue
+            
+            # 查找表头行
+            header_row_idx = None
+            for i, row in enumerate(table):
+                if row and len(row) >= 5:
+                    # 检查是否是表头（包含 Date, Details, Credit, Debit, Balance）
+                    row_text = ' '.join([str(cell) if cell else '' for cell in row]).upper()
+                    if 'DATE' in row_text and 'DETAILS' in row_text:
+                        header_row_idx = i
+                        break
+            
+            if header_row_idx is None:
+                continue
+            
+            # 处理数据行
+            for row_idx in range(header_row_idx + 1, len(table)):
+                row = table[row_idx]
+                if not row or len(row) < 5:
+                    continue
                 
-                for table in tables:
-                    if not table or len(table) < 2:
-                        continue
-                    
-                    # 查找表头行
-                    header_row_idx = None
-                    for i, row in enumerate(table):
-                        if row and len(row) >= 5:
-                            # 检查是否是表头（包含 Date, Details, Credit, Debit, Balance）
-                            row_text = ' '.join([str(cell) if cell else '' for cell in row]).upper()
-                            if 'DATE' in row_text and 'DETAILS' in row_text:
-                                header_row_idx = i
-                                break
-                    
-                    if header_row_idx is None:
-                        continue
-                    
-                    # 处理数据行
-                    for row_idx in range(header_row_idx + 1, len(table)):
-                        row = table[row_idx]
-                        if not row or len(row) < 5:
-                            continue
-                        
-                        # 跳过空行
-                        if all(not cell or str(cell).strip() == '' for cell in row):
-                            continue
-                        
-                        # 提取字段
-                        date_str = str(row[0]).strip() if row[0] else ""
-                        details_str = str(row[1]).strip() if row[1] else ""
-                        credit_str = str(row[2]).strip() if row[2] else ""
-                        debit_str = str(row[3]).strip() if row[3] else ""
-                        balance_str = str(row[4]).strip() if row[4] else ""
-                        
-                        # 如果日期为空，可能是多行 Details 的延续，合并到上一条记录
-                        if not date_str and transactions:
-                            # 合并到上一条记录的 Details
-                            last_tx = transactions[-1]
-                            if details_str:
-                                # 合并 Description
-                                last_tx['Description'] = (last_tx.get('Description', '') + ' ' + details_str).strip()
-                                
-                                # 重新解析合并后的完整描述，提取 Reference、Payer、Payee 等信息
-                                details_info = self._parse_details_with_regex(last_tx['Description'])
-                                
-                                # 如果字段是默认值，则用新解析的结果更新它们
-                                if last_tx.get('Payer') == 'Unknown' and details_info.get('payer') != 'Unknown':
-                                    last_tx['Payer'] = details_info.get('payer', 'Unknown')
-                                
-                                if last_tx.get('Payee') == 'Unknown' and details_info.get('payee') != 'Unknown':
-                                    last_tx['Payee'] = details_info.get('payee', 'Unknown')
-                                
-                                # Reference 字段：如果之前为空，则更新
-                                if not last_tx.get('Reference') and details_info.get('reference'):
-                                    last_tx['Reference'] = details_info.get('reference', '')
-                            continue
-                        
-                        # 解析日期
-                        date = parse_date_airwallex(date_str)
-                        if not date:
-                            continue
+                # 跳过空行
+                if all(not cell or str(cell).strip() == '' for cell in row):
+                    continue
+                
+                # 提取字段
+                date_str = str(row[0]).strip() if row[0] else ""
+                details_str = str(row[1]).strip() if row[1] else ""
+                credit_str = str(row[2]).strip() if row[2] else ""
+                debit_str = str(row[3]).strip() if row[3] else ""
+                balance_str = str(row[4]).strip() if row[4] else ""
+                
+                # 如果日期为空，可能是多行 Details 的延续，合并到上一条记录
+                if not date_str and transactions:
+                    # 合并到上一条记录的 Details
+                    last_tx = transactions[-1]
+                    if details_str:
+                        # 合并 Description
+                        last_tx['Description'] = (last_tx.get('Description', '') + ' ' + details_str).strip()
                         
-                        # 解析金额
-                        credit = parse_amount(credit_str) if credit_str else None
-                        debit = parse_amount(debit_str) if debit_str else None
-                        balance = parse_amount(balance_str) if balance_str else None
+                        # 重新解析合并后的完整描述，提取 Reference、Payer、Payee 等信息
+                        details_info = self._parse_details_with_regex(last_tx['Description'])
                         
-                        # 解析 Details 字段（正则解析）
-                        details_info = self._parse_details_with_regex(details_str)
+                        # 如果字段是默认值，则用新解析的结果更新它们
+                        if last_tx.get('Payer') == 'Unknown' and details_info.get('payer') != 'Unknown':
+                            last_tx['Payer'] = details_info.get('payer', 'Unknown')
                         
-                        # 构建交易记录
-                        transaction = {
-                            'Date': date,
-                            'Account Currency': currency,
-                            'Payer': details_info.get('payer', 'Unknown'),
-                            'Payee': details_info.get('payee', 'Unknown'),
-                            'Debit': debit if debit else '',
-                            'Credit': credit if credit else '',
-                            'Balance': balance if balance else '',
-                            'Reference': details_info.get('reference', ''),
-                            'Description': details_str
-                        }
+                        if last_tx.get('Payee') == 'Unknown' and details_info.get('payee') != 'Unknown':
+                            last_tx['Payee'] = details_info.get('payee', 'Unknown')
                         
-                        transactions.append(transaction)
+                        # Reference 字段：如果之前为空，则更新
+                        if not last_tx.get('Reference') and details_info.get('reference'):
+                            last_tx['Reference'] = details_info.get('reference', '')
+                    continue
+                
+                # 解析日期
+                date = parse_date_airwallex(date_str)
+                if not date:
+                    continue
+                
+                # 解析金额
+                credit = parse_amount(credit_str) if credit_str else None
+                debit = parse_amount(debit_str) if debit_str else None
+                balance = parse_amount(balance_str) if balance_str else None
+                
+                # 解析 Details 字段（正则解析）
+                details_info = self._parse_details_with_regex(details_str)
+                
+                # 构建交易记录
+                transaction = {
+                    'Date': date,
+                    'Account Currency': currency,
+                    'Payer': details_info.get('payer', 'Unknown'),
+                    'Payee': details_info.get('payee', 'Unknown'),
+                    'Debit': debit if debit else '',
+                    'Credit': credit if credit else '',
+                    'Balance': balance if balance else '',
+                    'Reference': details_info.get('reference', ''),
+                    'Description': details_str
+                }
+                
+                transactions.append(transaction)
+
+    def iter_document_transactions(self, doc: PDFDocument) -> Iterator[List[Dict[str, Any]]]:
+        """
+        逐页产出交易记录
         
-        return transactions
+        每页的最后一笔交易留到下一页一起产出（下一页开头没有日期的续行会合并到它的描述）。
+        迭代结束后汇总信息写入 self.stream_summary。
+        """
+        pdf_path = doc.pdf_path
+        self.logger.info(f"开始逐页解析 Airwallex 文件: {pdf_path}")
+        currency = self._extract_currency(doc)
+        
+        count = 0
+        carry: List[Dict[str, Any]] = []
+        for page_index in range(doc.page_count):
+            transactions = carry
+            with metrics.span("parse.transactions"):
+                self._parse_page(doc, page_index, currency, transactions)
+            doc.release_page(page_index)
+            ready, carry = transactions[:-1], transactions[-1:]
+            if ready:
+                count += len(ready)
+                yield ready
+        if carry:
+            count += len(carry)
+            yield carry
+        
+        self.stream_summary.update(self._extract_summary(doc, currency, count))
+        self.logger.info(f"逐页解析完成: 提取到 {count} 条交易记录")
     
     def _parse_details_with_regex(self, details: str) -> Dict[str, str]:
         """
@@ -227,17 +285,18 @@ class AirwallexParser(BaseParser):
             "reference": reference
         }
     
-    def _extract_summary(self, pdf_path: str, currency: str, transaction_count: int) -> Dict[str, Any]:
+    @metrics.timed("parse.summary")
+    def _extract_summary(self, doc: PDFDocument, currency: str, transaction_count: int) -> Dict[str, Any]:
         """
         提取汇总信息（仅从页眉/页脚文本提取，不解析表格）
         
         参数:
-            pdf_path: PDF文件路径
+            doc: PDF文档会话（复用已缓存的页面文本，不再重新打开文件）
             currency: 币种
             transaction_count: 交易笔数（由调用方传入，避免重复解析）
         """
         summary = {
-            "原始文件": pdf_path,
+            "原始文件": doc.pdf_path,
             "银行": "Airwallex",
             "账户币种": currency,
             "统计期间": "",
@@ -248,66 +307,63 @@ class AirwallexParser(BaseParser):
             "交易笔数": transaction_count
         }
         
-        with pdfplumber.open(pdf_path) as pdf:
-            full_text = ""
-            for page in pdf.pages:
-                full_text += page.extract_text() or ""
-            
-            # 提取期初余额: "Starting balance on {日期} {金额} {币种}"
-            # 格式: "Starting balance on Jan 01 2024 0.00 HKD"
-            start_match = re.search(
-                rf'Starting balance on\s+([A-Za-z]+\s+\d+\s+\d+)\s+([\d,]+\.\d+)\s+{currency}',
-                full_text,
-                re.IGNORECASE
-            )
-            if start_match:
-                start_date_str = start_match.group(1).strip()
-                start_balance_str = start_match.group(2)
-                # 直接解析纯数字字符串，不添加货币符号
-                summary["期初余额"] = parse_amount(start_balance_str)
-                # 解析开始日期
-                start_date = parse_date_airwallex(start_date_str)
-                if start_date:
-                    summary["统计期间"] = start_date
-            
-            # 提取期末余额: "Ending balance on {日期} {金额} {币种}"
-            # 格式: "Ending balance on Dec 31 2025 369.86 HKD"
-            end_match = re.search(
-                rf'Ending balance on\s+([A-Za-z]+\s+\d+\s+\d+)\s+([\d,]+\.\d+)\s+{currency}',
-                full_text,
-                re.IGNORECASE
-            )
-            if end_match:
-                end_date_str = end_match.group(1).strip()
-                end_balance_str = end_match.group(2)
-                # 直接解析纯数字字符串，不添加货币符号
-                summary["期末余额"] = parse_amount(end_balance_str)
-                # 解析结束日期
-                end_date = parse_date_airwallex(end_date_str)
-                if end_date and summary["统计期间"]:
-                    summary["统计期间"] = f"{summary['统计期间']} ~ {end_date}"
-            
-            # 提取总收入: "Total collections and other additions {金额} {币种}"
-            # 格式: "Total collections and other additions 633,081.56 HKD"
-            credit_match = re.search(
-                rf'Total collections and other additions\s+([\d,]+\.\d+)\s+{currency}',
-                full_text,
-                re.IGNORECASE
-            )
-            if credit_match:
-                # 直接解析纯数字字符串，不添加货币符号
-                summary["总收入(Credit)"] = parse_amount(credit_match.group(1))
-            
-            # 提取总支出: "Total payouts and other subtractions {金额} {币种}"
-            # 格式: "Total payouts and other subtractions 632,711.70 HKD"
-            debit_match = re.search(
-                rf'Total payouts and other subtractions\s+([\d,]+\.\d+)\s+{currency}',
-                full_text,
-                re.IGNORECASE
-            )
-            if debit_match:
-                # 直接解析纯数字字符串，不添加货币符号
-                summary["总支出(Debit)"] = parse_amount(debit_match.group(1))
+        full_text = doc.full_text()
+        
+        # 提取期初余额: "Starting balance on {日期} {金额} {币种}"
+        # 格式: "Starting balance on Jan 01 2024 0.00 HKD"
+        start_match = re.search(
+            rf'Starting balance on\s+([A-Za-z]+\s+\d+\s+\d+)\s+([\d,]+\.\d+)\s+{currency}',
+            full_text,
+            re.IGNORECASE
+        )
+        if start_match:
+            start_date_str = start_match.group(1).strip()
+            start_balance_str = start_match.group(2)
+            # 直接解析纯数字字符串，不添加货币符号
+            summary["期初余额"] = parse_amount(start_balance_str)
+            # 解析开始日期
+            start_date = parse_date_airwallex(start_date_str)
+            if start_date:
+                summary["统计期间"] = start_date
+        
+        # 提取期末余额: "Ending balance on {日期} {金额} {币种}"
+        # 格式: "Ending balance on Dec 31 2025 369.86 HKD"
+        end_match = re.search(
+            rf'Ending balance on\s+([A-Za-z]+\s+\d+\s+\d+)\s+([\d,]+\.\d+)\s+{currency}',
+            full_text,
+            re.IGNORECASE
+        )
+        if end_match:
+            end_date_str = end_match.group(1).strip()
+            end_balance_str = end_match.group(2)
+            # 直接解析纯数字字符串，不添加货币符号
+            summary["期末余额"] = parse_amount(end_balance_str)
+            # 解析结束日期
+            end_date = parse_date_airwallex(end_date_str)
+            if end_date and summary["统计期间"]:
+                summary["统计期间"] = f"{summary['统计期间']} ~ {end_date}"
+        
+        # 提取总收入: "Total collections and other additions {金额} {币种}"
+        # 格式: "Total collections and other additions 633,081.56 HKD"
+        credit_match = re.search(
+            rf'Total collections and other additions\s+([\d,]+\.\d+)\s+{currency}',
+            full_text,
+            re.IGNORECASE
+        )
+        if credit_match:
+            # 直接解析纯数字字符串，不添加货币符号
+            summary["总收入(Credit)"] = parse_amount(credit_match.group(1))
+        
+        # 提取总支出: "Total payouts and other subtractions {金额} {币种}"
+        # 格式: "Total payouts and other subtractions 632,711.70 HKD"
+        debit_match = re.search(
+            rf'Total payouts and other subtractions\s+([\d,]+\.\d+)\s+{currency}',
+            full_text,
+            re.IGNORECASE
+        )
+        if debit_match:
+            # 直接解析纯数字字符串，不添加货币符号
+            summary["总支出(Debit)"] = parse_amount(debit_match.group(1))
         
         return summary
 
@@ -1,41 +1,179 @@
 """
 解析器基类 - 所有银行对账单解析器的抽象基类
 """
+import os
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from concurrent.futures import Future
+from typing import List, Dict, Any, Iterator, Optional
 import pandas as pd
 
+from .document import PDFDocument, PDFSource, source_name
+from . import registry
+from .. import metrics
+from ..futures import completed_future
+
+# 导入配置文件
+try:
+    import config
+except ImportError:
+    config = None
+
 
 class BaseParser(ABC):
     """银行对账单解析器抽象基类"""
     
-    @abstractmethod
-    def parse(self, pdf_path: str) -> tuple[pd.DataFrame, Dict[str, Any]]:
+    # 解析逻辑版本号，子类覆盖；与文件 SHA-256 一起作为缓存键
+    PARSER_VERSION = "0"
+    
+    # 银行类型标识，子类覆盖；识别特征见 registry 中同名的注册项
+    BANK_NAME = "Unknown"
+    
+    # 逐页提取磁盘缓存（src.cache.PageCache），None 表示不使用
+    page_cache = None
+    
+    # AI 兜底响应磁盘缓存（src.cache.AIResponseCache），None 表示不使用；不调用 AI 的解析器忽略
+    ai_cache = None
+    
+    # 从 AI 答案学到的行模板库（src.ai.RuleBook），None 表示不使用；不调用 AI 的解析器忽略
+    ai_rules = None
+    
+    # 最近一次 iter_transactions 的汇总信息（调用时创建，迭代结束后原地补全）
+    stream_summary: Dict[str, Any] = None
+    
+    # 页面并行提取的进程数（0 表示 CPU 核数，1 表示不并行），None 表示取 config.PAGE_WORKERS
+    page_workers = None
+    
+    def _prefetch_pages(self, doc: PDFDocument):
+        """页数不少于 config.PAGE_PARALLEL_MIN_PAGES 时，先在进程池中并行提取所有页面（见 PDFDocument.prefetch）"""
+        min_pages = getattr(config, 'PAGE_PARALLEL_MIN_PAGES', 8) if config else 8
+        if doc.page_count < min_pages:
+            return
+        workers = self.page_workers
+        if workers is None:
+            workers = getattr(config, 'PAGE_WORKERS', 0) if config else 0
+        doc.prefetch(workers or os.cpu_count() or 1)
+    
+    @metrics.timed("parse")
+    def parse(self, pdf_path: PDFSource, name: Optional[str] = None) -> tuple[pd.DataFrame, Dict[str, Any]]:
         """
         解析PDF对账单文件
         
+        打开一个 PDFDocument 会话并交给 parse_document，
+        各阶段（识别、日期、交易、汇总）共享同一次打开和页面提取缓存；
+        设置了 page_cache 时，页面提取结果还会跨运行持久化
+        
         参数:
-            pdf_path: PDF文件路径
+            pdf_path: PDF文件路径，或内存中的 bytes / memoryview、二进制文件对象（不需要临时文件）
+            name: 可选的原始文件名（内存输入时用于汇总和从文件名提取信息）
             
         返回:
             (transactions_df, summary_dict)
             - transactions_df: 交易记录DataFrame，包含9列标准字段
             - summary_dict: 汇总信息字典
         """
-        pass
+        with PDFDocument(pdf_path, page_cache=self.page_cache, name=name) as doc:
+            return self.parse_document(doc)
+    
+    @metrics.timed("parse")
+    def parse_async(self, pdf_path: PDFSource, name: Optional[str] = None) -> Future:
+        """
+        解析PDF对账单文件，AI 兜底请求在后台进行
+        
+        页面解析在当前线程完成（返回时文件已关闭），只有等待 AI 结果的部分留在 Future 中，
+        调用方可以先开始解析下一个文件
+        
+        返回:
+            Future，结果同 parse
+        """
+        with PDFDocument(pdf_path, page_cache=self.page_cache, name=name) as doc:
+            return self.parse_document_async(doc)
+    
+    def iter_transactions(self, pdf_path: PDFSource, name: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        逐页解析PDF对账单，每处理完一页产出该页的交易记录
+        
+        下游（normalize_stream、export_to_excel 等）可以边解析边消费，
+        不必等最后一页解析完，内存占用与对账单长度无关
+        
+        产出:
+            交易记录批次 [{9列标准字段}, ...]；全部批次依次拼接与 parse 的结果一致
+            （HSBC 的 AI 兜底差异见 HSBCParser.iter_document_transactions）
+        
+        调用时即创建新的 self.stream_summary 字典，迭代结束时原地补全为汇总信息；
+        可以在迭代前就交给汇总写在交易之后的输出（如 export_to_excel）
+        """
+        self.stream_summary = {}
+        return self._iter_file_transactions(pdf_path, name)
+    
+    def _iter_file_transactions(self, pdf_path: PDFSource, name: Optional[str]) -> Iterator[List[Dict[str, Any]]]:
+        with PDFDocument(pdf_path, page_cache=self.page_cache, name=name) as doc:
+            yield from self.iter_document_transactions(doc)
+    
+    def iter_document_transactions(self, doc: PDFDocument) -> Iterator[List[Dict[str, Any]]]:
+        """
+        iter_transactions 的文档会话形式，汇总信息写入 self.stream_summary；
+        默认整体解析后一次产出，支持逐页解析的解析器覆盖此方法
+        """
+        df, summary = self.parse_document(doc)
+        self.stream_summary.update(summary)
+        if len(df):
+            yield df.to_dict("records")
+    
+    def parse_document_async(self, doc: PDFDocument) -> Future:
+        """
+        parse_document 的异步形式；默认同步解析并返回已完成的 Future，
+        使用 AI 兜底的解析器覆盖此方法
+        """
+        return completed_future(self.parse_document(doc))
     
     @abstractmethod
-    def identify_bank(self, pdf_path: str) -> str:
+    def parse_document(self, doc: PDFDocument) -> tuple[pd.DataFrame, Dict[str, Any]]:
         """
-        识别银行类型
+        基于已打开的文档会话解析对账单
         
         参数:
-            pdf_path: PDF文件路径
+            doc: PDF文档会话
             
         返回:
-            银行类型标识（如 "Airwallex", "HSBC"）
+            (transactions_df, summary_dict)，同 parse
         """
         pass
+    
+    def identify_bank(self, pdf_path: PDFSource, name: Optional[str] = None) -> str:
+        """
+        识别银行类型
+        
+        只判断是否为本解析器的银行：读取首页，由 registry.detect 在所有解析器中按首页文本和名称
+        （路径、文件对象的 name 或 name 参数）选出银行，选中的是本解析器才算识别成功，
+        因此改成其他银行名称的文件仍按内容识别；首页无法读取时才只按名称判断
+        
+        参数:
+            pdf_path: PDF文件路径、字节或二进制文件对象
+            name: 可选的原始文件名
+            
+        返回:
+            银行类型标识（如 "Airwallex", "HSBC"），无法识别时为 "Unknown"
+        """
+        try:
+            with PDFDocument(pdf_path, page_cache=self.page_cache, name=name) as doc:
+                spec = registry.detect(doc)
+        except Exception:
+            return self.identify_name(source_name(pdf_path, name))
+        return self.BANK_NAME if spec is not None and spec.bank == self.BANK_NAME else "Unknown"
+    
+    def identify_name(self, name: str) -> str:
+        """按文件名（路径）识别银行类型"""
+        spec = registry.get_spec(self.BANK_NAME)
+        if spec is not None and spec.fingerprint.matches_name(name):
+            return self.BANK_NAME
+        return "Unknown"
+    
+    def identify_content(self, doc: PDFDocument) -> str:
+        """按已打开文档的首页文本识别银行类型"""
+        spec = registry.get_spec(self.BANK_NAME)
+        if spec is not None and doc.page_count > 0 and spec.fingerprint.matches_text(doc.page_text(0)):
+            return self.BANK_NAME
+        return "Unknown"
 
 
 
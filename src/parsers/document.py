@@ -0,0 +1,453 @@
+"""
+PDF 文档会话 - 整个解析流程只打开一次文件，各阶段共享页面提取结果
+"""
+import io
+import os
+import json
+import mmap
+import hashlib
+import logging
+import multiprocessing
+import pdfplumber
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Callable, NamedTuple, Union, BinaryIO
+
+from ..utils import file_sha256, current_rss_mb
+from .. import metrics
+
+# 导入配置文件
+try:
+    import config
+except ImportError:
+    config = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# PDFDocument 接受的输入：文件路径、内存中的字节（bytes / bytearray / memoryview）或二进制文件对象
+PDFSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+# 没有名称的内存输入的显示名称
+MEMORY_SOURCE_NAME = "<memory>"
+
+
+def is_path_source(source: PDFSource) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def is_buffer_source(source: PDFSource) -> bool:
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def source_name(source: PDFSource, name: Optional[str] = None) -> str:
+    """
+    输入的显示名称（日志、汇总中的原始文件，以及从文件名提取日期/币种）
+
+    参数:
+        source: 文件路径、字节或文件对象
+        name: 显式指定的名称（如上传文件的原始文件名），优先使用
+    """
+    if name:
+        return str(name)
+    if is_path_source(source):
+        return os.fspath(source)
+    file_name = getattr(source, "name", None)
+    return file_name if isinstance(file_name, str) else MEMORY_SOURCE_NAME
+
+
+class _BufferReader(io.RawIOBase):
+    """内存缓冲区上的只读、可 seek 文件对象（直接读取 bytes / memoryview，不复制整个缓冲区）"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        size = max(0, min(len(b), len(self._view) - self._pos))
+        b[:size] = self._view[self._pos:self._pos + size]
+        self._pos += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+class ResourceLimitError(Exception):
+    """文件超出页数或内存上限（见 MemoryLimits），立即停止解析该文件"""
+    pass
+
+
+class MemoryLimits(NamedTuple):
+    """
+    单个文件的内存限制
+
+    字段:
+        bounded: 每页处理完后释放 pdfplumber 为该页缓存的版面对象（字符、线条、版面分析结果），
+                 峰值内存不随页数增长；提取出的文本和表格仍保留
+        max_pages: 页数上限，超过时打开文件后立即失败（0 表示不限制）
+        max_rss_mb: 进程常驻内存上限（MB），每提取一页后检查（0 表示不限制）
+    """
+    bounded: bool = False
+    max_pages: int = 0
+    max_rss_mb: float = 0
+
+    @classmethod
+    def from_config(cls) -> "MemoryLimits":
+        if config is None:
+            return cls()
+        return cls(
+            bounded=bool(getattr(config, 'BOUNDED_MEMORY', False)),
+            max_pages=int(getattr(config, 'MAX_PAGES_PER_FILE', 0) or 0),
+            max_rss_mb=float(getattr(config, 'MAX_RSS_MB', 0) or 0)
+        )
+
+
+_memory_limits = MemoryLimits.from_config()
+
+
+def get_memory_limits() -> MemoryLimits:
+    """未显式传入时 PDFDocument 使用的内存限制（默认取自 config）"""
+    return _memory_limits
+
+
+def set_memory_limits(limits: MemoryLimits):
+    """设置进程内默认的内存限制（也用于工作进程初始化）"""
+    global _memory_limits
+    _memory_limits = limits
+
+
+# 只依赖页面线条（ruling lines）的表格查找策略；其他策略（如 text）不能用线条数量预判
+LINE_BASED_STRATEGIES = ("lines", "lines_strict")
+
+
+def may_contain_table(page, table_settings: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    廉价的表格存在性预判（必要条件）
+
+    pdfplumber 默认按线条找表格：每个单元格至少需要 2 条竖线和 2 条横线相交。
+    页面的竖向/横向边（来自 lines、rects、curves）不足 2 条时，extract_tables()
+    必然返回空列表，可以直接跳过整个表格查找过程。
+
+    使用非线条策略或显式指定线条时无法预判，始终返回 True。
+    """
+    settings = table_settings or {}
+    if settings.get("vertical_strategy", "lines") not in LINE_BASED_STRATEGIES or \
+       settings.get("horizontal_strategy", "lines") not in LINE_BASED_STRATEGIES or \
+       settings.get("explicit_vertical_lines") or settings.get("explicit_horizontal_lines"):
+        return True
+
+    vertical = horizontal = 0
+    for edge in page.edges:
+        if edge.get("orientation") == "v":
+            vertical += 1
+        elif edge.get("orientation") == "h":
+            horizontal += 1
+        if vertical >= 2 and horizontal >= 2:
+            return True
+    return False
+
+
+class PDFDocument:
+    """
+    PDF 文档会话
+
+    由 BaseParser.parse 创建并传给识别、日期、交易、汇总各个阶段：
+    - 文件只打开一次（首次访问页面时才真正打开）
+    - 按页缓存 extract_text() / extract_tables() 的结果，重复调用直接返回缓存
+    - 没有足够线条构成表格的页面跳过 extract_tables()（见 may_contain_table）
+    - 传入 page_cache（PageCache）时，提取结果还会持久化到磁盘；
+      所有页面都已缓存时完全不需要打开 PDF
+    - limits（MemoryLimits）限制页数和进程内存；bounded 模式下解析器处理完一页后
+      调用 release_page 释放该页的版面对象
+    - prefetch(workers) 在进程池中按页段并行提取，结果同样进入上述缓存
+
+    - 输入可以是文件路径（以只读 mmap 打开，不复制文件内容）、bytes / bytearray / memoryview
+      或可 seek 的二进制文件对象（如上传文件），全程不需要临时文件；
+      调用方传入的文件对象不会被关闭
+
+    用法:
+        with PDFDocument(pdf_path) as doc:
+            text = doc.page_text(0)
+            tables = doc.page_tables(0)
+
+        with PDFDocument(uploaded_bytes, name="HSBC 2024 01.pdf") as doc:
+            ...
+    """
+
+    def __init__(self, source: PDFSource, page_cache=None,
+                 text_settings: Optional[Dict[str, Any]] = None,
+                 table_settings: Optional[Dict[str, Any]] = None,
+                 limits: Optional[MemoryLimits] = None,
+                 name: Optional[str] = None):
+        self.source = source
+        # 显示名称：路径输入即为路径，其他输入为 name / 文件对象的 name / "<memory>"
+        self.pdf_path = source_name(source, name)
+        self.page_cache = page_cache
+        self.limits = limits if limits is not None else get_memory_limits()
+        # extract_text(**text_settings) / extract_tables(table_settings) 的参数，也是磁盘缓存键的一部分
+        self.text_settings = text_settings or {}
+        self.table_settings = table_settings
+        self._pdf = None
+        self._stream = None
+        self._file = None
+        self._file_hash = None
+        self._page_count = None
+        self._text_cache: Dict[int, str] = {}
+        self._tables_cache: Dict[int, List] = {}
+
+    def __enter__(self) -> "PDFDocument":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def pdf(self):
+        """底层 pdfplumber 文档对象（惰性打开）"""
+        if self._pdf is None:
+            logger.debug(f"打开 PDF 文件: {self.pdf_path}")
+            with metrics.span("pdf.open"):
+                self._pdf = pdfplumber.open(self._open_stream())
+        return self._pdf
+
+    def _open_stream(self):
+        """
+        为 pdfplumber 准备可 seek 的输入流
+
+        路径以只读 mmap 打开（空文件等无法映射时直接读文件）；字节输入包装为 _BufferReader；
+        不能 seek 的文件对象先读入内存
+        """
+        source = self.source
+        if is_path_source(source):
+            self._file = open(source, "rb")
+            try:
+                self._stream = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                return self._file
+            return self._stream
+        if is_buffer_source(source):
+            self._stream = _BufferReader(source)
+            return self._stream
+        stream = self._file_source()
+        stream.seek(0)
+        return stream
+
+    def _file_source(self):
+        """文件对象输入：可 seek 的直接使用，否则一次性读入内存"""
+        source = self.source
+        if self._stream is None and not (hasattr(source, "seekable") and source.seekable()):
+            self._stream = io.BytesIO(source.read())
+        return self._stream if self._stream is not None else source
+
+    def _content(self) -> bytes:
+        """整个文件内容（非路径输入在传给工作进程时使用）"""
+        source = self.source
+        if is_buffer_source(source):
+            return bytes(source)
+        stream = self._file_source()
+        position = stream.tell()
+        stream.seek(0)
+        try:
+            return stream.read()
+        finally:
+            stream.seek(position)
+
+    @property
+    def file_hash(self) -> str:
+        """文件内容 SHA-256（惰性计算）"""
+        if self._file_hash is None:
+            if is_path_source(self.source):
+                self._file_hash = file_sha256(self.source)
+            elif is_buffer_source(self.source):
+                self._file_hash = hashlib.sha256(self.source).hexdigest()
+            else:
+                self._file_hash = hashlib.sha256(self._content()).hexdigest()
+        return self._file_hash
+
+    @property
+    def page_count(self) -> int:
+        """总页数"""
+        if self._page_count is None:
+            if self.page_cache is not None:
+                self._page_count = self.page_cache.get_page_count(self.file_hash)
+            if self._page_count is None:
+                self._page_count = len(self.pdf.pages)
+                if self.page_cache is not None:
+                    self.page_cache.put_page_count(self.file_hash, self._page_count)
+            max_pages = self.limits.max_pages
+            if max_pages and self._page_count > max_pages:
+                raise ResourceLimitError(f"文件共 {self._page_count} 页，超过上限 {max_pages} 页: {self.pdf_path}")
+        return self._page_count
+
+    def page(self, index: int):
+        """获取第 index 页（从0开始）的 pdfplumber 页面对象"""
+        return self.pdf.pages[index]
+
+    def _settings_key(self, kind: str, settings: Any) -> str:
+        """磁盘缓存键中的提取参数部分：类型 + pdfplumber 版本 + 参数"""
+        return f"{kind}:pdfplumber-{pdfplumber.__version__}:{json.dumps(settings, sort_keys=True, default=str)}"
+
+    def _settings_for(self, kind: str) -> Any:
+        return self.text_settings if kind == "text" else self.table_settings
+
+    def _memo_for(self, kind: str) -> Dict[int, Any]:
+        return self._text_cache if kind == "text" else self._tables_cache
+
+    def _lookup(self, index: int, kind: str) -> Any:
+        """查内存缓存和磁盘缓存（磁盘命中时放入内存缓存），都未命中返回 None"""
+        memo = self._memo_for(kind)
+        if index in memo:
+            return memo[index]
+        if self.page_cache is not None:
+            value = self.page_cache.get(self.file_hash, index, self._settings_key(kind, self._settings_for(kind)))
+            if value is not None:
+                memo[index] = value
+                return value
+        return None
+
+    def _store(self, index: int, kind: str, value: Any):
+        """保存新提取的结果到内存缓存和磁盘缓存"""
+        if self.page_cache is not None:
+            self.page_cache.put(self.file_hash, index, self._settings_key(kind, self._settings_for(kind)), value)
+        self._memo_for(kind)[index] = value
+
+    def _extract(self, index: int, kind: str, extractor: Callable[[Any], Any]):
+        """先查内存缓存，再查磁盘缓存，都未命中时才调用 pdfplumber"""
+        value = self._lookup(index, kind)
+        if value is None:
+            with metrics.span(f"pdf.{kind}"):
+                value = extractor(self.page(index))
+            self._store(index, kind, value)
+            self._check_rss(index)
+        return value
+
+    def page_text(self, index: int) -> str:
+        """第 index 页的 extract_text() 结果（已缓存，空页返回空字符串）"""
+        return self._extract(index, "text", lambda page: page.extract_text(**self.text_settings) or "")
+
+    def page_tables(self, index: int) -> List:
+        """第 index 页的 extract_tables() 结果（已缓存；页面线条不足以构成表格时直接返回空列表）"""
+        def extract(page):
+            if not may_contain_table(page, self.table_settings):
+                return []
+            return page.extract_tables(self.table_settings)
+
+        return self._extract(index, "tables", extract)
+
+    def release_page(self, index: int):
+        """
+        bounded 模式下释放第 index 页的版面对象（pdfplumber Page.close）；
+        已提取的文本和表格保留在内存缓存中，之后再访问该页的版面会重新分析
+        """
+        if self.limits.bounded and self._pdf is not None:
+            self._pdf.pages[index].close()
+
+    def _check_rss(self, index: int):
+        """提取一页后检查进程常驻内存，超过上限时抛出 ResourceLimitError"""
+        max_rss_mb = self.limits.max_rss_mb
+        if max_rss_mb:
+            rss = current_rss_mb()
+            if rss > max_rss_mb:
+                raise ResourceLimitError(
+                    f"提取第 {index + 1} 页后进程内存 {rss:.0f} MB，超过上限 {max_rss_mb:.0f} MB: {self.pdf_path}"
+                )
+
+    def prefetch(self, workers: int, kinds: tuple = ("text", "tables")):
+        """
+        在进程池中并行提取尚未缓存的页面
+
+        待提取的页面按连续页段平均分给各进程（每个进程只打开一次文件），结果按页码放入
+        内存缓存和磁盘缓存；之后的 page_text / page_tables 直接命中缓存，解析器仍按页序处理，
+        跨页的续行照常合并。workers <= 1、待提取页面少于 2 页、或当前已在工作进程中
+        （如批量转换的进程池，避免嵌套进程池）时不做任何事。
+
+        工作进程以 spawn 方式启动：调用方进程中可能已有运行中的线程（AI 兜底的事件循环、
+        HTTP 客户端），fork 会复制它们持有的锁，子进程可能死锁。
+
+        参数:
+            workers: 进程数
+            kinds: 要提取的内容（"text" / "tables"）
+        """
+        if workers <= 1 or multiprocessing.parent_process() is not None:
+            return
+        pages = [index for index in range(self.page_count)
+                 if any(self._lookup(index, kind) is None for kind in kinds)]
+        workers = min(workers, len(pages))
+        if workers <= 1:
+            return
+
+        size, extra = divmod(len(pages), workers)
+        chunks, start = [], 0
+        for i in range(workers):
+            end = start + size + (1 if i < extra else 0)
+            chunks.append(pages[start:end])
+            start = end
+
+        logger.debug(f"并行提取 {len(pages)} 页（{workers} 个进程）: {self.pdf_path}")
+        with metrics.span("pdf.prefetch"):
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                # 工作进程重新打开文件：路径直接传递，内存输入传递一份字节副本
+                source = self.source if is_path_source(self.source) else self._content()
+                futures = [
+                    executor.submit(_extract_pages, source, chunk, kinds,
+                                    self.text_settings, self.table_settings, self.limits)
+                    for chunk in chunks
+                ]
+                for future in futures:
+                    for index, values in future.result().items():
+                        for kind, value in values.items():
+                            self._store(index, kind, value)
+
+    def full_text(self, separator: str = "") -> str:
+        """所有页面文本拼接"""
+        return separator.join(self.page_text(i) for i in range(self.page_count))
+
+    def close(self):
+        """关闭底层文件、提交磁盘缓存并清空内存缓存"""
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.page_cache is not None:
+            self.page_cache.flush()
+        self._text_cache.clear()
+        self._tables_cache.clear()
+
+
+def _extract_pages(source: PDFSource, pages: List[int], kinds: tuple,
+                   text_settings: Dict[str, Any], table_settings: Optional[Dict[str, Any]],
+                   limits: MemoryLimits) -> Dict[int, Dict[str, Any]]:
+    """prefetch 的工作进程：提取一段连续页面，返回 {页码: {"text": ..., "tables": ...}}"""
+    results: Dict[int, Dict[str, Any]] = {}
+    with PDFDocument(source, text_settings=text_settings, table_settings=table_settings, limits=limits) as doc:
+        for index in pages:
+            results[index] = {
+                kind: doc.page_text(index) if kind == "text" else doc.page_tables(index)
+                for kind in kinds
+            }
+            doc.release_page(index)
+    return results
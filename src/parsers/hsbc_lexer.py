@@ -0,0 +1,142 @@
+"""
+HSBC 文本行词法分析器 - 一次遍历把每行文本分类为带金额的 Token，供交易状态机消费
+"""
+import re
+from typing import List, NamedTuple, Optional
+
+from ..utils import parse_amount
+
+
+# === Token 类型 ===
+CURRENCY_SWITCH = "CURRENCY_SWITCH"  # 账户标题行，如 "HKD Savings"，切换当前币种
+SKIP = "SKIP"                        # 页眉/表头等无用行
+OPENING_BALANCE = "OPENING_BALANCE"  # 不带日期的承前余额行，如 "Balance Brought Forward 12,345.67"
+DATE_START = "DATE_START"            # 以日期开头的行，开始一笔新交易
+NEW_TX_MARKER = "NEW_TX_MARKER"      # 同一天内的新交易标识，如 "POS MDC (" / "CR TO"
+BALANCE_ONLY = "BALANCE_ONLY"        # 行末带余额的短行（余额 > 1000 且行长 < 30）
+DETAIL = "DETAIL"                    # 其他行：上一笔交易的 Details
+
+
+# === 预编译正则 ===
+CURRENCY_PATTERN = re.compile(r'(HKD|USD|CNY|EUR|GBP|AUD)\s+(Savings|Current)', re.IGNORECASE)
+DATE_PATTERN = re.compile(r'^(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*)', re.IGNORECASE)
+# 交易类型标识（原先逐个 re.match 的 6 个模式合并为一个）
+TRANSACTION_MARKER_PATTERN = re.compile(
+    r'^(?:POS\s+MDC\s*\('      # POS MDC (日期)
+    r'|CR\s+TO\s+'             # CR TO
+    r'|CASH\s+REBATE'          # CASH REBATE
+    r'|B/F\s+BALANCE'          # B/F BALANCE
+    r'|CREDIT\s+INTEREST'      # CREDIT INTEREST
+    r'|PAID\s+BY)',            # PAID BY
+    re.IGNORECASE
+)
+# 承前余额：日期行中的 "B/F BALANCE"，或单独的 "Balance Brought Forward"
+OPENING_BALANCE_PATTERN = re.compile(r'B/F\s+BALANCE|BALANCE\s+BROUGHT\s+FORWARD', re.IGNORECASE)
+# 包含 Deposit 和 Balance 的行，格式：N10906097777(09JAN24) 2,000.00 220,760.08
+DEPOSIT_WITH_BALANCE_PATTERN = re.compile(r'[A-Z0-9]+\(\d{2}[A-Z]{3}\d{2}\)\s+[\d,]+\.[\d]{2}\s+[\d,]+\.[\d]{2}')
+# 行末金额（后面可能跟 CR/DR 标记）
+TRAILING_AMOUNT_PATTERN = re.compile(r'([\d,]+\.\d{2})[A-Z]*$')
+
+
+class LineToken(NamedTuple):
+    """
+    一行文本的分类结果
+
+    字段:
+        kind: Token 类型
+        text: 去除首尾空白后的原始行
+        currency: CURRENCY_SWITCH 的币种（大写）
+        date_str: DATE_START 的日期部分，如 "8 May"
+        details: DATE_START 中日期之后、去掉行末余额的部分；
+                 BALANCE_ONLY / NEW_TX_MARKER 中去掉行末余额后的剩余部分
+        balance: 行末余额（DATE_START / OPENING_BALANCE 为任意行末金额；其他类型仅在满足余额行条件时才有值）
+    """
+    kind: str
+    text: str
+    currency: Optional[str] = None
+    date_str: Optional[str] = None
+    details: str = ""
+    balance: Optional[float] = None
+
+
+def _is_skipped_header(line: str) -> bool:
+    """页眉、表头"""
+    return ("Page" in line and "of" in line) or \
+        "Date TransactionDetails" in line
+
+
+def is_opening_balance(details: str) -> bool:
+    """Details 是否为承前余额（如日期行 "8 May B/F BALANCE 12,345.67" 的 "B/F BALANCE"）"""
+    return bool(OPENING_BALANCE_PATTERN.match(details))
+
+
+def _trailing_balance(line: str):
+    """
+    非日期行的行末余额：数值 > 1000 且行长 < 30 才视为余额
+
+    返回:
+        (余额, 剩余部分)，不满足条件时返回 (None, "")
+    """
+    if len(line) >= 30:
+        return None, ""
+    balance_match = TRAILING_AMOUNT_PATTERN.search(line)
+    if balance_match:
+        potential_balance = parse_amount(balance_match.group(1))
+        if potential_balance and potential_balance > 1000:
+            return potential_balance, line[:balance_match.start()].strip()
+    return None, ""
+
+
+def tokenize_line(line: str) -> Optional[LineToken]:
+    """
+    对一行文本分类（判断顺序与状态机原有的逐条匹配顺序一致）
+
+    返回:
+        LineToken；空行返回 None
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    curr_match = CURRENCY_PATTERN.search(line)
+    if curr_match:
+        return LineToken(CURRENCY_SWITCH, line, currency=curr_match.group(1).upper())
+
+    if "Balance Brought Forward" in line:
+        # 不带日期的承前余额行不产生交易，只用来设定该币种的起始余额
+        balance_match = TRAILING_AMOUNT_PATTERN.search(line)
+        if balance_match:
+            return LineToken(OPENING_BALANCE, line, balance=parse_amount(balance_match.group(1)))
+        return LineToken(SKIP, line)
+
+    if _is_skipped_header(line):
+        return LineToken(SKIP, line)
+
+    date_match = DATE_PATTERN.match(line)
+    if date_match:
+        date_str = date_match.group(1)
+        rest = line[len(date_str):].strip()
+        balance = None
+        balance_match = TRAILING_AMOUNT_PATTERN.search(rest)
+        if balance_match:
+            balance = parse_amount(balance_match.group(1))
+            rest = rest[:balance_match.start()].strip()
+        return LineToken(DATE_START, line, date_str=date_str, details=rest, balance=balance)
+
+    # 交易标识行在没有进行中的交易时会退化为 Details，因此同样带上余额信息
+    balance, remaining = _trailing_balance(line)
+    if TRANSACTION_MARKER_PATTERN.match(line) or DEPOSIT_WITH_BALANCE_PATTERN.search(line):
+        return LineToken(NEW_TX_MARKER, line, details=remaining, balance=balance)
+    if balance is not None:
+        return LineToken(BALANCE_ONLY, line, details=remaining, balance=balance)
+    return LineToken(DETAIL, line)
+
+
+def tokenize(text: str) -> List[LineToken]:
+    """把一页文本切分为 Token 列表（跳过空行）"""
+    tokens = []
+    for line in text.split('\n'):
+        token = tokenize_line(line)
+        if token is not None:
+            tokens.append(token)
+    return tokens
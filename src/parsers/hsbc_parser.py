@@ -3,50 +3,75 @@ HSBC 对账单解析器
 """
 import re
 import logging
-import json
-import pdfplumber
 import pandas as pd
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator, NamedTuple
 from datetime import datetime
 from pathlib import Path
-
-try:
-    from openai import OpenAI
-except ImportError:
-    OpenAI = None
+from concurrent.futures import Future
 
 from .base_parser import BaseParser
+from .document import PDFDocument
+from . import hsbc_lexer
 # 确保 utils 中有这些函数
 from ..utils import parse_date_hsbc, parse_amount, parse_month
-
-# 导入配置文件
-try:
-    import config
-except ImportError:
-    config = None
+from .. import ai
+from .. import metrics
+from ..futures import chain_future
 
 
 class HSBCParser(BaseParser):
     """HSBC 对账单解析器"""
     
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
+    # 解析逻辑版本号：修改解析规则后递增，旧的缓存结果会自动失效
+    PARSER_VERSION = "1.2"
     
-    def identify_bank(self, pdf_path: str) -> str:
-        """识别银行类型"""
-        if "HSBC" in pdf_path.upper():
-            return "HSBC"
-        return "Unknown"
+    BANK_NAME = "HSBC"
     
-    def parse(self, pdf_path: str) -> tuple[pd.DataFrame, Dict[str, Any]]:
+    def __init__(self, page_cache=None, ai_resolver=None, ai_cache=None, ai_rules=None,
+                 page_workers: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        # 可选的逐页提取磁盘缓存（src.cache.PageCache）
+        self.page_cache = page_cache
+        # 页面并行提取的进程数（None 表示取 config.PAGE_WORKERS）
+        self.page_workers = page_workers
+        # AI 批量解析器（默认进程内共享的 ai.AsyncAIResolver），输入 [(交易详情, 日期), ...]
+        self.ai_resolver = ai_resolver
+        # 可选的 AI 响应磁盘缓存（src.cache.AIResponseCache），命中的行不再请求 AI
+        self.ai_cache = ai_cache
+        # 可选的行模板库（src.ai.RuleBook），匹配已学到模板的行不再请求 AI
+        self.ai_rules = ai_rules
+        # 最近一次解析的 AI 兜底统计（见 _extract_transactions / parse_document_async）
+        self.fallback_stats: Dict[str, Any] = {}
+        # 最近一次 iter_transactions 的汇总信息
+        self.stream_summary: Dict[str, Any] = {}
+        # 当前文件的 AI 兜底队列（每次 _extract_transactions 重建）
+        self._ai_queue = ai.AIFallbackQueue(resolver=ai_resolver, cache=ai_cache, rules=ai_rules)
+    
+    def parse_document(self, doc: PDFDocument) -> tuple[pd.DataFrame, Dict[str, Any]]:
         """解析 HSBC PDF 对账单"""
+        return self.parse_document_async(doc).result()
+    
+    def parse_document_async(self, doc: PDFDocument) -> Future:
+        """解析 HSBC PDF 对账单；AI 兜底请求提交后立即返回，回填完成后再生成结果"""
+        pdf_path = doc.pdf_path
         self.logger.info(f"开始解析 HSBC 文件: {pdf_path}")
         
-        statement_date = self._extract_statement_date(pdf_path)
+        statement_date = self._extract_statement_date(pdf_path, doc)
         
-        # 提取交易记录
-        transactions = self._extract_transactions(pdf_path, statement_date)
+        # 提取交易记录（需要 AI 兜底的行已按正则结果写入）
+        transactions = self._extract_transactions(doc, statement_date)
         
+        ai_queue = self._ai_queue
+        self.fallback_stats["交易笔数"] = len(transactions)
+        self.fallback_stats["AI兜底行数"] = len(ai_queue)
+        self.fallback_stats["兜底率"] = round(len(ai_queue) / len(transactions), 4) if transactions else 0.0
+        self.logger.info(f"AI 兜底统计: {self.fallback_stats}")
+        if ai_queue:
+            self.logger.info(f"AI 兜底: 共 {len(ai_queue)} 行待解析")
+        return chain_future(ai_queue.submit(transactions), lambda _: self._build_result(pdf_path, transactions))
+    
+    def _build_result(self, pdf_path: str, transactions: List[Dict[str, Any]]) -> tuple[pd.DataFrame, Dict[str, Any]]:
+        """AI 回填完成后生成交易表和汇总信息"""
         # 提取汇总信息
         summary = self._extract_summary(pdf_path, transactions, len(transactions))
         
@@ -55,8 +80,15 @@ class HSBCParser(BaseParser):
         
         return df, summary
     
-    def _extract_statement_date(self, pdf_path: str) -> datetime:
-        """提取账单日期"""
+    @metrics.timed("parse.statement_date")
+    def _extract_statement_date(self, pdf_path: str, doc: Optional[PDFDocument] = None) -> datetime:
+        """
+        提取账单日期
+        
+        参数:
+            pdf_path: PDF文件路径（优先从文件名提取）
+            doc: 已打开的文档会话；文件名中没有日期时复用它读取首页，未传入时临时打开
+        """
         filename = Path(pdf_path).stem
         match = re.search(r'(\d{4})\s+(\d{1,2})', filename)
         if match:
@@ -67,58 +99,148 @@ class HSBCParser(BaseParser):
             return datetime(int(match.group(1)), int(match.group(2)), 1)
         
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                if len(pdf.pages) > 0:
-                    first_page_text = pdf.pages[0].extract_text() or ""
-                    date_match = re.search(
-                        r'(\d{1,2})\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+(\d{4})',
-                        first_page_text, re.IGNORECASE
-                    )
-                    if date_match:
-                        day = int(date_match.group(1))
-                        month_str = date_match.group(2).lower()
-                        year = int(date_match.group(3))
-                        month_map = {
-                            'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
-                            'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
-                        }
-                        return datetime(year, month_map.get(month_str, 1), day)
+            if doc is None:
+                with PDFDocument(pdf_path, page_cache=self.page_cache) as own_doc:
+                    return self._extract_statement_date(pdf_path, own_doc)
+            if doc.page_count > 0:
+                first_page_text = doc.page_text(0)
+                date_match = re.search(
+                    r'(\d{1,2})\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+(\d{4})',
+                    first_page_text, re.IGNORECASE
+                )
+                if date_match:
+                    day = int(date_match.group(1))
+                    month_str = date_match.group(2).lower()
+                    year = int(date_match.group(3))
+                    month_map = {
+                        'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+                        'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+                    }
+                    return datetime(year, month_map.get(month_str, 1), day)
         except Exception as e:
             self.logger.warning(f"无法从PDF提取日期: {e}")
         
         return datetime.now()
     
-    def _extract_transactions(self, pdf_path: str, statement_date: datetime) -> List[Dict[str, Any]]:
-        """提取交易记录"""
+    @metrics.timed("parse.transactions")
+    def _extract_transactions(self, doc: PDFDocument, statement_date: datetime) -> List[Dict[str, Any]]:
+        """
+        提取交易记录（两阶段）
+        
+        第一阶段与解析状态无关：并行提取页面（_prefetch_pages）后，把每页扫描为 _PageRecord
+        （表格模式的表格和页眉币种，或文本模式的逐行 Token）；
+        第二阶段按页序重放币种/运行余额状态机生成交易记录，结果与逐页串行解析一致
+        """
         transactions = []
         # 状态机：记录当前处理的币种，默认为 Unknown
         current_currency = "Unknown"
         # 运行余额：用于计算每笔交易的Balance
         running_balance = {}  # {currency: balance}
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                page_text = page.extract_text() or ""
-                
-                # 策略 1: 尝试表格提取 (HSBC 只有少部分格式支持表格)
-                tables = page.extract_tables()
-                if tables and len(tables) > 0 and len(tables[0]) > 2:
-                    # 如果能提取到清晰的表格，使用表格逻辑
-                    # 即使是表格模式，也需要检查页眉的币种以初始化状态
-                    currency_match = re.search(r'(HKD|USD|CNY|EUR|GBP|AUD)\s+(Savings|Current)', page_text, re.IGNORECASE)
-                    if currency_match:
-                        current_currency = currency_match.group(1).upper()
-                    
-                    self._parse_tables(tables, current_currency, statement_date, transactions, running_balance)
-                
-                else:
-                    # 策略 2: 文本流解析 (HSBC 主力解析模式)
-                    # 重点：传入当前的 transactions 列表和 current_currency，并允许函数返回更新后的币种
-                    current_currency = self._extract_transactions_from_text(
-                        page_text, current_currency, statement_date, transactions, running_balance
-                    )
+        # 需要 AI 兜底的行先按正则结果保存，全部页面解析完后由 parse_document_async 分批请求 AI 并回填
+        self._ai_queue = ai.AIFallbackQueue(resolver=self.ai_resolver, cache=self.ai_cache, rules=self.ai_rules)
+        self.fallback_stats = {"承前余额": 0, "数学校验失败": 0, "无金额": 0}
+        
+        # 第一阶段：提取并扫描所有页面
+        self._prefetch_pages(doc)
+        records = []
+        for page_index in range(doc.page_count):
+            records.append(self._scan_page(doc, page_index))
+            doc.release_page(page_index)
+        
+        # 第二阶段：按页序重放状态机
+        for record in records:
+            current_currency = self._replay_page(record, current_currency, statement_date,
+                                                 transactions, running_balance)
         
         return transactions
+    
+    def _parse_page(self, doc: PDFDocument, page_index: int, current_currency: str, statement_date: datetime,
+                    transactions: List[Dict[str, Any]], running_balance: Dict[str, float]) -> str:
+        """
+        解析一页，交易追加到 transactions（需要 AI 兜底的行登记到 self._ai_queue）
+        
+        返回: 更新后的 current_currency
+        """
+        return self._replay_page(self._scan_page(doc, page_index), current_currency, statement_date,
+                                 transactions, running_balance)
+    
+    def _scan_page(self, doc: PDFDocument, page_index: int) -> "_PageRecord":
+        """第一阶段：把一页转换为与币种、运行余额无关的 _PageRecord"""
+        page_text = doc.page_text(page_index)
+        
+        # 策略 1: 尝试表格提取 (HSBC 只有少部分格式支持表格)
+        tables = doc.page_tables(page_index)
+        if tables and len(tables) > 0 and len(tables[0]) > 2:
+            # 如果能提取到清晰的表格，使用表格逻辑
+            # 即使是表格模式，也需要检查页眉的币种以初始化状态
+            currency_match = hsbc_lexer.CURRENCY_PATTERN.search(page_text)
+            return _PageRecord(tables=tables, currency=currency_match.group(1).upper() if currency_match else None)
+        
+        # 策略 2: 文本流解析 (HSBC 主力解析模式)，每行先分类为 Token
+        return _PageRecord(tokens=hsbc_lexer.tokenize(page_text))
+    
+    def _replay_page(self, record: "_PageRecord", current_currency: str, statement_date: datetime,
+                     transactions: List[Dict[str, Any]], running_balance: Dict[str, float]) -> str:
+        """
+        第二阶段：在当前币种和运行余额上重放一页的 _PageRecord，交易追加到 transactions
+        
+        返回: 更新后的 current_currency
+        """
+        if record.tables is not None:
+            if record.currency:
+                current_currency = record.currency
+            self._parse_tables(record.tables, current_currency, statement_date, transactions, running_balance)
+            return current_currency
+        
+        # 重点：传入当前的 transactions 列表和 current_currency，并允许函数返回更新后的币种
+        return self._extract_transactions_from_tokens(
+            record.tokens, current_currency, statement_date, transactions, running_balance
+        )
+    
+    def iter_document_transactions(self, doc: PDFDocument) -> Iterator[List[Dict[str, Any]]]:
+        """
+        逐页产出交易记录（币种和运行余额跨页延续）
+        
+        与 parse_document 的差异：每页的 AI 兜底行在产出该页之前同步请求并回填，
+        回填后的余额作为后续页面的运行余额（parse_document 中后续行的数学校验仍基于正则阶段的余额）。
+        每页的最后一笔交易留到下一页一起产出（表格模式的续行会追加到上一笔的描述）。
+        迭代结束后汇总信息写入 self.stream_summary。
+        """
+        pdf_path = doc.pdf_path
+        self.logger.info(f"开始逐页解析 HSBC 文件: {pdf_path}")
+        statement_date = self._extract_statement_date(pdf_path, doc)
+        self.fallback_stats = {"承前余额": 0, "数学校验失败": 0, "无金额": 0, "交易笔数": 0, "AI兜底行数": 0}
+        totals = _SummaryTotals()
+        
+        current_currency = "Unknown"
+        running_balance: Dict[str, float] = {}
+        carry: List[Dict[str, Any]] = []
+        for page_index in range(doc.page_count):
+            transactions = carry
+            self._ai_queue = ai.AIFallbackQueue(resolver=self.ai_resolver, cache=self.ai_cache, rules=self.ai_rules)
+            for currency, balance in running_balance.items():
+                self._ai_queue.seed_balance(0, currency, balance)
+            with metrics.span("parse.transactions"):
+                current_currency = self._parse_page(doc, page_index, current_currency, statement_date,
+                                                    transactions, running_balance)
+            doc.release_page(page_index)
+            if self._ai_queue:
+                self.fallback_stats["AI兜底行数"] += len(self._ai_queue)
+                if self._ai_queue.resolve(transactions):
+                    running_balance.update(self._ai_queue.closing_balances(transactions))
+            
+            ready, carry = transactions[:-1], transactions[-1:]
+            if ready:
+                totals.add(ready)
+                yield ready
+        if carry:
+            totals.add(carry)
+            yield carry
+        
+        self.fallback_stats["交易笔数"] = totals.count
+        self.fallback_stats["兜底率"] = round(self.fallback_stats["AI兜底行数"] / totals.count, 4) if totals.count else 0.0
+        self.stream_summary.update(self._summary_from_totals(pdf_path, totals))
+        self.logger.info(f"逐页解析完成: 提取到 {totals.count} 条交易记录，AI 兜底统计: {self.fallback_stats}")
 
     def _parse_tables(self, tables, currency, statement_date, transactions, running_balance: Dict[str, float]):
         """表格模式解析辅助函数"""
@@ -172,6 +294,7 @@ class HSBCParser(BaseParser):
                     credit_val = credit if credit else 0.0
                     debit_val = debit if debit else 0.0
                     final_balance = running_balance[currency] + credit_val - debit_val
+                    self._ai_queue.mark_computed_balance(len(transactions))
                 
                 # 更新运行余额
                 running_balance[currency] = final_balance
@@ -189,130 +312,80 @@ class HSBCParser(BaseParser):
                 }
                 transactions.append(tx)
 
-    def _extract_transactions_from_text(self, text: str, current_currency: str, 
+    def _extract_transactions_from_tokens(self, tokens: List[hsbc_lexer.LineToken], current_currency: str, 
                                        statement_date: datetime, 
                                        transactions: List[Dict[str, Any]],
                                        running_balance: Dict[str, float]) -> str:
         """
-        从文本解析交易，支持行级币种切换
+        从一页文本的 Token 解析交易，支持行级币种切换
         返回: 更新后的 current_currency
         
         关键修复：同一天可能有多个交易，每个交易以POS MDC、CR TO等标识开始
-        """
-        lines = text.split('\n')
         
+        每行已由 hsbc_lexer 分类为 Token（金额已提取，见 _scan_page），这里只负责状态机
+        """
         # 临时变量，用于构建多行交易
         curr_date_str = None
         curr_details = []
         curr_balance = None
         
-        # 交易类型标识模式（用于识别新交易）
-        transaction_patterns = [
-            r'^POS\s+MDC\s*\(',  # POS MDC (日期)
-            r'^CR\s+TO\s+',       # CR TO
-            r'^CASH\s+REBATE',   # CASH REBATE
-            r'^B/F\s+BALANCE',   # B/F BALANCE
-            r'^CREDIT\s+INTEREST',  # CREDIT INTEREST
-            r'^PAID\s+BY',        # PAID BY
-        ]
-        
-        # 识别包含Deposit和Balance的行（通常是新交易）
-        # 格式：N10906097777(09JAN24) 2,000.00 220,760.08
-        def is_deposit_with_balance(line: str) -> bool:
-            """检查是否是包含Deposit金额和Balance的行"""
-            # 匹配：字母数字(日期) 金额 余额
-            pattern = r'[A-Z0-9]+\(\d{2}[A-Z]{3}\d{2}\)\s+[\d,]+\.[\d]{2}\s+[\d,]+\.[\d]{2}'
-            return bool(re.search(pattern, line))
-        
-        for line in lines:
-            line = line.strip()
-            if not line: continue
+        for token in tokens:
+            kind = token.kind
             
             # [Fix 1] 逐行检测币种切换
-            curr_match = re.search(r'(HKD|USD|CNY|EUR|GBP|AUD)\s+(Savings|Current)', line, re.IGNORECASE)
-            if curr_match:
-                current_currency = curr_match.group(1).upper()
+            if kind == hsbc_lexer.CURRENCY_SWITCH:
+                current_currency = token.currency
                 self.logger.info(f"检测到账户切换: {current_currency}")
                 continue # 标题行跳过
             
             # 跳过无用页眉
-            if "Page" in line and "of" in line: continue
-            if "Balance Brought Forward" in line: continue
-            if "Date TransactionDetails" in line: continue  # 表头行
-
-            # [Fix] 匹配日期行 (交易开始)
-            date_match = re.match(r'^(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*)', line, re.IGNORECASE)
+            if kind == hsbc_lexer.SKIP:
+                continue
             
-            if date_match:
+            # 不带日期的承前余额行：保存进行中的交易后，以该余额作为当前币种的起始余额
+            if kind == hsbc_lexer.OPENING_BALANCE:
+                if curr_date_str and curr_details:
+                    self._save_text_transaction(curr_date_str, curr_details, curr_balance, current_currency, statement_date, transactions, running_balance)
+                curr_date_str, curr_details, curr_balance = None, [], None
+                self._seed_opening_balance(current_currency, token.balance, transactions, running_balance)
+                continue
+            
+            # [Fix] 匹配日期行 (交易开始)
+            if kind == hsbc_lexer.DATE_START:
                 # 遇到新日期，先保存上一条交易（如果存在）
                 if curr_date_str and curr_details:
                     self._save_text_transaction(curr_date_str, curr_details, curr_balance, current_currency, statement_date, transactions, running_balance)
                 
-                # 初始化新交易
-                curr_date_str = date_match.group(1)
-                
-                # 截取日期后的部分作为 Details
-                rest = line[len(curr_date_str):].strip()
+                # B/F BALANCE 行仍作为一条记录保存（汇总的期初余额取自首条记录），同时设定起始余额
+                if token.balance is not None and hsbc_lexer.is_opening_balance(token.details):
+                    self._seed_opening_balance(current_currency, token.balance, transactions, running_balance)
                 
-                # [Fix 2] 提取行末余额，并从 Details 中剔除，防止被误判为金额
-                # 匹配行末的数字 (例如 123,456.78)，后面可能跟 CR/DR 标记
-                balance_match = re.search(r'([\d,]+\.\d{2})[A-Z]*$', rest)
-                
-                if balance_match:
-                    curr_balance = parse_amount(balance_match.group(1))
-                    # 关键修复：从 rest 中移除余额部分
-                    rest = rest[:balance_match.start()].strip()
+                # 初始化新交易
+                curr_date_str = token.date_str
+                # [Fix 2] 行末余额已在分词时从 Details 中剔除，防止被误判为金额
+                curr_balance = token.balance
+                curr_details = [token.details] if token.details else []
+                continue
+            
+            # 不是日期行，检查是否是新的交易标识（同一天内的第二个交易）
+            if kind == hsbc_lexer.NEW_TX_MARKER and curr_date_str and curr_details:
+                # 这是同一天内的新交易，先保存上一条交易
+                self._save_text_transaction(curr_date_str, curr_details, curr_balance, current_currency, statement_date, transactions, running_balance)
+                # 开始新交易（使用相同的日期）
+                curr_details = [token.text]
+                curr_balance = None
+                continue
+            
+            # 不是新交易，属于上一条交易的 Details
+            if curr_date_str:
+                if token.balance is not None:
+                    # 行末是较大的数字且行比较短，视为余额行，剩余部分加入Details
+                    curr_balance = token.balance
+                    if token.details:
+                        curr_details.append(token.details)
                 else:
-                    curr_balance = None # 这一行没有余额，可能在后续行
-                
-                curr_details = [rest] if rest else []
-                
-            else:
-                # 不是日期行，检查是否是新的交易标识（同一天内的第二个交易）
-                if curr_date_str and curr_details:
-                    # 检查这一行是否是新的交易类型标识
-                    is_new_transaction = False
-                    for pattern in transaction_patterns:
-                        if re.match(pattern, line, re.IGNORECASE):
-                            is_new_transaction = True
-                            break
-                    
-                    # 检查是否是包含Deposit和Balance的行（通常是新交易）
-                    if not is_new_transaction:
-                        # 匹配：字母数字(日期) 金额 余额
-                        deposit_balance_pattern = r'[A-Z0-9]+\(\d{2}[A-Z]{3}\d{2}\)\s+[\d,]+\.[\d]{2}\s+[\d,]+\.[\d]{2}'
-                        if re.search(deposit_balance_pattern, line):
-                            is_new_transaction = True
-                    
-                    if is_new_transaction:
-                        # 这是同一天内的新交易，先保存上一条交易
-                        self._save_text_transaction(curr_date_str, curr_details, curr_balance, current_currency, statement_date, transactions, running_balance)
-                        # 开始新交易（使用相同的日期）
-                        curr_details = [line]
-                        curr_balance = None
-                        continue
-                
-                # 不是新交易，属于上一条交易的 Details
-                if curr_date_str:
-                    # 检查这一行是否包含Balance
-                    # Balance通常出现在行末，且是较大的数字
-                    balance_match = re.search(r'([\d,]+\.\d{2})[A-Z]*$', line)
-                    if balance_match:
-                        potential_balance = parse_amount(balance_match.group(1))
-                        # 如果这个数字很大（>1000），且行比较短，可能是Balance
-                        if potential_balance and potential_balance > 1000 and len(line) < 30:
-                            # 可能是余额行
-                            curr_balance = potential_balance
-                            # 从line中移除余额部分，剩余部分加入Details
-                            remaining = line[:balance_match.start()].strip()
-                            if remaining:
-                                curr_details.append(remaining)
-                        else:
-                            # 是 Details 的一部分
-                            curr_details.append(line)
-                    else:
-                        # 是 Details 的一部分
-                        curr_details.append(line)
+                    # 是 Details 的一部分
+                    curr_details.append(token.text)
         
         # 循环结束，保存最后一条交易
         if curr_date_str and curr_details:
@@ -320,6 +393,18 @@ class HSBCParser(BaseParser):
              
         return current_currency
 
+    def _seed_opening_balance(self, currency: str, balance: float, transactions: List[Dict[str, Any]],
+                              running_balance: Dict[str, float]):
+        """
+        以承前余额设定币种的运行余额
+        
+        每个币种区段的第一笔交易据此做数学校验，而不是从 0 开始；
+        同一位置也登记到 AI 兜底队列，回填后重放推算余额时使用相同的起点
+        """
+        running_balance[currency] = balance
+        self._ai_queue.seed_balance(len(transactions), currency, balance)
+        self.fallback_stats["承前余额"] += 1
+    
     def _validate_math(self, prev_balance: float, credit: float, debit: float, new_balance: float) -> bool:
         """
         Level 2: 数学校验
@@ -336,108 +421,24 @@ class HSBCParser(BaseParser):
         
         return diff < 0.01
     
+    @metrics.timed("ai.line")
     def _parse_line_with_ai(self, line_text: str, date_str: str) -> Optional[Dict[str, Any]]:
         """
-        Level 3: AI 兜底解析
-        使用 DeepSeek API 解析单行交易文本
+        Level 3: AI 兜底解析（单行同步请求）
+        使用 DeepSeek API 解析单行交易文本；解析流程中改为经 AIFallbackQueue 分批请求
         
         返回: {"debit": float, "credit": float, "balance": float, "payee": str} 或 None
         """
-        # 检查配置和依赖
-        if not config or not hasattr(config, 'DEEPSEEK_API_KEY') or not config.DEEPSEEK_API_KEY:
-            self.logger.warning("DeepSeek API Key 未配置，跳过 AI 解析")
-            return None
-        
-        if not OpenAI:
-            self.logger.warning("openai 库未安装，无法使用 AI 解析")
-            return None
-        
-        try:
-            client = OpenAI(
-                api_key=config.DEEPSEEK_API_KEY,
-                base_url=getattr(config, 'DEEPSEEK_BASE_URL', 'https://api.deepseek.com')
-            )
-            
-            model = getattr(config, 'DEEPSEEK_MODEL', 'deepseek-chat')
-            
-            # 构造 Prompt
-            prompt = f"""你是一个银行对账单解析专家。请从以下一行银行交易文本中提取结构化信息。
-
-输入文本（可能格式错乱）：
-日期: {date_str}
-交易详情: {line_text}
-
-请提取以下信息：
-1. Debit (支出金额): 如果有支出，返回数值（不含逗号，保留2位小数）；如果没有，返回空字符串或0
-2. Credit (收入金额): 如果有收入，返回数值（不含逗号，保留2位小数）；如果没有，返回空字符串或0
-3. Balance (余额): 通常在文本末尾的大数字，返回数值（不含逗号，保留2位小数）
-4. Payee (收款方/付款方): 提取交易对手方名称，如果无法识别返回"Unknown"
-
-金融常识提示：
-- Balance 通常出现在行末
-- Debit 通常用于 Withdrawal/POS/转账支出等场景
-- Credit 通常用于 Deposit/转账收入/Interest 等场景
-- 同一行通常只有 Debit 或 Credit 其中之一，不会同时存在
-
-请返回 JSON 格式，示例：
-{{
-    "debit": "1234.56",
-    "credit": "",
-    "balance": "98765.43",
-    "payee": "MERCHANT NAME"
-}}
-
-或：
-{{
-    "debit": "",
-    "credit": "5000.00",
-    "balance": "103765.43",
-    "payee": "PAYER NAME"
-}}
-
-只返回 JSON，不要其他文字说明。"""
-            
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的银行对账单解析助手。只返回有效的 JSON 格式数据，不要包含任何其他文字。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=500
-            )
-            
-            result_text = response.choices[0].message.content.strip()
-            
-            # 清理可能的 markdown 代码块标记
-            if result_text.startswith("```json"):
-                result_text = result_text[7:]
-            elif result_text.startswith("```"):
-                result_text = result_text[3:]
-            if result_text.endswith("```"):
-                result_text = result_text[:-3]
-            result_text = result_text.strip()
-            
-            # 解析 JSON
-            result = json.loads(result_text)
-            
-            # 转换数据类型
-            parsed_result = {
-                "debit": parse_amount(str(result.get("debit", ""))) if result.get("debit") else '',
-                "credit": parse_amount(str(result.get("credit", ""))) if result.get("credit") else '',
-                "balance": parse_amount(str(result.get("balance", ""))) if result.get("balance") else None,
-                "payee": result.get("payee", "Unknown")
-            }
-            
-            self.logger.info(f"AI 解析成功: {parsed_result}")
-            return parsed_result
-            
-        except json.JSONDecodeError as e:
-            self.logger.warning(f"AI 返回的 JSON 解析失败: {e}, 原始响应: {result_text[:200]}")
-            return None
-        except Exception as e:
-            self.logger.warning(f"AI 解析失败: {e}, 将使用降级处理")
-            return None
+        model = ai.model_name()
+        if self.ai_cache:
+            cached = self.ai_cache.get(line_text, date_str, model)
+            if cached is not None:
+                return cached
+        result = ai.parse_line(line_text, date_str)
+        if result is not None and self.ai_cache:
+            self.ai_cache.put(line_text, date_str, model, result)
+            self.ai_cache.flush()
+        return result
     
     def _save_text_transaction(self, date_str, details_list, balance, currency, statement_date, transactions, running_balance: Dict[str, float]):
         """构建并保存文本交易（三级解析机制：正则 -> 数学校验 -> AI 兜底）"""
@@ -510,41 +511,14 @@ class HSBCParser(BaseParser):
             if not self._validate_math(current_balance, credit_val, debit_val, extracted_balance):
                 self.logger.warning(f"数学校验失败: prev={current_balance}, credit={credit_val}, debit={debit_val}, new={extracted_balance}, 行: {full_details[:100]}")
                 need_ai_fallback = True
+                self.fallback_stats["数学校验失败"] += 1
         # 如果 Level 1 没有提取到数据，但该行明显是交易行（包含数字），也需要 AI 兜底
         elif not amounts and not extracted_balance:
             # 检查是否是明显的交易行（包含常见交易关键词或数字模式）
             if re.search(r'\d{1,2}\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)', full_details, re.IGNORECASE) or \
                re.search(r'(POS|CR|DEPOSIT|WITHDRAWAL|TRANSFER)', full_details, re.IGNORECASE):
                 need_ai_fallback = True
-        
-        # ========== Level 3: AI 兜底 ==========
-        ai_payee = None  # 保存 AI 解析的 Payee
-        if need_ai_fallback:
-            self.logger.info(f"触发 AI 兜底解析: {full_details[:100]}")
-            ai_result = self._parse_line_with_ai(full_details, date_str)
-            if ai_result:
-                # 使用 AI 解析的结果
-                ai_debit = ai_result.get("debit", '')
-                ai_credit = ai_result.get("credit", '')
-                ai_balance = ai_result.get("balance")
-                ai_payee = ai_result.get("payee")  # 保存 AI 解析的 Payee
-                
-                # 如果 AI 返回了有效数据，使用 AI 的结果
-                if ai_balance is not None or ai_debit or ai_credit:
-                    debit = ai_debit
-                    credit = ai_credit
-                    if ai_balance is not None:
-                        final_balance = ai_balance
-                    else:
-                        # AI 没有返回余额，基于运行余额计算
-                        credit_val = credit if credit else 0.0
-                        debit_val = debit if debit else 0.0
-                        final_balance = current_balance + credit_val - debit_val
-                    
-                    self.logger.info(f"使用 AI 解析结果: debit={debit}, credit={credit}, balance={final_balance}")
-            else:
-                # AI 解析失败，使用降级处理（保留原始文本）
-                self.logger.warning(f"AI 解析失败，使用降级处理: {full_details[:100]}")
+                self.fallback_stats["无金额"] += 1
         
         # 更新运行余额
         running_balance[currency] = final_balance
@@ -553,9 +527,9 @@ class HSBCParser(BaseParser):
         date = parse_date_hsbc(date_str, statement_date.year, statement_date.month)
         if not date: return
 
-        # 提取 Payee（如果 AI 解析了 Payee，优先使用）
+        # 提取 Payee（AI 兜底解析出的 Payee 在回填时覆盖）
         details_info = self._parse_transaction_details(full_details)
-        payee = ai_payee if ai_payee and ai_payee != "Unknown" else details_info.get('payee', 'Unknown')
+        payee = details_info.get('payee', 'Unknown')
 
         tx = {
             'Date': date,
@@ -569,6 +543,15 @@ class HSBCParser(BaseParser):
             'Description': details_info.get('description', full_details)
         }
         transactions.append(tx)
+        
+        # ========== Level 3: AI 兜底（延后批量解析） ==========
+        # 先按正则结果保存；行文本登记到队列，全部页面解析完后分批请求 AI 并回填（见 parse_document_async）
+        index = len(transactions) - 1
+        if extracted_balance is None:
+            self._ai_queue.mark_computed_balance(index)
+        if need_ai_fallback:
+            self.logger.info(f"触发 AI 兜底解析: {full_details[:100]}")
+            self._ai_queue.add(index, full_details, date_str)
     
     def _parse_transaction_details(self, details: str) -> Dict[str, str]:
         """解析 Transaction Details 字段"""
@@ -604,42 +587,79 @@ class HSBCParser(BaseParser):
     def _extract_payee_from_details(self, details: str) -> Optional[str]:
         return None # 辅助函数，暂不使用
     
+    @metrics.timed("parse.summary")
     def _extract_summary(self, pdf_path: str, transactions: List[Dict[str, Any]], transaction_count: int) -> Dict[str, Any]:
         """提取汇总信息"""
-        currencies = set()
-        for tx in transactions:
-            currency = tx.get('Account Currency', 'Unknown')
-            if currency != 'Unknown':
-                currencies.add(currency)
-        
+        totals = _SummaryTotals()
+        totals.add(transactions)
+        totals.count = transaction_count
+        return self._summary_from_totals(pdf_path, totals)
+    
+    def _summary_from_totals(self, pdf_path: str, totals: "_SummaryTotals") -> Dict[str, Any]:
+        """由累计量生成汇总信息（逐页解析时各页累加后调用）"""
         opening_balance = None
         closing_balance = None
+        period = ""
         
-        if transactions:
-            first_balance = transactions[0].get('Balance')
+        if totals.first is not None:
+            first_balance = totals.first.get('Balance')
             if first_balance: opening_balance = first_balance
             
-            last_balance = transactions[-1].get('Balance')
+            last_balance = totals.last.get('Balance')
             if last_balance: closing_balance = last_balance
-        
-        total_credit = sum(tx.get('Credit', 0) or 0 for tx in transactions)
-        total_debit = sum(tx.get('Debit', 0) or 0 for tx in transactions)
-        
-        period = ""
-        if transactions:
-            start_date = transactions[0].get('Date', '')
-            end_date = transactions[-1].get('Date', '')
+            
+            start_date = totals.first.get('Date', '')
+            end_date = totals.last.get('Date', '')
             if start_date and end_date:
                 period = f"{start_date} ~ {end_date}"
         
         return {
             "原始文件": pdf_path,
             "银行": "HSBC",
-            "账户币种": ', '.join(sorted(currencies)) if currencies else "Unknown",
+            "账户币种": ', '.join(sorted(totals.currencies)) if totals.currencies else "Unknown",
             "统计期间": period,
             "期初余额": opening_balance,
             "期末余额": closing_balance,
-            "总收入(Credit)": total_credit if total_credit > 0 else None,
-            "总支出(Debit)": total_debit if total_debit > 0 else None,
-            "交易笔数": transaction_count
+            "总收入(Credit)": totals.total_credit if totals.total_credit > 0 else None,
+            "总支出(Debit)": totals.total_debit if totals.total_debit > 0 else None,
+            "交易笔数": totals.count
         }
+
+
+class _SummaryTotals:
+    """汇总信息需要的累计量：币种、首末交易、收支合计、笔数"""
+    
+    def __init__(self):
+        self.currencies = set()
+        self.first: Optional[Dict[str, Any]] = None
+        self.last: Optional[Dict[str, Any]] = None
+        self.total_credit = 0
+        self.total_debit = 0
+        self.count = 0
+    
+    def add(self, transactions: List[Dict[str, Any]]):
+        for tx in transactions:
+            currency = tx.get('Account Currency', 'Unknown')
+            if currency != 'Unknown':
+                self.currencies.add(currency)
+            self.total_credit += tx.get('Credit', 0) or 0
+            self.total_debit += tx.get('Debit', 0) or 0
+        if transactions:
+            if self.first is None:
+                self.first = transactions[0]
+            self.last = transactions[-1]
+        self.count += len(transactions)
+
+
+class _PageRecord(NamedTuple):
+    """
+    一页的第一阶段扫描结果（与币种、运行余额无关）
+
+    字段:
+        tables: 表格模式的表格（None 表示文本模式）
+        currency: 表格模式下页眉中的币种（None 表示沿用当前币种）
+        tokens: 文本模式的逐行 Token（hsbc_lexer.tokenize）
+    """
+    tables: Optional[List] = None
+    currency: Optional[str] = None
+    tokens: Optional[List[hsbc_lexer.LineToken]] = None
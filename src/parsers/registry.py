@@ -0,0 +1,162 @@
+"""
+解析器注册表 - 按首页的廉价特征识别银行，只在选中后才导入对应的解析器模块
+
+每个解析器注册一个 Fingerprint：
+- name_pattern      文件名（路径）正则，不需要打开文件
+- text_pattern      首页文本正则（文本同时留在文档会话中，解析时直接复用）
+- producer_pattern  PDF 元数据 Producer 正则
+
+识别（detect）只读取首页一次：文件名和首页文本是主要依据，至少命中一项才会选中；
+只有二者不能唯一确定时才读取元数据加权。
+
+用法:
+    with PDFDocument(source) as doc:
+        spec = registry.detect(doc)
+        if spec is not None:
+            parser = spec.create()
+            df, summary = parser.parse_document(doc)
+"""
+import re
+import importlib
+from typing import Dict, List, Optional, NamedTuple, Pattern
+
+from .document import PDFDocument
+
+
+# 各特征的权重：首页文本 > 文件名 > 元数据（只用于区分前两者无法确定的情况）
+TEXT_WEIGHT = 4
+NAME_WEIGHT = 2
+PRODUCER_WEIGHT = 1
+
+
+class Fingerprint(NamedTuple):
+    """解析器的识别特征（都只依赖文件名或首页），未设置的特征不参与评分"""
+    name_pattern: Optional[Pattern] = None
+    text_pattern: Optional[Pattern] = None
+    producer_pattern: Optional[Pattern] = None
+
+    def matches_name(self, name: str) -> bool:
+        return self.name_pattern is not None and bool(self.name_pattern.search(name))
+
+    def matches_text(self, text: str) -> bool:
+        return self.text_pattern is not None and bool(self.text_pattern.search(text))
+
+    def matches_producer(self, producer: str) -> bool:
+        return self.producer_pattern is not None and bool(self.producer_pattern.search(producer))
+
+
+class ParserSpec(NamedTuple):
+    """
+    注册项
+
+    字段:
+        bank: 银行类型标识（与解析器的 BANK_NAME 一致）
+        target: "模块:类名"，模块相对于 src.parsers（如 ".hsbc_parser:HSBCParser"）
+        fingerprint: 识别特征
+    """
+    bank: str
+    target: str
+    fingerprint: Fingerprint
+
+    def load(self) -> type:
+        """导入并返回解析器类（首次调用时才导入模块）"""
+        module_name, class_name = self.target.split(":")
+        return getattr(importlib.import_module(module_name, __package__), class_name)
+
+    def create(self, **kwargs):
+        """创建解析器实例"""
+        return self.load()(**kwargs)
+
+
+_registry: Dict[str, ParserSpec] = {}
+
+
+def register(bank: str, target: str, fingerprint: Fingerprint) -> ParserSpec:
+    """
+    注册解析器（同名银行覆盖之前的注册项）
+
+    参数:
+        bank: 银行类型标识
+        target: "模块:类名"，相对模块名以 src.parsers 为包
+        fingerprint: 识别特征
+
+    返回:
+        注册项
+    """
+    spec = ParserSpec(bank, target, fingerprint)
+    _registry[bank] = spec
+    return spec
+
+
+def registered() -> List[ParserSpec]:
+    """按注册顺序返回所有注册项"""
+    return list(_registry.values())
+
+
+def get_spec(bank: str) -> Optional[ParserSpec]:
+    return _registry.get(bank)
+
+
+def detect_name(name: str) -> Optional[ParserSpec]:
+    """只按文件名识别（不打开文件）；没有或有多个解析器匹配时返回 None"""
+    matches = [spec for spec in _registry.values() if spec.fingerprint.matches_name(name)]
+    return matches[0] if len(matches) == 1 else None
+
+
+def detect(doc: PDFDocument) -> Optional[ParserSpec]:
+    """
+    按文件名和首页识别银行
+
+    先按文件名和首页文本评分（首页文本来自文档会话的页面缓存，解析时复用）；
+    得分最高的候选不唯一时，再读取 Producer 元数据加权。
+
+    参数:
+        doc: 文档会话（识别后可直接交给选中的解析器，不需要重新打开文件）
+
+    返回:
+        注册项；文件名和首页文本都不匹配任何解析器时返回 None
+    """
+    if not _registry:
+        return None
+    first_page_text = doc.page_text(0) if doc.page_count > 0 else ""
+    scores = {}
+    for spec in _registry.values():
+        fingerprint = spec.fingerprint
+        score = 0
+        if fingerprint.matches_text(first_page_text):
+            score += TEXT_WEIGHT
+        if fingerprint.matches_name(doc.pdf_path):
+            score += NAME_WEIGHT
+        if score:
+            scores[spec.bank] = score
+    if not scores:
+        return None
+
+    best = max(scores.values())
+    candidates = [bank for bank, score in scores.items() if score == best]
+    if len(candidates) > 1 and doc.page_count > 0:
+        producer = str((doc.pdf.metadata or {}).get("Producer", ""))
+        for bank in candidates:
+            if _registry[bank].fingerprint.matches_producer(producer):
+                scores[bank] += PRODUCER_WEIGHT
+        candidates.sort(key=lambda bank: -scores[bank])
+    return _registry[candidates[0]]
+
+
+# === 内置解析器（按注册顺序作为同分时的优先级）===
+
+register("Airwallex", ".airwallex_parser:AirwallexParser", Fingerprint(
+    # 文件名格式: {序号}-{公司名}-ASR_{币种}_{开始日期}_{结束日期}.pdf
+    name_pattern=re.compile(r'ASR_|airwallex', re.IGNORECASE),
+    # 首页页眉: "Web: airwallex.com"
+    text_pattern=re.compile(r'airwallex\.com', re.IGNORECASE),
+    # 两家对账单都是 A4，页面尺寸无法区分，只用生成工具区分
+    producer_pattern=re.compile(r'^OpenPDF\b'),
+))
+
+register("HSBC", ".hsbc_parser:HSBCParser", Fingerprint(
+    name_pattern=re.compile(r'HSBC', re.IGNORECASE),
+    # 首页抬头: "HSBC Sprint Account Statement"，页脚: "The Hongkong and Shanghai Banking Corporation Limited"
+    text_pattern=re.compile(r'Hongkong and Shanghai Banking|HSBC\b.*Account Statement', re.IGNORECASE),
+    producer_pattern=re.compile(r'^OpenText Output Transformation Engine'),
+))
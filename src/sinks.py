@@ -0,0 +1,271 @@
+"""
+输出格式模块 - 与 Excel 并列的输出目标，供下游分析任务直接加载
+- xlsx: export_to_excel（带样式，供人工查看）
+- parquet: 列式压缩存储
+- feather: Arrow IPC 文件（不压缩，可内存映射零拷贝读取）
+- csv: 逐块流式写入
+
+列式格式使用真正的数据类型：日期为 timestamp，金额为 float（或整数分），
+币种为字典编码（分类）。汇总信息放在 schema 元数据中（CSV 写入同名 .summary.json）。
+"""
+import json
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Any, List, Iterable, Iterator, Optional, Tuple, Union
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+    pq = None
+    ipc = None
+
+from .normalizer import STANDARD_COLUMNS
+from .exporter import export_to_excel, AMOUNT_COLUMNS
+from .cache import SUMMARY_METADATA_KEY
+from .utils import parse_dates_vectorized
+
+
+logger = logging.getLogger(__name__)
+
+
+# schema 元数据中记录金额单位的键
+AMOUNT_UNIT_METADATA_KEY = b"bank_converter.amount_unit"
+
+# 金额单位：float 为原始金额，cents 为整数分（避免浮点误差）
+AMOUNT_UNITS = ("float", "cents")
+
+# 文本列
+TEXT_COLUMNS = ['Payer', 'Payee', 'Reference', 'Description']
+
+
+def _iter_chunks(data: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> Iterator[pd.DataFrame]:
+    """DataFrame 视为单个分块；分块迭代器原样产出"""
+    if isinstance(data, pd.DataFrame):
+        yield data
+    else:
+        yield from data
+
+
+def to_typed_frame(df: pd.DataFrame, amount_unit: str = "float",
+                   currency_categories: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    把标准化后的交易记录（日期为字符串、金额为float）转换为分析用的数据类型
+
+    参数:
+        df: 标准化后的交易记录（9列标准字段）
+        amount_unit: "float" 保持金额为 float64；"cents" 转换为整数分（Int64，空值为 <NA>）
+        currency_categories: 币种分类列表。分块写入时在各块间共享并原地追加新币种，
+                             保证每块的分类都是前一块的扩展（Arrow IPC 文件只支持字典增量）
+
+    返回:
+        按 STANDARD_COLUMNS 排列的 DataFrame：Date 为 datetime64，币种为 category，文本为 string
+    """
+    if amount_unit not in AMOUNT_UNITS:
+        raise ValueError(f"不支持的金额单位: {amount_unit}，可选: {', '.join(AMOUNT_UNITS)}")
+
+    typed = pd.DataFrame(index=df.index)
+
+    if pd.api.types.is_datetime64_any_dtype(df['Date']):
+        typed['Date'] = df['Date']
+    else:
+        typed['Date'] = parse_dates_vectorized(df['Date'])
+
+    if currency_categories is None:
+        currency_categories = []
+    currency = df['Account Currency'].astype("string")
+    for value in currency.dropna().unique():
+        if value not in currency_categories:
+            currency_categories.append(value)
+    typed['Account Currency'] = pd.Categorical(currency, categories=currency_categories)
+
+    for column in STANDARD_COLUMNS:
+        if column in AMOUNT_COLUMNS:
+            amounts = pd.to_numeric(df[column], errors='coerce').astype(float)
+            if amount_unit == "cents":
+                amounts = (amounts * 100).round().astype("Int64")
+            typed[column] = amounts
+        elif column in TEXT_COLUMNS:
+            typed[column] = df[column].astype("string")
+
+    return typed[STANDARD_COLUMNS]
+
+
+def arrow_schema(summary: Dict[str, Any], amount_unit: str = "float"):
+    """列式输出的 Arrow schema（固定类型，空表或分块写入时各块一致）"""
+    amount_type = pa.int64() if amount_unit == "cents" else pa.float64()
+    fields = []
+    for column in STANDARD_COLUMNS:
+        if column == 'Date':
+            fields.append(pa.field(column, pa.timestamp("ms")))
+        elif column == 'Account Currency':
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        elif column in AMOUNT_COLUMNS:
+            fields.append(pa.field(column, amount_type))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    metadata = {
+        SUMMARY_METADATA_KEY: json.dumps(summary, ensure_ascii=False, default=str).encode('utf-8'),
+        AMOUNT_UNIT_METADATA_KEY: amount_unit.encode('utf-8')
+    }
+    return pa.schema(fields, metadata=metadata)
+
+
+class OutputSink(ABC):
+    """
+    输出格式抽象基类
+
+    子类实现 write：接受完整 DataFrame 或分块 DataFrame 迭代器，写入 output_path
+    """
+
+    name = ""
+    suffix = ""
+    # 汇总信息是否在交易之后才写出（True 时可以边解析边写，汇总在流结束时补全）
+    summary_after_rows = False
+
+    def __init__(self, amount_unit: str = "float"):
+        if amount_unit not in AMOUNT_UNITS:
+            raise ValueError(f"不支持的金额单位: {amount_unit}，可选: {', '.join(AMOUNT_UNITS)}")
+        self.amount_unit = amount_unit
+
+    @abstractmethod
+    def write(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]], summary: Dict[str, Any],
+              output_path: str) -> str:
+        """
+        写出交易记录和汇总信息
+
+        返回:
+            输出文件路径
+        """
+        pass
+
+
+class ExcelSink(OutputSink):
+    """带样式的 Excel 工作簿（金额单位不适用，始终为原始金额）"""
+
+    name = "xlsx"
+    suffix = ".xlsx"
+    summary_after_rows = True
+
+    def write(self, data, summary, output_path):
+        return export_to_excel(data, summary, output_path)
+
+
+class ArrowSink(OutputSink):
+    """列式输出基类：逐块转换为 Arrow 表后交给 _open_writer 返回的写入器"""
+
+    @abstractmethod
+    def _open_writer(self, output_path: str, schema):
+        """打开 output_path 的 Arrow 写入器（上下文管理器，提供 write_table）"""
+        pass
+
+    def write(self, data, summary, output_path):
+        if pa is None:
+            raise ImportError(f"输出 {self.name} 格式需要安装 pyarrow")
+
+        logger.info(f"开始导出{self.name}文件: {output_path}")
+        schema = arrow_schema(summary, self.amount_unit)
+        currency_categories: List[str] = []
+        rows = 0
+        with self._open_writer(output_path, schema) as writer:
+            for chunk in _iter_chunks(data):
+                typed = to_typed_frame(chunk, self.amount_unit, currency_categories)
+                writer.write_table(pa.Table.from_pandas(typed, schema=schema, preserve_index=False))
+                rows += len(typed)
+        logger.info(f"✅ {self.name}文件导出成功: {output_path}（{rows} 条）")
+        return output_path
+
+
+class ParquetSink(ArrowSink):
+    """Parquet 文件（zstd 压缩）"""
+
+    name = "parquet"
+    suffix = ".parquet"
+
+    def _open_writer(self, output_path, schema):
+        return pq.ParquetWriter(output_path, schema, compression='zstd')
+
+
+class FeatherSink(ArrowSink):
+    """Arrow IPC 文件（Feather V2，不压缩，可用 pa.memory_map 零拷贝读取）"""
+
+    name = "feather"
+    suffix = ".arrow"
+
+    def _open_writer(self, output_path, schema):
+        # 各块的币种字典是前一块的扩展，以字典增量方式写入
+        return ipc.new_file(output_path, schema, options=ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+
+class CsvSink(OutputSink):
+    """UTF-8 CSV（逐块追加写入），汇总信息写入同名 .summary.json"""
+
+    name = "csv"
+    suffix = ".csv"
+    summary_after_rows = True
+
+    def write(self, data, summary, output_path):
+        logger.info(f"开始导出CSV文件: {output_path}")
+        currency_categories: List[str] = []
+        header = True
+        with open(output_path, "w", encoding="utf-8", newline="") as f:
+            for chunk in _iter_chunks(data):
+                typed = to_typed_frame(chunk, self.amount_unit, currency_categories)
+                typed.to_csv(f, index=False, header=header, date_format="%Y-%m-%d")
+                header = False
+            if header:
+                # 没有任何分块时仍写出表头
+                f.write(",".join(STANDARD_COLUMNS) + "\n")
+
+        summary_path = Path(output_path).with_suffix(".summary.json")
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump({**summary, "金额单位": self.amount_unit}, f, ensure_ascii=False, indent=2, default=str)
+        logger.info(f"✅ CSV文件导出成功: {output_path}")
+        return output_path
+
+
+# 可用输出格式
+SINKS = {
+    sink_cls.name: sink_cls
+    for sink_cls in (ExcelSink, ParquetSink, FeatherSink, CsvSink)
+}
+
+
+def get_sink(name: str, amount_unit: str = "float") -> OutputSink:
+    """
+    按格式名创建输出目标
+
+    参数:
+        name: xlsx / parquet / feather / csv
+        amount_unit: 列式和CSV输出的金额单位（float 或 cents）
+    """
+    if name not in SINKS:
+        raise ValueError(f"不支持的输出格式: {name}，可选: {', '.join(SINKS)}")
+    return SINKS[name](amount_unit=amount_unit)
+
+
+def read_output(path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    读取 Parquet / Arrow IPC 输出（Arrow IPC 通过内存映射读取）
+
+    返回:
+        (df, summary)，df 的数据类型同 to_typed_frame
+    """
+    if pa is None:
+        raise ImportError("读取 Parquet/Arrow 文件需要安装 pyarrow")
+
+    # 整数分金额含空值时保持为可空整数（默认会转换为 float）
+    types_mapper = {pa.int64(): pd.Int64Dtype()}.get
+    if Path(path).suffix == ParquetSink.suffix:
+        table = pq.read_table(path)
+        df = table.to_pandas(types_mapper=types_mapper)
+    else:
+        with pa.memory_map(str(path)) as source:
+            table = ipc.open_file(source).read_all()
+            df = table.to_pandas(types_mapper=types_mapper)
+    summary = json.loads(table.schema.metadata[SUMMARY_METADATA_KEY].decode('utf-8'))
+    return df, summary
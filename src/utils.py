@@ -1,10 +1,54 @@
 """
 工具函数模块 - 日期解析、金额解析等通用函数
 """
+import os
 import re
+import sys
+import hashlib
 from datetime import datetime
+from functools import lru_cache
 from dateutil import parser as date_parser
-from typing import Optional
+from typing import Optional, Iterable
+import pandas as pd
+
+
+# 月份名查找表（与 dateutil 识别的英文月份名一致，不区分大小写）
+MONTH_LOOKUP = {
+    name.lower(): month
+    for month, names in enumerate(date_parser.parserinfo.MONTHS, 1)
+    for name in names
+}
+
+# 快速路径的日期格式："Jun 23 2024"（Airwallex）、"8 May"（HSBC）
+_MONTH_DAY_YEAR_PATTERN = re.compile(r'^([A-Za-z]+)\s+(\d{1,2})\s+(\d{4})$')
+_DAY_MONTH_PATTERN = re.compile(r'^(\d{1,2})\s+([A-Za-z]+)$')
+
+# 对账单中反复出现的日期字符串只有几百种，解析结果全部缓存
+_DATE_CACHE_SIZE = 8192
+
+
+def _fast_month_day(date_str: str):
+    """
+    查表解析 "Jun 23 2024" / "8 May" 两种格式
+
+    返回:
+        (year或None, month, day)；格式不符或月份名无法识别时返回 None（由调用方回退到 dateutil）
+    """
+    match = _MONTH_DAY_YEAR_PATTERN.match(date_str)
+    if match:
+        month = MONTH_LOOKUP.get(match.group(1).lower())
+        if month:
+            return int(match.group(3)), month, int(match.group(2))
+        return None
+    
+    match = _DAY_MONTH_PATTERN.match(date_str)
+    if match:
+        month = MONTH_LOOKUP.get(match.group(2).lower())
+        day = int(match.group(1))
+        # dateutil 会把 "32 Jan" 中大于31的数字当作年份，这类输入交给 dateutil 处理
+        if month and day <= 31:
+            return None, month, day
+    return None
 
 
 def parse_date_airwallex(date_str: str) -> Optional[str]:
@@ -20,11 +64,22 @@ def parse_date_airwallex(date_str: str) -> Optional[str]:
     if not date_str or not date_str.strip():
         return None
     
+    return _parse_date_airwallex_cached(date_str.strip())
+
+
+@lru_cache(maxsize=_DATE_CACHE_SIZE)
+def _parse_date_airwallex_cached(date_str: str) -> Optional[str]:
+    """parse_date_airwallex 的缓存实现：先查表，其他格式回退到 dateutil"""
     try:
+        fast = _fast_month_day(date_str)
+        if fast and fast[0] is not None:
+            year, month, day = fast
+            return datetime(year, month, day).strftime("%Y-%m-%d")
+        
         # 使用dateutil解析，支持多种日期格式
-        dt = date_parser.parse(date_str.strip())
+        dt = date_parser.parse(date_str)
         return dt.strftime("%Y-%m-%d")
-    except (ValueError, TypeError):
+    except (ValueError, TypeError, OverflowError):
         return None
 
 
@@ -46,9 +101,19 @@ def parse_date_hsbc(date_str: str, statement_year: int, statement_month: int) ->
     if not date_str or not date_str.strip():
         return None
     
+    return _parse_date_hsbc_cached(date_str.strip(), statement_year, statement_month)
+
+
+@lru_cache(maxsize=_DATE_CACHE_SIZE)
+def _parse_date_hsbc_cached(date_str: str, statement_year: int, statement_month: int) -> Optional[str]:
+    """parse_date_hsbc 的缓存实现：先查表，其他格式回退到 dateutil"""
     try:
-        # 解析日期（不包含年份）
-        dt = date_parser.parse(date_str.strip(), default=datetime(statement_year, 1, 1))
+        # 解析日期（不包含年份）；先按账单年份构造，与 dateutil 的 default 行为一致（如非闰年的 29 Feb 视为无效）
+        fast = _fast_month_day(date_str)
+        if fast:
+            dt = datetime(fast[0] or statement_year, fast[1], fast[2])
+        else:
+            dt = date_parser.parse(date_str, default=datetime(statement_year, 1, 1))
         
         # 跨年判断：如果交易月份比账单月份大很多，说明是上一年的
         tx_month = dt.month
@@ -61,7 +126,7 @@ def parse_date_hsbc(date_str: str, statement_year: int, statement_month: int) ->
         # 重新构建日期
         result_dt = datetime(year, tx_month, dt.day)
         return result_dt.strftime("%Y-%m-%d")
-    except (ValueError, TypeError):
+    except (ValueError, TypeError, OverflowError):
         return None
 
 
@@ -111,11 +176,93 @@ def parse_month(date_str: str) -> Optional[int]:
     if not date_str or not date_str.strip():
         return None
     
+    return _parse_month_cached(date_str.strip())
+
+
+@lru_cache(maxsize=_DATE_CACHE_SIZE)
+def _parse_month_cached(date_str: str) -> Optional[int]:
+    """parse_month 的缓存实现：先查表，其他格式回退到 dateutil"""
     try:
-        dt = date_parser.parse(date_str.strip(), default=datetime(2024, 1, 1))
+        fast = _fast_month_day(date_str)
+        if fast:
+            return datetime(fast[0] or 2024, fast[1], fast[2]).month
+        
+        dt = date_parser.parse(date_str, default=datetime(2024, 1, 1))
         return dt.month
-    except (ValueError, TypeError):
+    except (ValueError, TypeError, OverflowError):
         return None
 
 
+def parse_dates_vectorized(series: pd.Series,
+                           formats: Iterable[str] = ("%Y-%m-%d", "%b %d %Y")) -> pd.Series:
+    """
+    整列转换日期字符串为 datetime64
+    
+    参数:
+        series: 日期字符串列，如 "2024-06-23" 或 "Jun 23 2024"
+        formats: 依次尝试的固定格式（由 pandas 向量化解析）
+        
+    返回:
+        datetime64 类型的 Series，无法解析的值为 NaT
+        
+    逻辑:
+        - 先用固定格式整列解析（C 实现，无逐行 Python 调用）
+        - 剩余未解析的值按唯一值走 parse_date_airwallex（查表 + 缓存 + dateutil 兜底）
+    """
+    text = series.astype("string").str.strip()
+    result = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    
+    for fmt in formats:
+        missing = result.isna() & text.notna() & (text != "")
+        if not missing.any():
+            break
+        result[missing] = pd.to_datetime(text[missing], format=fmt, errors="coerce")
+    
+    missing = result.isna() & text.notna() & (text != "")
+    if missing.any():
+        leftovers = text[missing]
+        mapping = {value: parse_date_airwallex(value) for value in leftovers.unique()}
+        result[missing] = pd.to_datetime(leftovers.map(mapping), format="%Y-%m-%d", errors="coerce")
+    
+    return result
+
 
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    计算文件内容的 SHA-256（分块读取，不把整个文件载入内存）
+    
+    参数:
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
+        
+    返回:
+        64位十六进制摘要字符串
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+
+def current_rss_mb() -> float:
+    """
+    当前进程的常驻内存（MB）
+    
+    Linux 读取 /proc/self/statm；其他 Unix 没有当前值，退而使用进程内存峰值（ru_maxrss）；
+    Windows 无法获取，返回 0
+    """
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 的 ru_maxrss 单位为字节，Linux 为 KB
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
@@ -0,0 +1,180 @@
+"""
+测试异步 AI 兜底 - 并发上限、令牌桶限速、超时、重试与熔断（请求发往本地模拟服务，不访问网络）
+"""
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from openai import AsyncOpenAI
+
+from src import metrics
+from src.ai import AsyncAIResolver, AIFallbackQueue, CircuitBreaker
+from benchmarks.mock_openai_server import MockChatServer
+
+
+def _resolver(server: MockChatServer, **kwargs) -> AsyncAIResolver:
+    options = dict(max_concurrency=4, rate_per_second=1000, burst=1000, timeout=5, max_retries=0, retry_base_delay=0.01,
+                   breaker=CircuitBreaker(threshold=0))
+    options.update(kwargs)
+    return AsyncAIResolver(
+        client_factory=lambda: AsyncOpenAI(api_key="test", base_url=server.base_url, max_retries=0),
+        **options
+    )
+
+
+def _items(batch: int, count: int = 3):
+    return [(f"SHOP{batch}X{i} POS {i + 1}.50", "1 Jan") for i in range(count)]
+
+
+def test_concurrency_limit():
+    """同时进行的请求不超过 max_concurrency，结果按编号对应回各批"""
+    with MockChatServer(latency=0.2) as server:
+        resolver = _resolver(server, max_concurrency=3)
+        try:
+            futures = [resolver.submit(_items(batch)) for batch in range(9)]
+            results = [future.result(timeout=10) for future in futures]
+        finally:
+            resolver.close()
+
+    assert server.requests == 9
+    assert 2 <= server.max_in_flight <= 3
+    assert results[4][2] == {"debit": 3.5, "credit": '', "balance": None, "payee": "SHOP4X2"}
+    print(f"  ✅ 最大并发 {server.max_in_flight}")
+
+
+def test_token_bucket_paces_requests():
+    """令牌桶容量用尽后按 rate 匀速放行"""
+    with MockChatServer() as server:
+        resolver = _resolver(server, rate_per_second=20, burst=2)
+        start = time.perf_counter()
+        try:
+            futures = [resolver.submit(_items(batch, 1)) for batch in range(6)]
+            for future in futures:
+                future.result(timeout=10)
+            span = time.perf_counter() - start
+        finally:
+            resolver.close()
+
+    # 前 2 个立即放行，其余 4 个间隔 1/20 秒
+    assert server.requests == 6
+    assert span >= 4 / 20 * 0.9
+    print(f"  ✅ 6 个请求用时 {span:.2f}s")
+
+
+def test_retry_on_server_errors():
+    """500/429 按退避重试，重试次数用尽前都能得到结果"""
+    with MockChatServer(error_rate=0.3, rate_limit_rate=0.2, seed=7) as server:
+        resolver = _resolver(server, max_retries=8)
+        try:
+            results = [resolver.submit(_items(batch)).result(timeout=20) for batch in range(6)]
+        finally:
+            resolver.close()
+
+    assert server.errors > 0
+    assert resolver.stats["retries"] == server.errors
+    assert resolver.stats["failures"] == 0
+    assert all(r is not None for batch in results for r in batch)
+    print(f"  ✅ {server.errors} 次错误均已重试成功")
+
+
+def test_timeout_falls_back():
+    """请求超时并用尽重试后整批为 None（保留正则结果），不会等满服务端延迟"""
+    with MockChatServer(latency=2.0) as server:
+        resolver = _resolver(server, timeout=0.2, max_retries=1)
+        start = time.perf_counter()
+        try:
+            results = resolver.submit(_items(0)).result(timeout=10)
+        finally:
+            resolver.close()
+        elapsed = time.perf_counter() - start
+
+    assert results == [None, None, None]
+    assert resolver.stats == {"batches": 1, "requests": 2, "retries": 1, "failures": 1, "short_circuited": 0}
+    assert elapsed < 1.5
+    print(f"  ✅ 超时后降级，用时 {elapsed:.2f}s")
+
+
+def test_circuit_breaker_stops_requests():
+    """连续失败达到阈值后熔断：不再重试，后续批次不发出请求"""
+    with MockChatServer(error_rate=1.0) as server:
+        resolver = _resolver(server, max_concurrency=1, max_retries=10, breaker=CircuitBreaker(threshold=3))
+        start = time.perf_counter()
+        try:
+            first = resolver.submit(_items(0)).result(timeout=10)
+            later = [resolver.submit(_items(batch)).result(timeout=10) for batch in range(1, 5)]
+        finally:
+            resolver.close()
+        elapsed = time.perf_counter() - start
+
+    assert server.requests == 3
+    assert first == [None] * 3 and all(batch == [None] * 3 for batch in later)
+    assert resolver.breaker.is_open and resolver.stats["short_circuited"] == 4
+    print(f"  ✅ {server.requests} 次失败后熔断，用时 {elapsed:.2f}s")
+
+
+def test_request_time_recorded_per_file():
+    """后台线程中的 ai.request 计入提交时所在文件的指标"""
+    metrics.enable(True)
+    metrics.reset()
+    try:
+        with MockChatServer(latency=0.05) as server:
+            resolver = _resolver(server)
+            try:
+                file_metrics = metrics.FileMetrics()
+                with metrics.collect(file_metrics):
+                    future = resolver.submit(_items(0))
+                resolver.submit(_items(1)).result(timeout=10)
+                future.result(timeout=10)
+            finally:
+                resolver.close()
+        assert file_metrics.spans["ai.request"]["count"] == 1
+        assert metrics.totals()["ai.request"]["count"] == 2
+    finally:
+        metrics.enable(False)
+        metrics.reset()
+    print("  ✅ AI 请求耗时计入文件指标")
+
+
+def test_queue_submit_does_not_block():
+    """队列提交后立即返回，结果到达后在后台回填交易记录"""
+    transactions = [{'Account Currency': 'HKD', 'Debit': '', 'Credit': '', 'Balance': 100.0, 'Payee': 'Unknown'}]
+    with MockChatServer(latency=0.3) as server:
+        resolver = _resolver(server)
+        try:
+            queue = AIFallbackQueue(resolver=resolver)
+            queue.add(0, "CAFE POS 12.00", "1 Jan")
+            queue.mark_computed_balance(0)
+            future = queue.submit(transactions)
+            assert not future.done()
+            assert transactions[0]['Payee'] == 'Unknown'
+            assert future.result(timeout=10) == 1
+        finally:
+            resolver.close()
+
+    assert transactions[0]['Debit'] == 12.0 and transactions[0]['Payee'] == 'CAFE'
+    assert transactions[0]['Balance'] == -12.0
+    print("  ✅ 提交不阻塞，结果在后台回填")
+
+
+def main():
+    """主测试函数"""
+    print("=" * 60)
+    print("异步 AI 兜底测试")
+    print("=" * 60)
+    test_concurrency_limit()
+    test_token_bucket_paces_requests()
+    test_retry_on_server_errors()
+    test_timeout_falls_back()
+    test_circuit_breaker_stops_requests()
+    test_request_time_recorded_per_file()
+    test_queue_submit_does_not_block()
+    print("\n🎉 所有测试通过！")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+测试 AI 兜底批量解析 - 编号批量请求、结果回填与余额重放、行模板学习（不访问网络）
+"""
+import sys
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.ai import AIFallbackQueue, RuleBook, parse_lines_batch, get_circuit_breaker
+from src.parsers import HSBCParser
+
+
+class FakeClient:
+    """模拟 OpenAI 兼容客户端：返回固定文本并记录请求"""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.requests.append(kwargs)
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _tx(currency, debit, credit, balance):
+    return {'Account Currency': currency, 'Debit': debit, 'Credit': credit, 'Balance': balance, 'Payee': 'Unknown'}
+
+
+def test_batch_response_mapped_by_id():
+    """按 id 对应回输入（乱序、代码块包裹）；缺失的记录为 None；无效 JSON 整批为 None"""
+    content = "```json\n" + json.dumps([
+        {"id": 3, "debit": "", "credit": "1,000.00", "balance": "5000.00", "payee": "ACME"},
+        {"id": 1, "debit": "20.50", "credit": "", "balance": "", "payee": "Unknown"}
+    ]) + "\n```"
+    client = FakeClient(content)
+    items = [("POS MDC A 20.50", "1 Jan"), ("CR TO B", "2 Jan"), ("PAID BY ACME 1,000.00", "3 Jan")]
+    results = parse_lines_batch(items, client=client)
+
+    assert len(client.requests) == 1
+    prompt = client.requests[0]["messages"][1]["content"]
+    assert "1. 日期: 1 Jan | 交易详情: POS MDC A 20.50" in prompt and "3. 日期: 3 Jan" in prompt
+    assert results[0] == {"debit": 20.5, "credit": '', "balance": None, "payee": "Unknown"}
+    assert results[1] is None
+    assert results[2] == {"debit": '', "credit": 1000.0, "balance": 5000.0, "payee": "ACME"}
+
+    assert parse_lines_batch(items, client=FakeClient("not json")) == [None, None, None]
+    print("  ✅ 批量响应按编号回填")
+
+
+def test_queue_patches_and_replays_balances():
+    """AI 结果回填后，其后推算出来的余额按币种重放；印出的余额不变"""
+    transactions = [
+        _tx('HKD', '', '', 100.0),       # 0: 印出余额
+        _tx('HKD', '', '', 100.0),       # 1: 正则未提取到金额，待 AI
+        _tx('USD', 5.0, '', -5.0),       # 2: 其他币种，推算余额
+        _tx('HKD', 10.0, '', 90.0),      # 3: 推算余额 -> 应变为 60
+        _tx('HKD', '', 40.0, 500.0),     # 4: 印出余额，保持不变
+        _tx('HKD', 1.0, '', 499.0),      # 5: 推算余额
+    ]
+    batches = []
+
+    def resolver(items):
+        batches.append(items)
+        return [{"debit": 30.0, "credit": '', "balance": None, "payee": "SHOP"}]
+
+    queue = AIFallbackQueue(resolver=resolver)
+    for index in (1, 2, 3, 5):
+        queue.mark_computed_balance(index)
+    queue.add(1, "POS MDC SHOP", "1 Jan")
+
+    assert queue.resolve(transactions) == 1
+    assert batches == [[("POS MDC SHOP", "1 Jan")]]
+    assert transactions[1]['Debit'] == 30.0 and transactions[1]['Payee'] == 'SHOP'
+    assert [tx['Balance'] for tx in transactions] == [100.0, 70.0, -5.0, 60.0, 500.0, 499.0]
+    assert len(queue) == 0
+    print("  ✅ 回填结果并重放推算余额")
+
+
+def test_replay_starts_from_opening_balance():
+    """重放推算余额时，承前余额处按登记的余额重新起算"""
+    transactions = [
+        _tx('HKD', '', '', 0.0),         # 0: 待 AI
+        _tx('HKD', 10.0, '', -10.0),     # 1: 推算余额
+        _tx('HKD', 5.0, '', -15.0),      # 2: 新区段首笔，推算余额 -> 承前余额 200 起算
+    ]
+    queue = AIFallbackQueue(resolver=lambda items: [{"debit": '', "credit": 50.0, "balance": None, "payee": "PAY"}])
+    queue.seed_balance(0, 'HKD', 100.0)
+    queue.seed_balance(2, 'HKD', 200.0)
+    for index in (0, 1, 2):
+        queue.mark_computed_balance(index)
+    queue.add(0, "CR PAY", "1 Jan")
+
+    assert queue.resolve(transactions) == 1
+    assert [tx['Balance'] for tx in transactions] == [150.0, 140.0, 195.0]
+    print("  ✅ 重放从承前余额起算")
+
+
+def test_circuit_breaker_after_consecutive_failures():
+    """同步请求连续失败达到阈值后熔断，之后不再调用客户端"""
+    class FailingClient(FakeClient):
+        def _create(self, **kwargs):
+            self.requests.append(kwargs)
+            raise ConnectionError("connection refused")
+
+    breaker = get_circuit_breaker()
+    breaker.reset()
+    client = FailingClient("")
+    try:
+        for _ in range(breaker.threshold + 3):
+            assert parse_lines_batch([("POS MDC A 20.50", "1 Jan")], client=client) == [None]
+        assert breaker.is_open
+        assert len(client.requests) == breaker.threshold
+    finally:
+        breaker.reset()
+    print(f"  ✅ 连续失败 {breaker.threshold} 次后熔断")
+
+
+def test_unconfigured_warning_logged_once():
+    """未配置 API Key 时每次调用都返回 False，但警告只记录一次"""
+    from unittest import mock
+    from src.ai import deepseek
+    deepseek._unavailable_warned.clear()
+    with mock.patch.object(deepseek, "config", SimpleNamespace(DEEPSEEK_API_KEY="")), \
+         mock.patch.object(deepseek.logger, "warning") as warning_spy:
+        assert not any(deepseek.is_configured() for _ in range(3))
+    assert warning_spy.call_count == 1
+    print("  ✅ 未配置警告只记录一次")
+
+
+def test_client_does_not_retry_internally():
+    """同步客户端不自带重试，失败立即计入熔断器（重试只由 AsyncAIResolver 负责）"""
+    from unittest import mock
+    from src.ai import deepseek
+    settings = SimpleNamespace(DEEPSEEK_API_KEY="test", AI_MAX_RETRIES=3, AI_TIMEOUT_SECONDS=60)
+    with mock.patch.object(deepseek, "config", settings):
+        assert deepseek.create_client().max_retries == 0
+    print("  ✅ 客户端不自带重试")
+
+
+def test_rules_learned_from_answers():
+    """一致的 AI 答案达到 min_support 后成为模板，同形状的行不再请求；答案不一致的签名停用"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        rules_path = tmp_dir / "rules.json"
+        requests = []
+
+        def resolver(items):
+            requests.extend(items)
+            return [{"debit": float(text.split()[-1]), "credit": '', "balance": None, "payee": "UBER *TRIP"}
+                    for text, _ in items]
+
+        lines = ["POS MDC (05JAN24) UBER *TRIP 49.95", "POS MDC (17JAN24) UBER *TRIP 197.23",
+                 "POS MDC (18JAN24) UBER *TRIP 117.82"]
+        for line in lines:
+            transactions = [_tx('HKD', '', '', 0.0)]
+            queue = AIFallbackQueue(resolver=resolver, rules=RuleBook(str(rules_path), min_support=2))
+            queue.add(0, line, "1 Jan")
+            queue.resolve(transactions)
+            assert transactions[0]['Debit'] == float(line.split()[-1])
+            assert transactions[0]['Payee'] == 'UBER *TRIP'
+
+        # 前两行学习（support=2），第三行由模板解析
+        assert [text for text, _ in requests] == lines[:2]
+        rules = RuleBook(str(rules_path), min_support=2)
+        # 第三行只是命中模板，不重写规则文件
+        assert rules.stats()["已启用"] == 1 and rules.revision == 2
+
+        # 未配置 AI_RULES_FILE 时规则文件放在缓存目录下
+        from unittest import mock
+        from src import cache
+        from src.ai import rules as rules_module
+        settings = SimpleNamespace(AI_RULES_FILE="", CACHE_DIR=str(tmp_dir))
+        with mock.patch.object(rules_module, "config", settings), mock.patch.object(cache, "config", settings):
+            assert rules_module.default_rules_path() == str(tmp_dir / "ai_rules.json")
+        assert rules.match("POS MDC (01FEB24) UBER *TRIP 135.74") == \
+            {"debit": 135.74, "credit": '', "balance": None, "payee": "UBER *TRIP"}
+
+        # 同一签名得到不同答案后停用
+        rules.learn("POS MDC (02FEB24) UBER *TRIP 10.00", {"debit": '', "credit": 10.0, "balance": None, "payee": "UBER *TRIP"})
+        assert rules.match("POS MDC (03FEB24) UBER *TRIP 20.00") is None
+        # 金额不在行内时无法归纳
+        assert not rules.learn("CR TO 741-622476-838", {"debit": 5.0, "credit": '', "balance": None, "payee": "Unknown"})
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print("  ✅ 从 AI 答案学习行模板")
+
+
+def test_parser_batches_fallback_lines():
+    """HSBC 样本中需要兜底的行合并为每 15 行一次请求，未返回结果时输出不变"""
+    sample = sorted((project_root / "HSBC").glob("*.pdf"))[0]
+    baseline_df, _ = HSBCParser().parse(str(sample))
+
+    batches = []
+
+    def resolver(items):
+        batches.append(items)
+        return [None] * len(items)
+
+    parser = HSBCParser(ai_resolver=resolver)
+    df, _ = parser.parse(str(sample))
+    lines = sum(len(batch) for batch in batches)
+    assert lines > 0
+    stats = parser.fallback_stats
+    assert stats["AI兜底行数"] == lines == stats["数学校验失败"] + stats["无金额"]
+    assert stats["承前余额"] > 0
+    assert len(batches) == -(-lines // 15)
+    assert all(len(batch) <= 15 for batch in batches)
+    assert df.equals(baseline_df)
+    print(f"  ✅ {lines} 行兜底合并为 {len(batches)} 次请求")
+
+
+def main():
+    """主测试函数"""
+    print("=" * 60)
+    print("AI 兜底批量解析测试")
+    print("=" * 60)
+    test_batch_response_mapped_by_id()
+    test_queue_patches_and_replays_balances()
+    test_replay_starts_from_opening_balance()
+    test_circuit_breaker_after_consecutive_failures()
+    test_unconfigured_warning_logged_once()
+    test_client_does_not_retry_internally()
+    test_rules_learned_from_answers()
+    test_parser_batches_fallback_lines()
+    print("\n🎉 所有测试通过！")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+测试批量转换 - 验证文件查找、解析器路由和错误报告
+"""
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.batch import find_pdf_files, run_batch, format_report
+
+
+def test_batch_routes_and_reports():
+    """Airwallex 文件被转换（重命名的文件按内容识别），无法读取的文件记为失败并出现在错误报告中"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        sample = sorted((project_root / "Airwallex").glob("*.pdf"), key=lambda p: p.stat().st_size)[0]
+        shutil.copy(sample, tmp_dir / sample.name)
+        shutil.copy(sample, tmp_dir / "statement.pdf")
+        (tmp_dir / "notes.pdf").write_bytes(b"not a statement")
+
+        assert len(find_pdf_files([str(tmp_dir)])) == 3
+
+        report = run_batch([str(tmp_dir)], output_dir=str(tmp_dir / "out"), jobs=1)
+        statuses = {Path(r["file"]).name: r["status"] for r in report["results"]}
+        banks = {Path(r["file"]).name: r["bank"] for r in report["results"]}
+        assert statuses[sample.name] == "ok"
+        assert statuses["statement.pdf"] == "ok" and banks["statement.pdf"] == "Airwallex"
+        # 无法读取的 PDF 记为失败，而不是当作无法识别的银行跳过
+        assert statuses["notes.pdf"] == "failed"
+        assert (tmp_dir / "out" / "Airwallex" / f"{sample.stem}.xlsx").exists()
+
+        text = format_report(report)
+        assert "错误报告" in text and "notes.pdf" in text
+        print(text)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+
+def test_no_cache_skips_rule_book():
+    """--no-cache（use_cache=False）时不加载也不写回学到的行模板"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        sample = min((project_root / "HSBC").glob("*.pdf"), key=lambda p: p.stat().st_size)
+        shutil.copy(sample, tmp_dir / sample.name)
+        with mock.patch("src.batch.get_rule_book") as rule_book_spy:
+            report = run_batch([str(tmp_dir)], output_dir=str(tmp_dir / "out"), jobs=1, use_cache=False)
+        assert [r["status"] for r in report["results"]] == ["ok"]
+        assert rule_book_spy.call_count == 0
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_batch_routes_and_reports()
+    test_no_cache_skips_rule_book()
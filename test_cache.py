@@ -0,0 +1,156 @@
+"""
+测试解析结果缓存 - 命中、解析器版本失效、LRU 淘汰；AI 响应缓存
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+from src.cache import ParseCache, AIResponseCache
+from src.ai import AIFallbackQueue
+from src.normalizer import STANDARD_COLUMNS
+
+
+class _FakeParser:
+    """只提供缓存键需要的 identify_bank / PARSER_VERSION"""
+    PARSER_VERSION = "1.0"
+
+    def identify_bank(self, pdf_path):
+        return "HSBC"
+
+
+def _sample_frame(rows: int) -> pd.DataFrame:
+    data = {col: [f"{col}-{i}" for i in range(rows)] for col in STANDARD_COLUMNS}
+    for col in ['Debit', 'Credit', 'Balance']:
+        data[col] = [float(i) for i in range(rows)]
+    return pd.DataFrame(data)
+
+
+def test_cache_hit_and_version_invalidation():
+    """相同内容命中缓存；解析器版本变化后不再命中"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        pdf = tmp_dir / "a.pdf"
+        pdf.write_bytes(b"%PDF-fake-a")
+        cache = ParseCache(str(tmp_dir / "cache"))
+        parser = _FakeParser()
+        df = _sample_frame(3)
+
+        assert cache.get(str(pdf), parser) is None
+        cache.put(str(pdf), parser, df, {"原始文件": str(pdf), "交易笔数": 3})
+
+        # 换个路径、相同内容，同样命中，且原始文件更新为新路径
+        copy = tmp_dir / "copy.pdf"
+        shutil.copy(pdf, copy)
+        cached_df, summary = cache.get(str(copy), parser)
+        pd.testing.assert_frame_equal(cached_df, df, check_dtype=False)
+        assert summary == {"原始文件": str(copy), "交易笔数": 3}
+
+        parser.PARSER_VERSION = "2.0"
+        assert cache.get(str(pdf), parser) is None
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_cache_lru_eviction():
+    """超过容量上限时淘汰最久未使用的条目"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        parser = _FakeParser()
+        cache = ParseCache(str(tmp_dir / "cache"))
+        pdfs = []
+        for i in range(3):
+            pdf = tmp_dir / f"{i}.pdf"
+            pdf.write_bytes(f"%PDF-fake-{i}".encode())
+            pdfs.append(str(pdf))
+            cache.put(str(pdf), parser, _sample_frame(50), {})
+        entry_size = max(e.stat().st_size for e in cache._entries())
+
+        # 让 0 号最近被使用，1 号成为最久未使用
+        for i, entry_pdf in enumerate(pdfs):
+            os.utime(cache._entry_path(cache.make_key(entry_pdf, parser)), (1000 + i, 1000 + i))
+        assert cache.get(pdfs[0], parser) is not None
+
+        cache.max_bytes = entry_size * 2
+        cache._evict()
+        assert cache.get(pdfs[1], parser) is None
+        assert cache.get(pdfs[0], parser) is not None
+        assert cache.stats()["条目数"] == 2
+        assert cache.purge() == 2
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_ai_response_cache():
+    """按规范化行文本 + 日期 + 模型命中；过期和超出容量的条目被清理"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        cache = AIResponseCache(str(tmp_dir / "cache"))
+        result = {"debit": 12.5, "credit": '', "balance": None, "payee": "CAFE"}
+        cache.put("POS MDC  CAFE   12.50", "1 Jan", "deepseek-chat", result)
+        cache.flush()
+
+        assert cache.get("POS MDC CAFE 12.50", "1 Jan", "deepseek-chat") == result
+        assert cache.get("POS MDC CAFE 12.50", "2 Jan", "deepseek-chat") is None
+        assert cache.get("POS MDC CAFE 12.50", "1 Jan", "other-model") is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+        cache.ttl_seconds = 0
+        assert cache.get("POS MDC CAFE 12.50", "1 Jan", "deepseek-chat") is None
+        cache.flush()
+        assert cache.stats()["条目数"] == 0
+
+        cache.ttl_seconds = 86400
+        for i in range(5):
+            cache.put(f"LINE {i}", "1 Jan", "deepseek-chat", result)
+        cache.get("LINE 0", "1 Jan", "deepseek-chat")
+        entry_size = len(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        cache.max_bytes = entry_size * 2
+        cache.flush()
+        assert cache.stats()["条目数"] == 2
+        assert cache.get("LINE 0", "1 Jan", "deepseek-chat") == result
+        cache.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_queue_skips_cached_lines():
+    """重跑时命中缓存的行不再请求 AI"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        cache = AIResponseCache(str(tmp_dir / "cache"))
+        requests = []
+
+        def resolver(items):
+            requests.append(items)
+            return [{"debit": 1.0, "credit": '', "balance": 9.0, "payee": text.split()[0]} for text, _ in items]
+
+        for run in range(2):
+            transactions = [{'Account Currency': 'HKD', 'Debit': '', 'Credit': '', 'Balance': 0.0, 'Payee': 'Unknown'}
+                            for _ in range(3)]
+            queue = AIFallbackQueue(resolver=resolver, cache=cache)
+            for i in range(3):
+                queue.add(i, f"SHOP{i} POS 1.00", "1 Jan")
+            assert queue.resolve(transactions) == 3
+            assert [tx['Payee'] for tx in transactions] == ["SHOP0", "SHOP1", "SHOP2"]
+
+        assert len(requests) == 1
+        assert (cache.hits, cache.misses) == (3, 3)
+        cache.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_cache_hit_and_version_invalidation()
+    test_cache_lru_eviction()
+    test_ai_response_cache()
+    test_queue_skips_cached_lines()
+    print("🎉 所有测试通过！")
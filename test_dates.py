@@ -0,0 +1,67 @@
+"""
+测试日期快速解析 - 查表快速路径与 dateutil 结果一致、整列向量化转换
+"""
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+from dateutil import parser as date_parser
+from src.utils import parse_date_airwallex, parse_date_hsbc, parse_month, parse_dates_vectorized
+from src.normalizer import normalize_dataframe
+
+
+def _dateutil_hsbc(date_str, statement_year, statement_month):
+    """原先基于 dateutil 的 HSBC 日期解析，作为对照"""
+    try:
+        dt = date_parser.parse(date_str.strip(), default=datetime(statement_year, 1, 1))
+        year = statement_year - 1 if dt.month > statement_month + 6 else statement_year
+        return datetime(year, dt.month, dt.day).strftime("%Y-%m-%d")
+    except (ValueError, TypeError):
+        return None
+
+
+def test_fast_path_matches_dateutil():
+    """快速路径覆盖的格式（含非法日期、大写、完整月份名）与 dateutil 结果一致"""
+    months = ["Jan", "FEB", "sept", "September", "May", "Mayx"]
+    for month in months:
+        for day in [0, 1, 28, 29, 31, 32]:
+            hsbc_str = f"{day} {month}"
+            for year in (2023, 2024):
+                assert parse_date_hsbc(hsbc_str, year, 1) == _dateutil_hsbc(hsbc_str, year, 1), hsbc_str
+
+            airwallex_str = f"{month} {day} 2024"
+            try:
+                expected = date_parser.parse(airwallex_str).strftime("%Y-%m-%d")
+            except ValueError:
+                expected = None
+            assert parse_date_airwallex(airwallex_str) == expected, airwallex_str
+
+    assert parse_month("18 Dec") == 12
+    assert parse_month("Jun 23 2024") == 6
+    # 非快速路径格式回退到 dateutil
+    assert parse_date_airwallex("Jun 23, 2024") == "2024-06-23"
+    print("  ✅ 快速路径与 dateutil 一致")
+
+
+def test_parse_dates_vectorized():
+    """整列转换：标准格式、Airwallex 格式、其他格式、空值"""
+    series = pd.Series(["2024-06-23", "Jun 23 2024", "Jun 23, 2024", "", None, "garbage"])
+    result = parse_dates_vectorized(series)
+    assert str(result.dtype).startswith("datetime64")
+    assert list(result[:3]) == [pd.Timestamp("2024-06-23")] * 3
+    assert result[3:].isna().all()
+
+    df = normalize_dataframe(pd.DataFrame({"Date": ["2024-01-05", "2023-12-18"]}), parse_dates=True)
+    assert str(df["Date"].dtype).startswith("datetime64")
+    print("  ✅ 向量化日期转换正确")
+
+
+if __name__ == "__main__":
+    test_fast_path_matches_dateutil()
+    test_parse_dates_vectorized()
+    print("🎉 所有测试通过！")
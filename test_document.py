@@ -0,0 +1,195 @@
+"""
+测试 PDFDocument 文档会话 - 验证文件只打开一次、页面提取结果被缓存（内存和磁盘）
+"""
+import sys
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import pdfplumber
+from src.parsers import PDFDocument, AirwallexParser, HSBCParser, MemoryLimits, ResourceLimitError
+from src.parsers.document import may_contain_table, get_memory_limits, set_memory_limits
+from src.cache import PageCache
+
+
+def _sample_pdf() -> str:
+    """取 Airwallex 目录中最小的 PDF 作为测试文件"""
+    pdf_files = sorted((project_root / "Airwallex").glob("*.pdf"), key=lambda p: p.stat().st_size)
+    return str(pdf_files[0])
+
+
+def test_document_memoizes_pages():
+    """同一页的 extract_text / extract_tables 只执行一次"""
+    with PDFDocument(_sample_pdf()) as doc:
+        page = doc.page(0)
+        with mock.patch.object(page, "extract_text", wraps=page.extract_text) as text_spy, \
+             mock.patch.object(page, "extract_tables", wraps=page.extract_tables) as tables_spy:
+            first_text = doc.page_text(0)
+            assert doc.page_text(0) == first_text
+            doc.page_tables(0)
+            doc.page_tables(0)
+        assert text_spy.call_count == 1
+        assert tables_spy.call_count == 1
+    print("  ✅ 页面提取结果已缓存")
+
+
+def test_parse_opens_file_once():
+    """AirwallexParser.parse 在交易提取和汇总提取之间共享同一次打开"""
+    with mock.patch("src.parsers.document.pdfplumber.open", wraps=pdfplumber.open) as open_spy:
+        df, summary = AirwallexParser().parse(_sample_pdf())
+    assert open_spy.call_count == 1
+    assert summary["交易笔数"] == len(df)
+    print(f"  ✅ 解析 {len(df)} 条交易，只打开文件 1 次")
+
+
+def test_page_cache_skips_pdfplumber():
+    """逐页提取结果写入磁盘后，再次解析不再打开 PDF，结果一致"""
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        first_df, first_summary = AirwallexParser(page_cache=PageCache(tmp_dir)).parse(_sample_pdf())
+        with mock.patch("src.parsers.document.pdfplumber.open") as open_spy:
+            df, summary = AirwallexParser(page_cache=PageCache(tmp_dir)).parse(_sample_pdf())
+        assert open_spy.call_count == 0
+        assert df.equals(first_df)
+        assert summary == first_summary
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print("  ✅ 页面提取缓存命中，未调用 pdfplumber")
+
+
+def test_may_contain_table():
+    """线条不足 2 竖 2 横时判定为无表格；非线条策略始终需要真正提取"""
+    page = mock.Mock()
+    page.edges = [{"orientation": "h"}] * 9 + [{"orientation": "v"}]
+    assert not may_contain_table(page)
+    assert may_contain_table(page, {"vertical_strategy": "text"})
+    page.edges = page.edges + [{"orientation": "v"}]
+    assert may_contain_table(page)
+    print("  ✅ 表格存在性预判正确")
+
+
+def test_prefetch_matches_sequential():
+    """多进程按页段预取后解析，结果与逐页串行一致；预取结果写入磁盘缓存"""
+    sample = str(max((project_root / "Airwallex").glob("*.pdf"), key=lambda p: p.stat().st_size))
+    expected_df, expected_summary = AirwallexParser(page_workers=1).parse(sample)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        parser = AirwallexParser(page_cache=PageCache(tmp_dir), page_workers=2)
+        with mock.patch.object(PDFDocument, "page", autospec=True, side_effect=PDFDocument.page) as page_spy, \
+             mock.patch("src.parsers.document.ProcessPoolExecutor", wraps=ProcessPoolExecutor) as pool_spy:
+            df, summary = parser.parse(sample)
+        assert page_spy.call_count == 0  # 所有页面都在工作进程中提取
+        # 以 spawn 启动工作进程（不 fork 可能已有线程的父进程）
+        assert pool_spy.call_args.kwargs["mp_context"].get_start_method() == "spawn"
+        assert df.equals(expected_df)
+        assert summary == expected_summary
+
+        with mock.patch("src.parsers.document.pdfplumber.open") as open_spy:
+            df, _ = AirwallexParser(page_cache=PageCache(tmp_dir), page_workers=2).parse(sample)
+        assert open_spy.call_count == 0
+        assert df.equals(expected_df)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"  ✅ 并行预取 {len(df)} 条交易，与串行一致")
+
+
+# 拆分为两阶段（_scan_page / _replay_page）之前的逐页串行实现对全部 HSBC 样本的输出（无 AI 兜底）：
+# 文件名 -> (交易笔数, 交易表 CSV 的 SHA-256 前 16 位, 账户币种, 期初余额, 期末余额, 总收入, 总支出)
+HSBC_SERIAL_EXPECTED = {
+    'HSBC 2023 12.pdf': (102, 'c69cb91d13bb5c83', 'HKD', 219144.8, 219144.8, 227464.04, 266162.1),
+    'HSBC 2024 01.pdf': (151, 'fdca1e9d44bebcce', 'HKD', 192399.7, 192399.7, 447494.83, 309996.12),
+    'HSBC 2024 02.pdf': (150, 'a9928090220ecaa9', 'HKD', 276999.1, 276999.1, 546817.26, 72673.12),
+    'HSBC 2024 03.pdf': (176, '54f92cbdfc94c292', 'HKD', 202803.08, 432345.97, 686712.51, 72318.89),
+    'HSBC 2024 04.pdf': (200, '6e786d7f0cfb3454', 'HKD', 187191.6, 187191.6, 634652.23, 425582.37),
+    'HSBC 2024 05.pdf': (125, '7a2ce114fda002ea', 'HKD', 238132.4, 238132.4, 547596.84, 225539.42),
+    'HSBC 2024 06.pdf': (105, 'c82b836ea98356f6', 'HKD', 246784.77, 246784.77, 798102.42, 465945.16),
+    'HSBC Bank 20240808.pdf': (93, 'ae443e1af32ebfc0', 'HKD', 290028.45, 518112.99, 530115.04, 19466.77),
+    'HSBC Bank 20240907.pdf': (28, '92e5ce1bcbc51621', 'HKD', 354130.59, 354130.59, 725226.76, 6122.51),
+    'HSBC Bank 20241008.pdf': (171, '6691df79d98260d8', 'HKD', 265394.76, 265394.76, 559627.39, 108234.6),
+    'HSBC Bank 20241108.pdf': (136, 'ced21495ecf76bf1', 'HKD', 360023.09, 521843.94, 1073309.33, 443439.46),
+    'HSBC Bank 20241207.pdf': (173, '85d55eac55a9dfde', 'HKD', 342333.03, 681785.5, 725864.8, 92276.19),
+}
+
+
+def test_hsbc_two_phase_matches_serial():
+    """HSBC 并行提取 + 按页序重放状态机，全部样本的交易和汇总与拆分前的逐页串行实现一致"""
+    def no_ai(items):
+        return [None] * len(items)
+
+    samples = sorted((project_root / "HSBC").glob("*.pdf"))
+    assert sorted(p.name for p in samples) == sorted(HSBC_SERIAL_EXPECTED)
+    for sample in samples:
+        with mock.patch("src.parsers.base_parser.config.PAGE_PARALLEL_MIN_PAGES", 2), \
+             mock.patch.object(PDFDocument, "page", autospec=True, side_effect=PDFDocument.page) as page_spy:
+            df, summary = HSBCParser(ai_resolver=no_ai, page_workers=2).parse(str(sample))
+        assert page_spy.call_count == 0  # 所有页面都在工作进程中提取
+
+        rows, digest, currency, opening, closing, credit, debit = HSBC_SERIAL_EXPECTED[sample.name]
+        assert len(df) == summary["交易笔数"] == rows, sample.name
+        assert hashlib.sha256(df.to_csv(index=False).encode()).hexdigest()[:16] == digest, sample.name
+        assert summary["账户币种"] == currency, sample.name
+        totals = [summary[key] for key in ("期初余额", "期末余额", "总收入(Credit)", "总支出(Debit)")]
+        assert [round(v, 2) for v in totals] == [opening, closing, credit, debit], sample.name
+    print(f"  ✅ HSBC 两阶段解析 {len(samples)} 个样本，与拆分前的串行实现一致")
+
+
+def test_bounded_memory_releases_pages():
+    """bounded 模式下每页处理完即释放版面对象，解析结果与默认模式一致"""
+    expected_df, expected_summary = AirwallexParser().parse(_sample_pdf())
+    previous = get_memory_limits()
+    set_memory_limits(MemoryLimits(bounded=True))
+    try:
+        with mock.patch.object(pdfplumber.page.Page, "close", autospec=True,
+                               side_effect=pdfplumber.page.Page.close) as close_spy:
+            df, summary = AirwallexParser().parse(_sample_pdf())
+    finally:
+        set_memory_limits(previous)
+    assert close_spy.call_count >= 1
+    assert df.equals(expected_df)
+    assert summary == expected_summary
+    print(f"  ✅ bounded 模式释放 {close_spy.call_count} 页，结果一致")
+
+
+def test_resource_limits():
+    """页数或进程内存超过上限时抛出 ResourceLimitError"""
+    with PDFDocument(_sample_pdf(), limits=MemoryLimits(max_pages=1)) as doc:
+        try:
+            doc.page_count
+            assert False, "页数上限应生效"
+        except ResourceLimitError:
+            pass
+    with PDFDocument(_sample_pdf(), limits=MemoryLimits(max_rss_mb=1)) as doc:
+        try:
+            doc.page_text(0)
+            assert False, "内存上限应生效"
+        except ResourceLimitError:
+            pass
+    print("  ✅ 页数/内存上限")
+
+
+def main():
+    """主测试函数"""
+    print("=" * 60)
+    print("PDFDocument 文档会话测试")
+    print("=" * 60)
+    test_document_memoizes_pages()
+    test_parse_opens_file_once()
+    test_page_cache_skips_pdfplumber()
+    test_may_contain_table()
+    test_prefetch_matches_sequential()
+    test_hsbc_two_phase_matches_serial()
+    test_bounded_memory_releases_pages()
+    test_resource_limits()
+    print("\n🎉 所有测试通过！")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
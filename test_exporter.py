@@ -0,0 +1,86 @@
+"""
+测试 Excel 导出 - 单次写入带样式的结果与原先「写入后重新加载格式化」一致
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+from openpyxl import load_workbook
+from src.exporter import export_to_excel
+from src.normalizer import STANDARD_COLUMNS
+from benchmarks.bench_exporter import legacy_export_to_excel, make_ledger
+
+
+def _describe(cell):
+    """单元格的值和可见样式"""
+    return (
+        cell.value, cell.number_format, cell.font.b, cell.font.sz,
+        cell.fill.fgColor.rgb if cell.fill.fill_type else None,
+        cell.alignment.horizontal, cell.alignment.vertical, cell.alignment.wrap_text,
+        cell.border.left.style, cell.border.bottom.style
+    )
+
+
+def test_single_pass_matches_legacy_format():
+    """值、样式、列宽、冻结窗格与原导出方式一致（含空金额、空字符串）"""
+    df = make_ledger(50)
+    df.loc[3, 'Balance'] = np.nan
+    df.loc[4, 'Payee'] = None
+    summary = {'原始文件': 'a.pdf', '银行': 'HSBC', '期初余额': 1234.5, '交易笔数': len(df)}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = legacy_export_to_excel(df, summary, str(Path(tmp_dir) / "legacy.xlsx"))
+        new_path = export_to_excel(df, summary, str(Path(tmp_dir) / "new.xlsx"))
+        legacy, new = load_workbook(legacy_path), load_workbook(new_path)
+
+        assert legacy.sheetnames == new.sheetnames == ['Transactions', 'Summary']
+        for name in legacy.sheetnames:
+            expected, actual = legacy[name], new[name]
+            assert actual.freeze_panes == expected.freeze_panes == 'A2'
+            assert (actual.max_row, actual.max_column) == (expected.max_row, expected.max_column)
+            for col_letter in 'ABCDEFGHI':
+                assert actual.column_dimensions[col_letter].width == expected.column_dimensions[col_letter].width
+            for expected_row, actual_row in zip(expected.iter_rows(), actual.iter_rows()):
+                assert [_describe(c) for c in actual_row] == [_describe(c) for c in expected_row]
+    print("  ✅ 单次写入结果与原导出方式一致")
+
+
+def test_chunked_export_matches_dataframe():
+    """分块迭代器导出与整表导出的内容和样式一致；空迭代器只写表头"""
+    df = make_ledger(120)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        whole_path = export_to_excel(df, {}, str(Path(tmp_dir) / "whole.xlsx"))
+        chunks = (df.iloc[start:start + 50] for start in range(0, len(df), 50))
+        chunked_path = export_to_excel(chunks, {}, str(Path(tmp_dir) / "chunked.xlsx"))
+        empty_path = export_to_excel(iter([]), {}, str(Path(tmp_dir) / "empty.xlsx"))
+
+        whole, chunked = load_workbook(whole_path)['Transactions'], load_workbook(chunked_path)['Transactions']
+        assert chunked.max_row == len(df) + 1
+        assert chunked.freeze_panes == 'A2'
+        for whole_row, chunked_row in zip(whole.iter_rows(), chunked.iter_rows()):
+            assert [_describe(c) for c in chunked_row] == [_describe(c) for c in whole_row]
+
+        empty = load_workbook(empty_path)['Transactions']
+        assert [c.value for c in empty[1]] == STANDARD_COLUMNS
+        assert empty.max_row == 1
+    print("  ✅ 分块流式导出结果与整表导出一致")
+
+
+def main():
+    """主测试函数"""
+    print("=" * 60)
+    print("Excel 导出测试")
+    print("=" * 60)
+    test_single_pass_matches_legacy_format()
+    test_chunked_export_matches_dataframe()
+    print("\n🎉 所有测试通过！")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+测试 HSBC 行词法分析器 - 验证各类行的分类和金额提取
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.parsers import hsbc_lexer
+from src.parsers.hsbc_lexer import tokenize_line
+
+
+def test_tokenize_line():
+    """各类行的分类结果"""
+    cases = [
+        ("HKD Savings 123-456789-833", hsbc_lexer.CURRENCY_SWITCH),
+        ("Page 2 of 5", hsbc_lexer.SKIP),
+        ("8 May B/F BALANCE 12,345.67", hsbc_lexer.DATE_START),
+        ("Balance Brought Forward 12,345.67", hsbc_lexer.OPENING_BALANCE),
+        ("Balance Brought Forward", hsbc_lexer.SKIP),
+        ("POS MDC (09JAN24) UBER *TRIP 68.07", hsbc_lexer.NEW_TX_MARKER),
+        ("N10906097777(09JAN24) 2,000.00 220,760.08", hsbc_lexer.NEW_TX_MARKER),
+        ("HC123 220,760.08", hsbc_lexer.BALANCE_ONLY),
+        ("HC123 999.00", hsbc_lexer.DETAIL),
+        ("CITY SUPER LIMITED", hsbc_lexer.DETAIL),
+    ]
+    for line, expected in cases:
+        token = tokenize_line(line)
+        assert token.kind == expected, (line, token.kind)
+    assert tokenize_line("   ") is None
+    print("  ✅ 行分类正确")
+
+
+def test_amounts_captured():
+    """日期行和余额行的金额在分词时已提取"""
+    token = tokenize_line("8 May B/F BALANCE 12,345.67")
+    assert token.date_str == "8 May"
+    assert token.details == "B/F BALANCE"
+    assert token.balance == 12345.67
+    assert hsbc_lexer.is_opening_balance(token.details)
+    assert tokenize_line("Balance Brought Forward 12,345.67").balance == 12345.67
+
+    token = tokenize_line("HC123 220,760.08")
+    assert token.balance == 220760.08
+    assert token.details == "HC123"
+
+    token = tokenize_line("usd current")
+    assert token.currency == "USD"
+    print("  ✅ 金额提取正确")
+
+
+if __name__ == "__main__":
+    test_tokenize_line()
+    test_amounts_captured()
+    print("🎉 所有测试通过！")
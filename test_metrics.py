@@ -0,0 +1,106 @@
+"""
+测试运行指标 - span 计时、按文件收集、JSON 行与 Prometheus 输出
+"""
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src import metrics
+from src.futures import chain_future
+from concurrent.futures import Future
+
+
+def test_disabled_spans_record_nothing():
+    """未启用时 span 为共享的空上下文，不累计任何耗时"""
+    metrics.enable(False)
+    metrics.reset()
+
+    @metrics.timed("demo.func")
+    def work():
+        return 42
+
+    with metrics.span("demo.block"):
+        assert work() == 42
+    assert metrics.span("demo.block") is metrics.span("other")
+    assert metrics.totals() == {}
+    print("  ✅ 未启用时无计时")
+
+
+def test_spans_collected_per_file():
+    """span 计入进程总计和当前文件；chain_future 的回调沿用提交时的文件上下文"""
+    metrics.enable(True)
+    metrics.reset()
+    try:
+        file_metrics = metrics.FileMetrics()
+        pending = Future()
+        with metrics.collect(file_metrics):
+            for _ in range(2):
+                with metrics.span("demo.block"):
+                    pass
+
+            def build(value):
+                with metrics.span("demo.callback"):
+                    return value
+
+            chained = chain_future(pending, build)
+        with metrics.span("demo.outside"):
+            pass
+        pending.set_result(1)
+        assert chained.result() == 1
+
+        assert file_metrics.spans["demo.block"]["count"] == 2
+        assert "demo.callback" in file_metrics.spans
+        assert "demo.outside" not in file_metrics.spans
+        assert metrics.totals()["demo.outside"]["count"] == 1
+    finally:
+        metrics.enable(False)
+        metrics.reset()
+    print("  ✅ 按文件收集 span")
+
+
+def test_json_lines_and_prometheus():
+    """JSON 行逐条追加；Prometheus 文本按银行、span 汇总"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        spans = {"pdf.text": {"count": 3, "seconds": 0.5, "max": 0.25}}
+        records = [
+            {"file": "a.pdf", "bank": "HSBC", "status": "ok", "rows": 10, "seconds": 1.0, "spans": spans},
+            {"file": "b.pdf", "bank": "HSBC", "status": "ok", "rows": 5, "seconds": 2.0, "spans": spans},
+        ]
+        jsonl = str(tmp_dir / "metrics.jsonl")
+        metrics.write_json_lines(jsonl, records[:1])
+        metrics.write_json_lines(jsonl, records[1:])
+        assert metrics.read_json_lines(jsonl) == records
+
+        prom = tmp_dir / "metrics.prom"
+        metrics.write_prometheus(str(prom), metrics.read_json_lines(jsonl))
+        text = prom.read_text(encoding="utf-8")
+        assert 'statement_converter_files_total{bank="HSBC",status="ok"} 2' in text
+        assert 'statement_converter_rows_total{bank="HSBC"} 15' in text
+        assert 'statement_converter_span_seconds_total{span="pdf.text"} 1.0' in text
+        assert 'statement_converter_span_count_total{span="pdf.text"} 6' in text
+        assert 'statement_converter_span_max_seconds{span="pdf.text"} 0.25' in text
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print("  ✅ JSON 行与 Prometheus 输出")
+
+
+def main():
+    """主测试函数"""
+    print("=" * 60)
+    print("运行指标测试")
+    print("=" * 60)
+    test_disabled_spans_record_nothing()
+    test_spans_collected_per_file()
+    test_json_lines_and_prometheus()
+    print("\n🎉 所有测试通过！")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+测试金额列向量化标准化 - 与原先逐单元格实现结果一致
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+from src.normalizer import _normalize_amount_column, normalize_dataframe
+from benchmarks.bench_normalizer import legacy_normalize_amount_column, make_amounts
+
+
+EDGE_VALUES = [
+    1234.5, 7, '1e5', '+5', 'inf', 'nan', '1_000', '1_x', '1,000.00', '(5.00)',
+    '23,500.00 HKD', '  88.10 ', '', '   ', None, np.nan, pd.NaT, True, ['1'],
+    np.float64(2.5), 'abc'
+]
+
+
+def test_matches_legacy_on_edge_values():
+    """各类边界输入与逐单元格实现结果一致"""
+    series = pd.Series(EDGE_VALUES, dtype=object, index=range(100, 100 + len(EDGE_VALUES)))
+    expected = legacy_normalize_amount_column(series)
+    result = _normalize_amount_column(series)
+    assert result.dtype == float
+    pd.testing.assert_series_equal(result, expected.reindex(series.index).astype(float), check_names=False)
+    print(f"  ✅ {len(EDGE_VALUES)} 个边界值结果一致")
+
+
+def test_matches_legacy_on_synthetic_column():
+    """合成金额列（数值、空串、带币种后缀）结果一致"""
+    series = make_amounts(2000)
+    pd.testing.assert_series_equal(
+        _normalize_amount_column(series), legacy_normalize_amount_column(series).astype(float), check_names=False
+    )
+    print("  ✅ 合成金额列结果一致")
+
+
+def test_failed_values_without_digits():
+    """无法解析且不含数字的值（占位符、币种）为 NaN，与逐单元格实现一致"""
+    for values in (['-', '1.00'], ['N/A', 'USD'], ['-', 'N/A', 3]):
+        series = pd.Series(values, dtype=object)
+        result = _normalize_amount_column(series)
+        pd.testing.assert_series_equal(result, legacy_normalize_amount_column(series).astype(float), check_names=False)
+        assert result.isna().sum() == sum(1 for v in values if isinstance(v, str) and v != '1.00')
+    print("  ✅ 不含数字的无效值结果一致")
+
+
+def test_duplicate_index():
+    """索引重复（多份对账单 concat）时按位置转换，保留原索引"""
+    values = ['1.00', '2,000.00 HKD', '-', '1_000', 5, None]
+    series = pd.Series(values, dtype=object, index=[0, 0, 1, 1, 2, 2])
+    result = _normalize_amount_column(series)
+    expected = legacy_normalize_amount_column(pd.Series(values, dtype=object)).astype(float)
+    assert result.index.tolist() == [0, 0, 1, 1, 2, 2]
+    np.testing.assert_array_equal(result.to_numpy(), expected.to_numpy())
+
+    statement = pd.DataFrame({'Date': ['2024-01-01', '2024-01-02'], 'Debit': ['1.00', ''],
+                              'Credit': ['', '3.50 HKD'], 'Balance': ['10', '13.50']})
+    ledger = normalize_dataframe(pd.concat([statement, statement]))
+    assert ledger['Credit'].tolist()[1::2] == [3.5, 3.5]
+    assert ledger['Balance'].tolist() == [10.0, 13.5, 10.0, 13.5]
+    print("  ✅ 重复索引按位置转换")
+
+
+def test_numeric_and_empty_columns():
+    """数值列直接转 float；空列返回空 float 列"""
+    assert _normalize_amount_column(pd.Series([1, 2, 3])).tolist() == [1.0, 2.0, 3.0]
+    empty = _normalize_amount_column(pd.Series([], dtype=object))
+    assert empty.empty and empty.dtype == float
+    print("  ✅ 数值列与空列处理正确")
+
+
+def main():
+    """主测试函数"""
+    print("=" * 60)
+    print("金额列标准化测试")
+    print("=" * 60)
+    test_matches_legacy_on_edge_values()
+    test_matches_legacy_on_synthetic_column()
+    test_failed_values_without_digits()
+    test_duplicate_index()
+    test_numeric_and_empty_columns()
+    print("\n🎉 所有测试通过！")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+测试解析器注册表 - 按首页内容识别银行、惰性导入解析器模块、批量转换每个文件只打开一次
+"""
+import re
+import sys
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+from unittest import mock
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import pdfplumber
+from src.batch import run_batch
+from src.parsers import PDFDocument, AirwallexParser, HSBCParser, registry
+
+
+def _smallest(bank: str) -> Path:
+    return min((project_root / bank).glob("*.pdf"), key=lambda p: p.stat().st_size)
+
+
+def test_parser_modules_load_lazily():
+    """导入 src.parsers 和 src.batch 不加载解析器模块，访问或选中时才导入"""
+    code = (
+        "import sys; import src.batch, src.parsers as p; "
+        "loaded = lambda: [m for m in ('src.parsers.hsbc_parser', 'src.parsers.airwallex_parser') if m in sys.modules]; "
+        "assert loaded() == [], loaded(); "
+        "p.HSBCParser; assert loaded() == ['src.parsers.hsbc_parser'], loaded(); "
+        "registry = p.registry; registry.get_spec('Airwallex').load(); assert len(loaded()) == 2"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=str(project_root), check=True)
+
+    # 只导入 src.parsers 不加载 AI 模块和 openai；除 pandas 自身导入的模块外不加载 pyarrow
+    code = (
+        "import sys; import pandas; arrow_by_pandas = 'pyarrow' in sys.modules; import src.parsers; "
+        "loaded = [m for m in ('openai', 'src.ai', 'src.sinks') if m in sys.modules]; "
+        "assert loaded == [], loaded; "
+        "assert arrow_by_pandas or 'pyarrow' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=str(project_root), check=True)
+    print("  ✅ 解析器模块惰性导入")
+
+
+def test_content_beats_misleading_name():
+    """文件名指向另一家银行时按首页内容识别（registry.detect 与 identify_bank）；都不匹配时返回 None"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        misleading = {"HSBC": "ASR_USD_statement.pdf", "Airwallex": "HSBC 2024 01.pdf"}
+        for bank, file_name in misleading.items():
+            path = tmp_dir / file_name
+            shutil.copy(_smallest(bank), path)
+            assert registry.detect_name(str(path)).bank != bank
+            with PDFDocument(str(path)) as doc:
+                assert registry.detect(doc).bank == bank
+
+        assert registry.detect_name("scan.pdf") is None
+
+        # 单个解析器的 identify_bank 同样以内容为准：改名为 HSBC 的 Airwallex 对账单不被 HSBC 解析器接受
+        renamed = tmp_dir / "HSBC_statement.pdf"
+        shutil.copy(_smallest("Airwallex"), renamed)
+        assert HSBCParser().identify_bank(str(renamed)) == "Unknown"
+        assert AirwallexParser().identify_bank(str(renamed)) == "Airwallex"
+        # 首页无法读取时只按名称判断
+        broken = tmp_dir / "HSBC_broken.pdf"
+        broken.write_bytes(b"not a pdf")
+        assert HSBCParser().identify_bank(str(broken)) == "HSBC"
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print("  ✅ 首页内容优先于文件名")
+
+
+def test_producer_breaks_tie():
+    """文件名和首页文本同分时按 Producer 元数据区分（与注册顺序无关）"""
+    statement = re.compile(r'statement')
+    hsbc, airwallex = registry.get_spec("HSBC"), registry.get_spec("Airwallex")
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        for bank, first, second in (("Airwallex", hsbc, airwallex), ("HSBC", airwallex, hsbc)):
+            path = tmp_dir / "statement.pdf"
+            shutil.copy(_smallest(bank), path)
+            with mock.patch.dict(registry._registry, clear=True):
+                # 只有文件名能匹配，两个候选同分；先注册的是另一家银行
+                for spec in (first, second):
+                    registry.register(spec.bank, spec.target, spec.fingerprint._replace(
+                        name_pattern=statement, text_pattern=None))
+                with PDFDocument(str(path)) as doc:
+                    assert registry.detect(doc).bank == bank
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print("  ✅ 同分时按 Producer 区分")
+
+
+def test_mixed_inbox_opens_each_file_once():
+    """任意命名的混合收件箱按内容分发，每个文件只打开一次（识别和解析共用文档会话）"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        shutil.copy(_smallest("HSBC"), tmp_dir / "inbox-1.pdf")
+        shutil.copy(_smallest("Airwallex"), tmp_dir / "inbox-2.pdf")
+        with mock.patch("src.parsers.document.pdfplumber.open", wraps=pdfplumber.open) as open_spy:
+            report = run_batch([str(tmp_dir)], output_dir=str(tmp_dir / "out"), jobs=1, use_cache=False)
+        banks = {Path(r["file"]).name: (r["bank"], r["status"]) for r in report["results"]}
+        assert banks == {"inbox-1.pdf": ("HSBC", "ok"), "inbox-2.pdf": ("Airwallex", "ok")}
+        assert open_spy.call_count == 2
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print("  ✅ 混合收件箱每个文件只打开一次")
+
+
+def main():
+    """主测试函数"""
+    print("=" * 60)
+    print("解析器注册表测试")
+    print("=" * 60)
+    test_parser_modules_load_lazily()
+    test_content_beats_misleading_name()
+    test_producer_breaks_tie()
+    test_mixed_inbox_opens_each_file_once()
+    print("\n🎉 所有测试通过！")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+测试输出格式 - Parquet / Arrow IPC / CSV 分块写入后的数据类型、币种字典和汇总信息
+"""
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+from src.sinks import get_sink, read_output, SINKS, OutputSink, ArrowSink
+from src.normalizer import STANDARD_COLUMNS
+from benchmarks.bench_exporter import make_ledger
+
+
+def _multi_currency_ledger() -> pd.DataFrame:
+    """每 10 行出现一个新币种（后出现的币种字母序更小），检验跨块的字典增量"""
+    df = make_ledger(30)
+    df.loc[10:19, 'Account Currency'] = 'USD'
+    df.loc[20:, 'Account Currency'] = 'EUR'
+    return df
+
+
+def test_columnar_roundtrip():
+    """分块写入 Parquet / Arrow IPC 后读回：类型正确、内容一致、汇总在元数据中"""
+    df = _multi_currency_ledger()
+    summary = {'银行': 'HSBC', '交易笔数': len(df)}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in ("parquet", "feather"):
+            for unit in ("float", "cents"):
+                sink = get_sink(name, unit)
+                chunks = (df.iloc[start:start + 10] for start in range(0, len(df), 10))
+                path = sink.write(chunks, summary, str(Path(tmp_dir) / f"{unit}{sink.suffix}"))
+                out, out_summary = read_output(path)
+
+                assert out_summary == summary
+                assert list(out.columns) == STANDARD_COLUMNS
+                assert pd.api.types.is_datetime64_any_dtype(out['Date'])
+                assert isinstance(out['Account Currency'].dtype, pd.CategoricalDtype)
+                assert out['Account Currency'].astype(str).tolist() == df['Account Currency'].tolist()
+                assert out['Date'].dt.strftime('%Y-%m-%d').tolist() == df['Date'].tolist()
+                if unit == "cents":
+                    assert str(out['Debit'].dtype) == "Int64"
+                    expected = (df['Debit'] * 100).round()
+                    assert out['Debit'].astype(float).fillna(-1).tolist() == expected.fillna(-1).tolist()
+                else:
+                    pd.testing.assert_series_equal(out['Balance'], df['Balance'], check_names=False)
+    print("  ✅ Parquet / Arrow IPC 分块写入读回一致")
+
+
+def test_csv_and_empty_input():
+    """CSV 流式写入表头只出现一次、汇总写入同名 JSON；空输入仍写出带表头的文件"""
+    df = make_ledger(25)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        chunks = (df.iloc[start:start + 10] for start in range(0, len(df), 10))
+        path = get_sink("csv").write(chunks, {'银行': 'HSBC'}, str(Path(tmp_dir) / "ledger.csv"))
+        out = pd.read_csv(path)
+        assert len(out) == len(df)
+        assert out['Date'].tolist() == df['Date'].tolist()
+        summary = json.loads((Path(tmp_dir) / "ledger.summary.json").read_text(encoding="utf-8"))
+        assert summary == {'银行': 'HSBC', '金额单位': 'float'}
+
+        for name, sink_cls in SINKS.items():
+            path = sink_cls().write(iter([]), {}, str(Path(tmp_dir) / f"empty{sink_cls.suffix}"))
+            assert Path(path).exists(), name
+        assert pd.read_csv(Path(tmp_dir) / "empty.csv").columns.tolist() == STANDARD_COLUMNS
+        assert read_output(str(Path(tmp_dir) / "empty.parquet"))[0].empty
+    print("  ✅ CSV 流式写入与空输入处理正确")
+
+
+def test_incomplete_sink_cannot_be_created():
+    """基类和未实现写入方法的子类在创建时即报错，而不是第一次写出时"""
+    class NoWriterSink(ArrowSink):
+        name = "incomplete"
+
+    for sink_cls in (OutputSink, ArrowSink, NoWriterSink):
+        try:
+            sink_cls()
+        except TypeError:
+            pass
+        else:
+            raise AssertionError(f"{sink_cls.__name__} 不应能创建实例")
+    print("  ✅ 未实现的输出格式无法创建")
+
+
+def main():
+    """主测试函数"""
+    print("=" * 60)
+    print("输出格式测试")
+    print("=" * 60)
+    test_columnar_roundtrip()
+    test_csv_and_empty_input()
+    test_incomplete_sink_cannot_be_created()
+    print("\n🎉 所有测试通过！")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+测试内存输入 - bytes / memoryview / 文件对象直接解析，按内容识别银行，路径以 mmap 打开
+"""
+import io
+import sys
+import mmap
+import shutil
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.batch import select_parser
+from src.parsers import PDFDocument, AirwallexParser, HSBCParser
+
+
+def _smallest(bank: str) -> Path:
+    return min((project_root / bank).glob("*.pdf"), key=lambda p: p.stat().st_size)
+
+
+class _PipeReader(io.RawIOBase):
+    """不能 seek 的只读流（模拟管道/网络上传）"""
+
+    def __init__(self, data: bytes):
+        self._inner = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self._inner.readinto(b)
+
+
+def test_memory_inputs_match_path():
+    """bytes、memoryview、文件对象（可 seek 与不可 seek）的解析结果与路径输入一致"""
+    sample = _smallest("Airwallex")
+    expected_df, expected_summary = AirwallexParser().parse(str(sample))
+    data = sample.read_bytes()
+
+    for label, source in [("bytes", data), ("memoryview", memoryview(data)),
+                          ("文件对象", io.BytesIO(data)), ("不可 seek 的流", _PipeReader(data))]:
+        df, summary = AirwallexParser().parse(source)
+        assert df.equals(expected_df), label
+        assert summary["原始文件"] == "<memory>"
+        assert {**summary, "原始文件": str(sample)} == expected_summary, label
+
+    df, summary = AirwallexParser().parse(data, name=str(sample))
+    assert summary == expected_summary
+    print(f"  ✅ 内存输入 {len(df)} 条交易，与路径输入一致")
+
+
+def test_content_detection():
+    """文件名无法判断时按首页内容识别银行（重命名的文件、没有名称的字节）"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        for bank, parser_cls in (("HSBC", HSBCParser), ("Airwallex", AirwallexParser)):
+            renamed = tmp_dir / f"{bank.lower()[:2]}-statement.pdf"
+            shutil.copy(_smallest(bank), renamed)
+            assert parser_cls().identify_name(str(renamed)) == "Unknown"
+            assert isinstance(select_parser(str(renamed)), parser_cls)
+            assert isinstance(select_parser(renamed.read_bytes()), parser_cls)
+            assert parser_cls().identify_bank(renamed.read_bytes()) == bank
+
+        not_pdf = tmp_dir / "notes.pdf"
+        not_pdf.write_bytes(b"not a pdf")
+        try:
+            select_parser(str(not_pdf))
+        except Exception:
+            pass
+        else:
+            raise AssertionError("无法读取的文件应抛出异常，而不是返回 None")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print("  ✅ 按内容识别银行")
+
+
+def test_path_is_memory_mapped():
+    """路径输入以只读 mmap 打开，关闭文档时释放映射；调用方的文件对象不被关闭"""
+    sample = str(_smallest("Airwallex"))
+    with PDFDocument(sample) as doc:
+        doc.page_text(0)
+        assert isinstance(doc._stream, mmap.mmap)
+        stream = doc._stream
+    assert stream.closed
+
+    with open(sample, "rb") as f:
+        with PDFDocument(f) as doc:
+            doc.page_text(0)
+        assert not f.closed
+    print("  ✅ 路径以 mmap 打开")
+
+
+def main():
+    """主测试函数"""
+    print("=" * 60)
+    print("内存输入测试")
+    print("=" * 60)
+    test_memory_inputs_match_path()
+    test_content_detection()
+    test_path_is_memory_mapped()
+    print("\n🎉 所有测试通过！")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+测试逐页解析 - iter_transactions 与 parse 结果一致，边解析边导出
+"""
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+from src.batch import select_parser, stream_file, convert_file
+from src.normalizer import normalize_stream
+
+
+SAMPLES = [
+    sorted((project_root / "HSBC").glob("*.pdf"))[0],
+    sorted((project_root / "Airwallex").glob("*.pdf"))[0],
+]
+
+
+def test_iter_transactions_matches_parse():
+    """逐页产出的批次拼接后与 parse 的交易表和汇总一致（HSBC 的状态跨页延续）"""
+    for sample in SAMPLES:
+        df, summary = select_parser(str(sample)).parse(str(sample))
+
+        parser = select_parser(str(sample))
+        batches = list(parser.iter_transactions(str(sample)))
+        assert len(batches) > 1
+        assert pd.DataFrame([row for batch in batches for row in batch]).equals(df)
+        assert parser.stream_summary == summary
+        print(f"  ✅ {sample.name}: {len(batches)} 批，{len(df)} 条")
+
+
+def test_normalize_stream_finalizes_summary():
+    """逐批标准化；流结束时汇总原地替换为标准化结果"""
+    summary = {"交易笔数": "2", "期初余额": "1000.00"}
+    batches = [[{"Date": "2024-01-01", "Debit": "12.50"}], [], [{"Date": "2024-01-02", "Credit": 3}]]
+    chunks = list(normalize_stream(batches, summary))
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+    assert chunks[0]["Debit"].iloc[0] == 12.5
+    assert summary["交易笔数"] == 2 and summary["期初余额"] == 1000.0
+    print("  ✅ 逐批标准化")
+
+
+def test_stream_file_matches_convert_file():
+    """边解析边导出的 Excel 与整体转换一致；列式格式不支持流式导出"""
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        sample = str(SAMPLES[0])
+        expected = convert_file(sample, str(tmp_dir / "batch"), use_cache=False)["output"]
+        output = stream_file(sample, str(tmp_dir / "stream.xlsx"))
+        for sheet in ("Transactions", "Summary"):
+            assert pd.read_excel(output, sheet_name=sheet).equals(pd.read_excel(expected, sheet_name=sheet))
+
+        try:
+            stream_file(sample, str(tmp_dir / "stream.parquet"), "parquet")
+            assert False, "parquet 应不支持流式导出"
+        except ValueError:
+            pass
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print("  ✅ 流式导出与整体转换一致")
+
+
+def main():
+    """主测试函数"""
+    print("=" * 60)
+    print("逐页解析测试")
+    print("=" * 60)
+    test_iter_transactions_matches_parse()
+    test_normalize_stream_finalizes_summary()
+    test_stream_file_matches_convert_file()
+    print("\n🎉 所有测试通过！")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())